@@ -9,4 +9,4 @@
 
 from pipeline import Pipeline
 from pipeline_nodes import (Plug, Node, ProcessNode, PipelineNode,
-                      Switch)
+                      Switch, MapNode)
@@ -9,6 +9,7 @@
 
 # System import
 import logging
+import heapq
 from copy import deepcopy
 import types
 
@@ -30,9 +31,11 @@ except ImportError:
 # Capsul import
 from capsul.process import Process
 from capsul.process import get_process_instance
+from capsul.utils.execution_trace import trace_span
 from topological_sort import GraphNode, Graph
+from pipeline_links import LinkTable
 from pipeline_nodes import (
-    Plug, ProcessNode, PipelineNode, Switch, IterativeNode)
+    Plug, ProcessNode, PipelineNode, Switch, IterativeNode, MapNode)
 
 # Soma import
 from soma.controller import Controller
@@ -81,7 +84,11 @@ class Pipeline(Process):
     add_process
     add_switch
     add_link
+    add_links
     remove_link
+    set_lazy_propagation
+    mark_dirty_plug
+    settle_values
     export_parameter
     workflow_ordered_nodes
     workflow_graph
@@ -120,11 +127,22 @@ class Pipeline(Process):
         self.nodes = SortedDictionary()
         self.node_position = {}
         self.pipeline_node = PipelineNode(self, '', self)
+        self.link_table = LinkTable()
         self.nodes[''] = self.pipeline_node
         self.do_not_export = set()
         self.parent_pipeline = None
         self._disable_update_nodes_and_plugs_activation = 1
         self._must_update_nodes_and_plugs_activation = False
+        # Lazy propagation of the values along the links: {(node, plug_name):
+        # (value, source_node, source_plug_name)} and the corresponding
+        # (rank, count, (node, plug_name)) heap
+        self._lazy_propagation = False
+        self._dirty_plugs = {}
+        self._dirty_heap = []
+        self._dirty_count = 0
+        self._propagation_ranks = None
+        self._settling = False
+        self._assigning_from = None
         self.pipeline_definition()
 
         self.workflow_repr = ""
@@ -261,6 +279,8 @@ class Pipeline(Process):
             node.name = name
             node.pipeline = self
             process.parent_pipeline = self
+            if self._lazy_propagation:
+                process.set_lazy_propagation(True)
         else:
             node = ProcessNode(self, name, process)
         self.nodes[name] = node
@@ -269,7 +289,7 @@ class Pipeline(Process):
         # plug so that it gets activated even if not linked
         for parameter_name in kwargs:
             if process.trait(parameter_name):
-                node.plugs[i].has_default_value = True
+                node.plugs[parameter_name].has_default_value = True
                 make_optional.add(parameter_name)
 
         # Change plug default properties
@@ -293,8 +313,51 @@ class Pipeline(Process):
         # Add new node in pipeline process list
         self.list_process_in_pipeline.append(process)
 
+    def add_process_copies(self, names, process, do_not_export=None,
+                           make_optional=None, **kwargs):
+        """ Add several nodes running copies of the same process in the
+        pipeline.
+
+        The process is instanciated once and then cloned for each node (see
+        Process.clone), which is much faster than resolving and
+        instanciating the process for each node.
+
+        Parameters
+        ----------
+        names: list of str (mandatory)
+            the nodes names (have to be unique).
+        process: Process (mandatory)
+            the process we want to add.
+        do_not_export: list of str (optional)
+            a list of plug names that we do not want to export.
+        make_optional: list of str (optional)
+            a list of plug names that we do not want to export.
+        """
+        # The default parameters values are set once on a private prototype
+        # and are copied with the other parameters values by the clones
+        if isinstance(process, Process):
+            prototype = process.clone()
+            for parameter_name, value in kwargs.iteritems():
+                prototype.set_parameter(parameter_name, value)
+        else:
+            prototype = get_process_instance(process, **kwargs)
+        default_parameters = [parameter_name for parameter_name in kwargs
+                              if prototype.trait(parameter_name)]
+        do_not_export = set(do_not_export or []).union(kwargs)
+        make_optional = set(make_optional or []).union(default_parameters)
+        for name in names:
+            self.add_process(name, prototype.clone(), do_not_export,
+                             make_optional)
+
+            # As in add_process, the plugs with a default value are activated
+            # even if they are not linked
+            node = self.nodes[name]
+            for parameter_name in default_parameters:
+                node.plugs[parameter_name].has_default_value = True
+
     def add_iterative_process(self, name, process, iterative_plugs=None,
-                              do_not_export=None, make_optional=None, **kwargs):
+                              do_not_export=None, make_optional=None,
+                              virtual=False, chunk_size=None, **kwargs):
         """ Add a new iterative node in the pipeline.
 
         Parameters
@@ -309,6 +372,15 @@ class Pipeline(Process):
             a list of plug names that we do not want to export
         make_optional: list of str (optional)
             a list of plug names that we do not want to export
+        virtual: bool (optional, default False)
+            if True, create a virtual map node (see MapNode) that stays a
+            single node whatever the number of items: the items processes
+            are only created at execution time. Otherwise an iterative
+            pipeline with one node per item is built.
+        chunk_size: int (optional, default None)
+            the number of consecutive items executed in one job. Chunks are
+            handled by virtual map nodes only: if set, a virtual map node is
+            created.
         """
         # If no iterative plug are given as parameter, add a process
         if iterative_plugs is None:
@@ -324,9 +396,14 @@ class Pipeline(Process):
 
             # Create the iterative pipeline node
             process = get_process_instance(process, **kwargs)
-            node = IterativeNode(
-                self, name, process, iterative_plugs, do_not_export,
-                make_optional, **kwargs)
+            if virtual or chunk_size is not None:
+                node = MapNode(
+                    self, name, process, iterative_plugs, do_not_export,
+                    make_optional, chunk_size=chunk_size or 1, **kwargs)
+            else:
+                node = IterativeNode(
+                    self, name, process, iterative_plugs, do_not_export,
+                    make_optional, **kwargs)
             self.nodes[name] = node
 
             # Create a trait to control the node activation (enable property)
@@ -447,22 +524,44 @@ class Pipeline(Process):
         # Check if its a pipeline node
         if dot < 0:
             node_name = ""
-            node = self.pipeline_node
             plug_name = name
         else:
             node_name = name[:dot]
+            plug_name = name[dot + 1:]
+        node, plug = self.get_node_plug(node_name, plug_name)
+        return node_name, plug_name, node, plug
+
+    def get_node_plug(self, node_name, plug_name):
+        """ Get a node and one of its plugs from their names.
+
+        Parameters
+        ----------
+        node_name: str
+            the node name, the empty string for the pipeline node
+        plug_name: str
+            the plug name
+
+        Returns
+        -------
+        output: tuple
+            tuple containing the node and plug instances
+        """
+        # Check if its a pipeline node
+        if node_name == "":
+            node = self.pipeline_node
+        else:
             node = self.nodes.get(node_name)
             if node is None:
                 raise ValueError("{0} is not a valid node name".format(
                                  node_name))
-            plug_name = name[dot + 1:]
 
         # Check if plug nexists
-        if plug_name not in node.plugs:
+        plug = node.plugs.get(plug_name)
+        if plug is None:
             raise ValueError('%s is not a valid parameter name for node %s' %
                              (plug_name, (node_name if node_name else
                                                'pipeline')))
-        return node_name, plug_name, node, node.plugs[plug_name]
+        return node, plug
 
     def add_link(self, link, weak_link=False):
         """ Add a link between pipeline nodes.
@@ -486,39 +585,96 @@ class Pipeline(Process):
          source_plug, dest_node_name, dest_plug_name, dest_node,
         dest_plug) = self.parse_link(link)
 
-        # Assure that pipeline plugs are not linked
-        if not source_plug.output and source_node is not self.pipeline_node:
-            raise ValueError("Cannot link from a pipeline input "
-                             "plug: {0}".format(link))
-        if dest_plug.output and dest_node is not self.pipeline_node:
-            raise ValueError("Cannot link to a pipeline output "
-                             "plug: {0}".format(link))
+        self.add_links([(source_node_name, source_plug_name, dest_node_name,
+                         dest_plug_name, weak_link)])
 
-        # Propagate the plug value from source to destination
-        value = source_node.get_plug_value(source_plug_name)
-        if value is not None:
-            dest_node.set_plug_value(dest_plug_name, value)
-
-        # Update plugs memory of the pipeline
-        source_plug.links_to.add((dest_node_name, dest_plug_name, dest_node,
-                                  dest_plug, weak_link))
-        dest_plug.links_from.add((source_node_name, source_plug_name,
-                                  source_node, source_plug, weak_link))
+    def add_links(self, links):
+        """ Add several links between pipeline nodes at once.
 
-        # Set a connected_output property
-        if (isinstance(dest_node, ProcessNode) and
-                isinstance(source_node, ProcessNode)):
-            source_trait = source_node.process.trait(source_plug_name)
-            dest_trait = dest_node.process.trait(dest_plug_name)
-            if source_trait.output and not dest_trait.output:
-                dest_trait.connected_output = True
+        All the links are checked before any of them is added. The plug
+        values are propagated once all the links are registered, and the
+        pipeline activation is updated only once.
 
-        # Observer
-        source_node.connect(source_plug_name, dest_node, dest_plug_name)
-        dest_node.connect(dest_plug_name, source_node, source_plug_name)
+        Parameters
+        ----------
+        links: list of 5-uplet
+            the links descriptions of the form (source_node_name,
+            source_plug_name, dest_node_name, dest_plug_name, weak_link).
+            The empty string node name stands for the pipeline node itself.
+        """
+        # Check all the links
+        checked_links = []
+        for (source_node_name, source_plug_name, dest_node_name,
+             dest_plug_name, weak_link) in links:
+            source_node, source_plug = self.get_node_plug(
+                source_node_name, source_plug_name)
+            dest_node, dest_plug = self.get_node_plug(
+                dest_node_name, dest_plug_name)
+
+            # Assure that pipeline plugs are not linked
+            if (not source_plug.output and
+                    source_node is not self.pipeline_node):
+                raise ValueError("Cannot link from a pipeline input "
+                                 "plug: {0}.{1}".format(source_node_name,
+                                                        source_plug_name))
+            if dest_plug.output and dest_node is not self.pipeline_node:
+                raise ValueError("Cannot link to a pipeline output "
+                                 "plug: {0}.{1}".format(dest_node_name,
+                                                        dest_plug_name))
+            checked_links.append((
+                source_node_name, source_plug_name, source_node, source_plug,
+                dest_node_name, dest_plug_name, dest_node, dest_plug,
+                weak_link))
+
+        # Delay the activation update until all the links are added
+        self.delay_update_nodes_and_plugs_activation()
+        try:
+            for (source_node_name, source_plug_name, source_node, source_plug,
+                 dest_node_name, dest_plug_name, dest_node, dest_plug,
+                 weak_link) in checked_links:
+
+                # Update plugs memory of the pipeline: an existing link only
+                # gets its weak flag updated
+                is_new_link = ((source_node_name, source_plug_name,
+                                dest_node_name, dest_plug_name)
+                               not in self.link_table)
+                self.link_table.add(
+                    source_node_name, source_plug_name, source_node,
+                    source_plug, dest_node_name, dest_plug_name, dest_node,
+                    dest_plug, weak_link)
+                if not is_new_link:
+                    continue
 
-        # Refresh pipeline activation
-        self.update_nodes_and_plugs_activation()
+                # Set a connected_output property
+                if (isinstance(dest_node, ProcessNode) and
+                        isinstance(source_node, ProcessNode)):
+                    source_trait = source_node.process.trait(
+                        source_plug_name)
+                    dest_trait = dest_node.process.trait(dest_plug_name)
+                    if source_trait.output and not dest_trait.output:
+                        dest_trait.connected_output = True
+
+                # Observer
+                source_node.connect(source_plug_name, dest_node,
+                                    dest_plug_name)
+                dest_node.connect(dest_plug_name, source_node,
+                                  source_plug_name)
+            self._propagation_ranks = None
+
+            # Propagate the plug values from sources to destinations
+            for (source_node_name, source_plug_name, source_node, source_plug,
+                 dest_node_name, dest_plug_name, dest_node, dest_plug,
+                 weak_link) in checked_links:
+                value = source_node.get_plug_value(source_plug_name)
+                if value is not None:
+                    dest_node.set_plug_value(dest_plug_name, value)
+
+            # Refresh pipeline activation
+            self.update_nodes_and_plugs_activation()
+        finally:
+            # The activations are updated again even if a link failed
+            self._propagation_ranks = None
+            self.restore_update_nodes_and_plugs_activation()
 
     def remove_link(self, link):
         """ Remove a link between pipeline nodes
@@ -534,15 +690,23 @@ class Pipeline(Process):
          source_plug, dest_node_name, dest_plug_name, dest_node,
         dest_plug) = self.parse_link(link)
 
+        self._remove_link(source_node_name, source_plug_name, dest_node_name,
+                          dest_plug_name)
+
+    def _remove_link(self, source_node_name, source_plug_name, dest_node_name,
+                     dest_plug_name):
+        """ Remove a link between pipeline nodes from its endpoints.
+        """
         # Update plugs memory of the pipeline
-        source_plug.links_to.discard((dest_node_name, dest_plug_name,
-                                      dest_node, dest_plug, True))
-        source_plug.links_to.discard((dest_node_name, dest_plug_name,
-                                      dest_node, dest_plug, False))
-        dest_plug.links_from.discard((source_node_name, source_plug_name,
-                                      source_node, source_plug, True))
-        dest_plug.links_from.discard((source_node_name, source_plug_name,
-                                      source_node, source_plug, False))
+        link = self.link_table.remove(
+            source_node_name, source_plug_name, dest_node_name,
+            dest_plug_name)
+        if link is None:
+            return
+        self._propagation_ranks = None
+        (source_node_name, source_plug_name, source_node, source_plug,
+         dest_node_name, dest_plug_name, dest_node, dest_plug,
+         weak_link) = link
 
         # Set a connected_output property
         if (isinstance(dest_node, ProcessNode) and
@@ -556,6 +720,42 @@ class Pipeline(Process):
         source_node.disconnect(source_plug_name, dest_node, dest_plug_name)
         dest_node.disconnect(dest_plug_name, source_node, source_plug_name)
 
+    def remove_node(self, node_name):
+        """ Remove a node and all its links from the pipeline
+
+        Parameters
+        ----------
+        node_name: str (mandatory)
+            the node name
+        """
+        node = self.nodes[node_name]
+
+        # Remove all the node links
+        links_to_remove = []
+        for plug_name, plug in node.plugs.iteritems():
+            for link in plug.links_to:
+                links_to_remove.append(
+                    (node_name, plug_name, link[0], link[1]))
+            for link in plug.links_from:
+                links_to_remove.append(
+                    (link[0], link[1], node_name, plug_name))
+        for link in links_to_remove:
+            self._remove_link(*link)
+
+        # Remove the node and its activation control
+        del self.nodes[node_name]
+        self.nodes_activation.on_trait_change(
+            self._set_node_enabled, node_name, remove=True)
+        self.nodes_activation.remove_trait(node_name)
+        if isinstance(node, ProcessNode):
+            self.list_process_in_pipeline.remove(node.process)
+        self.node_position.pop(node_name, None)
+        self.do_not_export = set(
+            item for item in self.do_not_export if item[0] != node_name)
+
+        # Refresh pipeline activation
+        self.update_nodes_and_plugs_activation()
+
     def export_parameter(self, node_name, plug_name,
                          pipeline_parameter=None, weak_link=False,
                          is_enabled=None, is_optional=None):
@@ -625,6 +825,159 @@ class Pipeline(Process):
             self.add_link("{0}->{1}.{2}".format(pipeline_parameter,
                                          node_name, plug_name), weak_link)
 
+    def set_lazy_propagation(self, lazy):
+        """ Enable or disable the lazy propagation of the values along the
+        pipeline links.
+
+        In the lazy mode, a plug value modification does not spread through
+        the links immediately: the destination plugs are marked as dirty and
+        their values are only assigned when the pipeline values are settled
+        (see settle_values), each destination at most once. The values are
+        settled when a pipeline parameter is read with get_parameter and
+        before each node execution.
+
+        The mode applies to the sub-pipelines too. Disabling the lazy mode
+        settles the pending values.
+
+        Parameters
+        ----------
+        lazy: bool (mandatory)
+            if True enable the lazy propagation mode.
+
+        Returns
+        -------
+        previous: bool
+            the previous propagation mode.
+        """
+        previous = self._lazy_propagation
+        if not lazy:
+            self.settle_values()
+        self._lazy_propagation = bool(lazy)
+        for node in self.nodes.itervalues():
+            if isinstance(node, PipelineNode) and node is not self.pipeline_node:
+                node.process.set_lazy_propagation(lazy)
+        return previous
+
+    def mark_dirty_plug(self, node, plug_name, value, source_node,
+                        source_plug_name):
+        """ Mark a plug as dirty: its value will be assigned when the
+        pipeline values are settled.
+
+        If the plug is already dirty, only its pending value is updated.
+
+        Parameters
+        ----------
+        node: Node (mandatory)
+            the destination node
+        plug_name: str (mandatory)
+            the destination plug name
+        value: object (mandatory)
+            the pending plug value
+        source_node: Node (mandatory)
+            the node the value comes from
+        source_plug_name: str (mandatory)
+            the plug the value comes from
+        """
+        key = (node, plug_name)
+        # Do not bounce the value assigned during settlement back to its
+        # source plug
+        if key == self._assigning_from:
+            return
+        if key not in self._dirty_plugs:
+            if node is self.pipeline_node:
+                if node.plugs[plug_name].output:
+                    rank = len(self.nodes) + 1
+                else:
+                    rank = 0
+            else:
+                rank = self._get_propagation_ranks().get(
+                    node, len(self.nodes))
+            heapq.heappush(self._dirty_heap, (rank, self._dirty_count, key))
+            self._dirty_count += 1
+        self._dirty_plugs[key] = (value, source_node, source_plug_name)
+
+    def settle_values(self):
+        """ Assign the pending values of the dirty plugs in the lazy
+        propagation mode.
+
+        The dirty plugs are assigned in the links topological order so that
+        each destination is assigned at most once, then the sub-pipelines
+        values are settled, until no plug is dirty anymore.
+
+        Returns
+        -------
+        settled: bool
+            True if at least one value has been assigned.
+        """
+        if not self._lazy_propagation or self._settling:
+            return False
+        self._settling = True
+        settled = False
+        try:
+            while True:
+                has_changed = False
+                while self._dirty_heap:
+                    rank, count, key = heapq.heappop(self._dirty_heap)
+                    value, source_node, source_plug_name = \
+                        self._dirty_plugs.pop(key)
+                    node, plug_name = key
+                    self._assigning_from = (source_node, source_plug_name)
+                    try:
+                        node.set_plug_value(plug_name, value)
+                    finally:
+                        self._assigning_from = None
+                    has_changed = True
+                for node in self.nodes.values():
+                    if (isinstance(node, PipelineNode) and
+                            node is not self.pipeline_node and
+                            node.process.settle_values()):
+                        has_changed = True
+                if not has_changed:
+                    break
+                settled = True
+        finally:
+            self._settling = False
+        return settled
+
+    def _get_propagation_ranks(self):
+        """ Get the nodes ranks in the links topological order.
+
+        The pipeline node is excluded and the nodes involved in cycles are
+        ranked last.
+
+        Returns
+        -------
+        ranks: dict
+            the nodes ranks of the form {node: rank}.
+        """
+        if self._propagation_ranks is None:
+            successors = {}
+            nb_of_predecessors = dict(
+                (node, 0) for node in self.nodes.itervalues()
+                if node is not self.pipeline_node)
+            for link in self.link_table:
+                source_node, dest_node = link[2], link[6]
+                if (source_node is dest_node or
+                        self.pipeline_node in (source_node, dest_node)):
+                    continue
+                successors.setdefault(source_node, []).append(dest_node)
+                nb_of_predecessors[dest_node] += 1
+            todo = [node for node, nb in nb_of_predecessors.iteritems()
+                    if nb == 0]
+            ranks = {}
+            while todo:
+                node = todo.pop()
+                ranks[node] = len(ranks) + 1
+                for dest_node in successors.get(node, []):
+                    nb_of_predecessors[dest_node] -= 1
+                    if nb_of_predecessors[dest_node] == 0:
+                        todo.append(dest_node)
+            for node in nb_of_predecessors:
+                if node not in ranks:
+                    ranks[node] = len(ranks) + 1
+            self._propagation_ranks = ranks
+        return self._propagation_ranks
+
     def _set_node_enabled(self, node_name, is_enabled):
         """ Method to enable or disabled a node
 
@@ -1073,6 +1426,24 @@ class Pipeline(Process):
 
         return workflow_list
 
+    def get_parameter(self, name):
+        """ Method to access the value of a pipeline parameter.
+
+        In the lazy propagation mode, the pending values are settled first.
+
+        Parameters
+        ----------
+        name: str (mandatory)
+            the trait name we want to access
+
+        Returns
+        -------
+        value: object
+            the trait value we want to access
+        """
+        self.settle_values()
+        return super(Pipeline, self).get_parameter(name)
+
     def _run_process(self):
         """ Execution of the pipeline.
 
@@ -1085,14 +1456,24 @@ class Pipeline(Process):
             the execution return results of each node in the worflow
         """
         # Get all the process nodes to execute
-        nodes_list = self.workflow_ordered_nodes()
+        with trace_span(self.id, "scheduling"):
+            self.settle_values()
+            nodes_list = self.workflow_ordered_nodes()
 
         # Go through all process nodes
         returned = []
         for node in nodes_list:
 
-            # Execute the process contained in the node
-            node_ret = node.process()
+            # Resolve the values of the lazy propagation mode
+            self.settle_values()
+
+            # Execute the process contained in the node: the map nodes
+            # create and execute their items processes
+            with trace_span(node.name, "node"):
+                if isinstance(node, MapNode):
+                    node_ret = node.execute()
+                else:
+                    node_ret = node.process()
             returned.append(node_ret)
 
         return returned
@@ -1141,7 +1522,7 @@ class Pipeline(Process):
                     continue # non-null value: not an empty parameter.
                 optional = bool(parameter.optional)
                 valid = True
-                links = list(plug.links_from.union(plug.links_to))
+                links = list(plug.links_from) + list(plug.links_to)
                 if len(links) == 0:
                     if optional:
                         # an optional, non-connected output can stay empty
@@ -10,6 +10,8 @@
 # System import
 import os
 import re
+import sys
+import json
 import logging
 
 # Define the logger
@@ -55,15 +57,19 @@ class IterativeManager(Process):
         # Class parameters
         self.links = []
         self.nodes = []
+        self.process_name = process_name
         self.iterative_traits = iterative_traits
         self.regular_traits = regular_traits
         self.is_input_traits = is_input_traits
+        self.nb_of_items = 0
 
         # Go through all iterative traits
+        nb_of_items = 0
         for trait_name, trait_item in self.iterative_traits.iteritems():
 
             # Unpack trait item
             trait_description, trait_value = trait_item
+            nb_of_items = len(trait_value)
 
             # Clone the iterative traits
             process_trait = clone_trait(trait_description)
@@ -77,78 +83,150 @@ class IterativeManager(Process):
             if is_input_traits:
                 setattr(self, trait_name, trait_value)
 
-            # Unpack the iterative trait
+        # Unpack the iterative traits
+        self.resize(nb_of_items)
 
-            # > get the unpack trait description
-            trait_description = [
-                re.sub("^List_*", "", x) for x in trait_description]
+        # Update regular traits values
+        if is_input_traits:
+            for trait_name, trait_item in self.regular_traits.iteritems():
+
+                # Unpack trait item
+                trait_description, trait_value = trait_item
+
+                # Pass the input trait values to the iterative pipeline
+                setattr(self, trait_name, trait_value)
+
+    def node_name(self, index):
+        """ Get the name of the processing node of an item.
+
+        Parameters
+        ----------
+        index: int (mandatory)
+            the item index.
+
+        Returns
+        -------
+        node_name: str
+            the processing node name.
+        """
+        return "iterative_{0}_{1}".format(self.process_name.lower(), index + 1)
+
+    def item_links(self, index):
+        """ Get the links of an item processing node.
+
+        Parameters
+        ----------
+        index: int (mandatory)
+            the item index.
+
+        Returns
+        -------
+        links: list of 5-uplet
+            the item links descriptions of the form (source_node_name,
+            source_plug_name, dest_node_name, dest_plug_name, weak_link)
+            as expected by the Pipeline.add_links method.
+        """
+        links = []
+        node_name = self.node_name(index)
+        if self.is_input_traits:
+
+            # Link the inputs
+            for reg_trait_name in self.regular_traits:
+                links.append(
+                    ("", reg_trait_name, node_name, reg_trait_name, False))
+
+            # Link the input manager
+            for trait_name in self.iterative_traits:
+                links.append((
+                    "input_manager", "{0}_{1}".format(trait_name, index + 1),
+                    node_name, trait_name, False))
+
+        # Link the output manager
+        else:
+            for trait_name in self.iterative_traits:
+                links.append((
+                    node_name, trait_name, "output_manager",
+                    "{0}_{1}".format(trait_name, index + 1), False))
+
+        return links
+
+    def resize(self, nb_of_items):
+        """ Add or remove the unpack traits so that the manager handles a
+        given number of items.
+
+        Only the unpack traits of the added or removed items are modified:
+        the unpack traits of the kept items are not touched.
+
+        Parameters
+        ----------
+        nb_of_items: int (mandatory)
+            the new number of items.
+
+        Returns
+        -------
+        added_traits: list of str
+            the names of the added unpack traits.
+        removed_traits: list of str
+            the names of the removed unpack traits.
+        """
+        added_traits = []
+        removed_traits = []
+
+        # Remove the last items
+        for cnt in range(self.nb_of_items - 1, nb_of_items - 1, -1):
+            for trait_name in self.iterative_traits:
+                unpack_trait_name = "{0}_{1}".format(trait_name, cnt + 1)
+                self.remove_trait(unpack_trait_name)
+                removed_traits.append(unpack_trait_name)
+            if self.is_input_traits:
+                self.nodes.remove(self.node_name(cnt))
+            for link in self.item_links(cnt):
+                self.links.remove(link)
 
-            # > create the trait and corresponding processing name
-            for cnt, item in enumerate(trait_value):
+        # Add the new items
+        for cnt in range(self.nb_of_items, nb_of_items):
+            for trait_name, trait_item in self.iterative_traits.iteritems():
+
+                # > get the unpack trait description
+                trait_description = [
+                    re.sub("^List_*", "", x) for x in trait_item[0]]
 
                 # Create one unpack trait
                 unpack_trait_name = "{0}_{1}".format(trait_name, cnt + 1)
                 process_trait = clone_trait(trait_description)
                 self.add_trait(unpack_trait_name, process_trait)
                 self.trait(unpack_trait_name).optional = False
-                self.trait(unpack_trait_name).output = is_input_traits
+                self.trait(unpack_trait_name).output = self.is_input_traits
                 self.trait(unpack_trait_name).desc = "unpack iterative trait"
+                added_traits.append(unpack_trait_name)
 
-                # Processing node name
-                node_name = "iterative_{0}_{1}".format(
-                    process_name.lower(), cnt + 1)
-
-                # Add the processing node attached with each unpack input
-                if is_input_traits:
-   
-                    # Add the processing node
-                    if not node_name in self.nodes:
-                        self.nodes.append(node_name)
-
-                    # Link the inputs
-                    for reg_trait_name in self.regular_traits:
-                        self.links.append(
-                            "{0}->{1}.{0}".format(reg_trait_name, node_name))
+            # Add the processing node attached with each unpack input
+            if self.is_input_traits:
+                self.nodes.append(self.node_name(cnt))
+            self.links.extend(self.item_links(cnt))
 
-                    # Link the input manager
-                    self.links.append("input_manager.{0}->{1}.{2}".format(
-                        unpack_trait_name, node_name, trait_name))
+        self.nb_of_items = nb_of_items
 
-                # Link the output manager
-                else:
-                    self.links.append("{0}.{1}->output_manager.{2}".format(
-                        node_name, trait_name, unpack_trait_name))
-
-        # Update regular traits values
-        if is_input_traits:
-            for trait_name, trait_item in self.regular_traits.iteritems():
-
-                # Unpack trait item
-                trait_description, trait_value = trait_item
+        return added_traits, removed_traits
 
-                # Pass the input trait values to the iterative pipeline
-                setattr(self, trait_name, trait_value)
-            
     def _run_process(self):
         """ Ececute this Process: connect the input and ouput traits by
         unpacking the iteative items
         """
         # Go through all iterative traits
-        for trait_name, trait_item in self.iterative_traits.iteritems():
-
-            # Unpack trait item
-            trait_description, trait_value = trait_item
+        for trait_name in self.iterative_traits:
 
             # Unpack or pack the iterative traits depending on the manager type
             packed_value = []
-            for cnt, item in enumerate(trait_value):
+            for cnt in range(self.nb_of_items):
 
                 # Connect manually input and output traits
                 unpack_trait_name = "{0}_{1}".format(trait_name, cnt + 1)
 
                 # Unpack
                 if self.is_input_traits:
-                    setattr(self, unpack_trait_name, trait_value[cnt])
+                    setattr(self, unpack_trait_name,
+                            getattr(self, trait_name)[cnt])
                 # Pack
                 else:
                     packed_value.append(getattr(self, unpack_trait_name))
@@ -171,3 +249,61 @@ class IterativePipeline(Pipeline):
         """ IterativePipeline pipeline definition
         """
         pass
+
+
+##############################################################
+#                  Iterative chunks execution
+##############################################################
+
+def chunk_commandline(commandlines):
+    """ Build a command line that executes several process command lines
+    sequentially in one interpreter.
+
+    The process command lines are of the form
+    ['python', '-c', code, arg1, value1, ...] (see Process.get_commandline).
+    The arguments of all the processes are kept apart at the end of the
+    chunk command line so that the file names can still be modified
+    externally (temporary files, file transfers). As for the process
+    command lines, the chunk python code does not contain single quotes.
+
+    Parameters
+    ----------
+    commandlines: list of list of str (mandatory)
+        the processes command lines.
+
+    Returns
+    -------
+    commandline: list of str
+        the chunk command line.
+    """
+    codes = [commandline[2] for commandline in commandlines]
+    nb_of_args = [len(commandline) - 3 for commandline in commandlines]
+    commandline = [
+        "python",
+        "-c",
+        ("from capsul.pipeline.pipeline_iterative import run_chunk; "
+         "run_chunk({0}, {1})").format(
+             json.dumps(codes), json.dumps(nb_of_args))]
+    for item_commandline in commandlines:
+        commandline.extend(item_commandline[3:])
+    return commandline
+
+
+def run_chunk(codes, nb_of_args):
+    """ Execute sequentially several process command line codes in the
+    current interpreter.
+
+    The processes arguments are read from the command line arguments.
+
+    Parameters
+    ----------
+    codes: list of str (mandatory)
+        the processes command lines python codes.
+    nb_of_args: list of int (mandatory)
+        the number of command line arguments of each process.
+    """
+    args = sys.argv[1:]
+    for code, nb_of_item_args in zip(codes, nb_of_args):
+        sys.argv = [sys.argv[0]] + args[:nb_of_item_args]
+        args = args[nb_of_item_args:]
+        exec code in {"__name__": "__main__"}
@@ -0,0 +1,182 @@
+#! /usr/bin/env python
+##########################################################################
+# CAPSUL - Copyright (C) CEA, 2015
+# Distributed under the terms of the CeCILL-B license, as published by
+# the CEA-CNRS-INRIA. Refer to the LICENSE file or to
+# http://www.cecill.info/licences/Licence_CeCILL-B_V1-en.html
+# for details.
+##########################################################################
+
+""" Index of the links of a pipeline.
+
+Each link (an edge of the pipeline graph) gets an integer identifier and is
+indexed by its source and destination endpoints, so that finding a link,
+removing it or getting its weak flag does not require scanning the plugs
+links sets. The plugs 'links_to' and 'links_from' sets are kept up to date
+by the table and stay the views used by the rest of the code.
+"""
+
+
+class LinkTable(object):
+    """ Table of the links of a pipeline indexed by their endpoints.
+
+    A link endpoint is a (node_name, plug_name) 2-uplet, the empty node name
+    standing for the pipeline node itself.
+
+    Methods
+    -------
+    add
+    remove
+    get
+    edge_id
+    is_weak
+    """
+    def __init__(self):
+        """ Initialize the LinkTable class.
+        """
+        # links: {edge_id: link}
+        #     link: (source_node_name, source_plug_name, source_node,
+        #            source_plug, dest_node_name, dest_plug_name, dest_node,
+        #            dest_plug, weak_link)
+        self._links = {}
+        # edges: {(source_node_name, source_plug_name, dest_node_name,
+        #          dest_plug_name): edge_id}
+        self._edges = {}
+        self._next_edge_id = 0
+
+    def __len__(self):
+        return len(self._links)
+
+    def __iter__(self):
+        return self._links.itervalues()
+
+    def __contains__(self, endpoints):
+        return endpoints in self._edges
+
+    def add(self, source_node_name, source_plug_name, source_node,
+            source_plug, dest_node_name, dest_plug_name, dest_node,
+            dest_plug, weak_link=False):
+        """ Add a link and update the plugs links views.
+
+        If the link already exists, only its weak flag is updated.
+
+        Parameters
+        ----------
+        source_node_name, dest_node_name: str (mandatory)
+            the source and destination node names
+        source_plug_name, dest_plug_name: str (mandatory)
+            the source and destination plug names
+        source_node, dest_node: Node (mandatory)
+            the source and destination nodes
+        source_plug, dest_plug: Plug (mandatory)
+            the source and destination plugs
+        weak_link: bool (optional, default False)
+            the link weak flag
+
+        Returns
+        -------
+        edge_id: int
+            the link identifier.
+        """
+        endpoints = (source_node_name, source_plug_name, dest_node_name,
+                     dest_plug_name)
+        edge_id = self._edges.get(endpoints)
+        if edge_id is not None:
+            if self._links[edge_id][8] == weak_link:
+                return edge_id
+            self._discard_views(self._links[edge_id])
+        else:
+            edge_id = self._next_edge_id
+            self._next_edge_id += 1
+            self._edges[endpoints] = edge_id
+        link = (source_node_name, source_plug_name, source_node, source_plug,
+                dest_node_name, dest_plug_name, dest_node, dest_plug,
+                weak_link)
+        self._links[edge_id] = link
+        source_plug.links_to.add((dest_node_name, dest_plug_name, dest_node,
+                                  dest_plug, weak_link))
+        dest_plug.links_from.add((source_node_name, source_plug_name,
+                                  source_node, source_plug, weak_link))
+        return edge_id
+
+    def remove(self, source_node_name, source_plug_name, dest_node_name,
+               dest_plug_name):
+        """ Remove a link and update the plugs links views.
+
+        Parameters
+        ----------
+        source_node_name, dest_node_name: str (mandatory)
+            the source and destination node names
+        source_plug_name, dest_plug_name: str (mandatory)
+            the source and destination plug names
+
+        Returns
+        -------
+        link: tuple
+            the removed link description of the form (source_node_name,
+            source_plug_name, source_node, source_plug, dest_node_name,
+            dest_plug_name, dest_node, dest_plug, weak_link), None if the
+            link does not exist.
+        """
+        edge_id = self._edges.pop((source_node_name, source_plug_name,
+                                   dest_node_name, dest_plug_name), None)
+        if edge_id is None:
+            return None
+        link = self._links.pop(edge_id)
+        self._discard_views(link)
+        return link
+
+    def get(self, edge_id):
+        """ Get a link from its identifier.
+
+        Parameters
+        ----------
+        edge_id: int (mandatory)
+            the link identifier.
+
+        Returns
+        -------
+        link: tuple
+            the link description (see remove), None if the link does not
+            exist.
+        """
+        return self._links.get(edge_id)
+
+    def edge_id(self, source_node_name, source_plug_name, dest_node_name,
+                dest_plug_name):
+        """ Get a link identifier from its endpoints.
+
+        Returns
+        -------
+        edge_id: int
+            the link identifier, None if the link does not exist.
+        """
+        return self._edges.get((source_node_name, source_plug_name,
+                                dest_node_name, dest_plug_name))
+
+    def is_weak(self, source_node_name, source_plug_name, dest_node_name,
+                dest_plug_name):
+        """ Get the weak flag of a link from its endpoints.
+
+        Returns
+        -------
+        weak_link: bool
+            the link weak flag, None if the link does not exist.
+        """
+        edge_id = self._edges.get((source_node_name, source_plug_name,
+                                   dest_node_name, dest_plug_name))
+        if edge_id is None:
+            return None
+        return self._links[edge_id][8]
+
+    @staticmethod
+    def _discard_views(link):
+        """ Remove a link from its plugs links views.
+        """
+        (source_node_name, source_plug_name, source_node, source_plug,
+         dest_node_name, dest_plug_name, dest_node, dest_plug,
+         weak_link) = link
+        source_plug.links_to.discard((dest_node_name, dest_plug_name,
+                                      dest_node, dest_plug, weak_link))
+        dest_plug.links_from.discard((source_node_name, source_plug_name,
+                                      source_node, source_plug, weak_link))
@@ -8,7 +8,6 @@
 ##########################################################################
 
 # System import
-import numpy
 import logging
 
 # Define the logger
@@ -27,6 +26,7 @@ except ImportError:
 # Capsul import
 from capsul.process import get_process_instance
 from capsul.utils.trait_utils import clone_trait
+from capsul.utils.trait_utils import is_trait_value_defined
 
 # Soma import
 from soma.controller import trait_ids
@@ -171,8 +171,16 @@ class Node(Controller):
     
     def _value_callback(self, source_plug_name, dest_node, dest_plug_name, value):
         """ Spread the source plug value to the destination plug.
-        """     
-        dest_node.set_plug_value(dest_plug_name, value)
+
+        In the pipeline lazy propagation mode, the destination plug is only
+        marked as dirty.
+        """
+        pipeline = dest_node.pipeline
+        if pipeline._lazy_propagation:
+            pipeline.mark_dirty_plug(dest_node, dest_plug_name, value, self,
+                                     source_plug_name)
+        else:
+            dest_node.set_plug_value(dest_plug_name, value)
     
     def connect(self, source_plug_name, dest_node, dest_plug_name):
         """ Connect linked plugs of two nodes
@@ -250,6 +258,41 @@ class Node(Controller):
         """
         self.on_trait_change(callback, plug_name, remove=True)
 
+    def add_plug(self, plug_name, output=False, optional=False):
+        """ Add a plug to the node
+
+        Parameters
+        ----------
+        plug_name: str (mandatory)
+            a plug name
+        output: bool (optional, default False)
+            the plug type (input or output)
+        optional: bool (optional, default False)
+            the plug optional status
+
+        Returns
+        -------
+        plug: Plug
+            the created plug
+        """
+        plug = Plug(output=output, optional=optional)
+        self.plugs[plug_name] = plug
+        plug.on_trait_change(self.pipeline.update_nodes_and_plugs_activation,
+                             "enabled")
+        return plug
+
+    def remove_plug(self, plug_name):
+        """ Remove an unlinked plug from the node
+
+        Parameters
+        ----------
+        plug_name: str (mandatory)
+            a plug name
+        """
+        plug = self.plugs.pop(plug_name)
+        plug.on_trait_change(self.pipeline.update_nodes_and_plugs_activation,
+                             "enabled", remove=True)
+
     def get_plug_value(self, plug_name):
         """ Return the plug value
 
@@ -379,7 +422,7 @@ class ProcessNode(Node):
         """
         if not isinstance(self.get_trait(plug_name).handler,
                           traits.Event):
-            return getattr(self.process, plug_name)
+            return self.process.get_parameter(plug_name)
         else:
             return None
 
@@ -557,12 +600,12 @@ class IterativeNode(Node):
 
             # To refresh the iterative pipeline, need to have the same number
             # of items in iterative traits
-            input_size = numpy.asarray([
+            input_size = [
                 len(getattr(self, trait_name))
-                for trait_name in self.input_iterative_traits])
+                for trait_name in self.input_iterative_traits]
             if len(input_size) != 0:
                 nb_of_inputs = input_size[0]
-                is_valid = (input_size == nb_of_inputs).all()
+                is_valid = (input_size.count(nb_of_inputs) == len(input_size))
             else:
                 nb_of_inputs = 0
                 is_valid = True        
@@ -574,27 +617,37 @@ class IterativeNode(Node):
     def update_iterative_pipeline(self, nb_of_inputs):
         """ Update the pipeline.
 
+        The iterative pipeline is created once, then only the branches of
+        the added or removed items are modified: the processes of the kept
+        items and their parameter values are not touched.
+
         Parameters
         ----------
         nb_of_inputs: int (mandatory)
             the number of input iterative trait items
         """
+        # Create the iterative pipeline
+        if self.process is None:
+            self._create_iterative_pipeline()
+
+        # Add or remove the iterative branches
+        input_manager = self.process.nodes["input_manager"].process
+        if input_manager.nb_of_items != nb_of_inputs:
+            self._resize_iterative_pipeline(nb_of_inputs)
+
+        # Pass the iterative input trait values to the iterative pipeline
+        for trait_name in self.input_iterative_traits:
+            setattr(self.process, trait_name, getattr(self, trait_name))
+
+    def _create_iterative_pipeline(self):
+        """ Create the iterative pipeline with the input/output managers and
+        without iterative branch.
+        """
         # Local import
         from pipeline_iterative import IterativePipeline, IterativeManager
 
-        # Create / recreate the iterative pipeline
-        # > disconnect the iterative process if already crerated
-        if self.process is not None:
-            
-            # Disconnect all iterative process traits and corresponding node
-            #traits
-            for trait_name, callback in self.dynamic_node_callbacks.iteritems():
-                self.on_trait_change(callback, trait_name, remove=True)
-            for trait_name, callback in self.dynamic_process_callbacks.iteritems():
-                self.process.on_trait_change(callback, trait_name, remove=True)
-           
         # > create the iterative pipeline
-        self.process = IterativePipeline()       
+        self.process = IterativePipeline()
 
         # Go through all input regular traits
         pipeline_node = self.process.nodes[""]
@@ -613,8 +666,7 @@ class IterativeNode(Node):
         iterative_traits = {}
         for trait_name, trait_item in self.input_iterative_traits.iteritems():
             trait_description, trait = trait_item
-            iterative_traits[trait_name] = (
-                trait_description, getattr(self, trait_name))
+            iterative_traits[trait_name] = (trait_description, [])
         regular_traits = {}
         for trait_name, trait_item in self.input_traits.iteritems():
             trait_description, trait = trait_item
@@ -626,8 +678,7 @@ class IterativeNode(Node):
         iterative_traits = {}
         for trait_name, trait_item in self.output_iterative_traits.iteritems():
             trait_description, trait = trait_item
-            iterative_traits[trait_name] = (
-                trait_description, [""] * nb_of_inputs)
+            iterative_traits[trait_name] = (trait_description, [])
         output_manager = IterativeManager(
             self.iterative_process.name, iterative_traits, None,
             is_input_traits=False)
@@ -636,18 +687,6 @@ class IterativeNode(Node):
         self.process.add_process("input_manager", input_manager)
         self.process.add_process("output_manager", output_manager)
 
-        # Add processing nodes to the pipeline: only attached to input manager
-        for node_name in input_manager.nodes:
-            self.process.add_process(
-                node_name, self.iterative_process.id,
-                self.do_not_export, self.make_optional, **self.kwargs)
-
-        # Add link to manager
-        for link in input_manager.links:
-            self.process.add_link(link)
-        for link in output_manager.links:
-            self.process.add_link(link)
-
         # Auto export nodes parameters
         self.process.autoexport_nodes_parameters()
 
@@ -691,26 +730,77 @@ class IterativeNode(Node):
             self.dynamic_process_callbacks[trait_name] = callback
 
         # Get the largest element size
-        element_sizes = []
+        element_sizes = [len(x) for x in self.process.nodes]
         for node_name, node in self.process.nodes.iteritems():
-            element_sizes.append(len(node_name))
             element_sizes.extend([len(x) for x in node.plugs])
-        fixed_width = numpy.asarray(element_sizes).max() * 10.
+        self._fixed_width = max(element_sizes) * 10.
 
         # Get the number of elements in the processing node
-        fixed_height = len(self.iterative_process.user_traits()) * 50.
+        self._fixed_height = len(self.iterative_process.user_traits()) * 50.
 
         # Set iterative pipeline node positions
         self.process.node_position = {
-            "inputs": (0 * fixed_width, 0.),
-            "input_manager": (1 * fixed_width, 0),
-            "output_manager": (3 * fixed_width, 0.),
-            "outputs": (4 * fixed_width, 0.),
+            "inputs": (0 * self._fixed_width, 0.),
+            "input_manager": (1 * self._fixed_width, 0),
+            "output_manager": (3 * self._fixed_width, 0.),
+            "outputs": (4 * self._fixed_width, 0.),
         }
-        shift = round(len(input_manager.nodes) / 2)
-        for cnt, node_name in enumerate(input_manager.nodes):
-            self.process.node_position[node_name] = (
-                2 * fixed_width, (cnt - shift) * fixed_height)
+
+    def _resize_iterative_pipeline(self, nb_of_inputs):
+        """ Add or remove iterative branches so that the iterative pipeline
+        handles a given number of items.
+
+        Parameters
+        ----------
+        nb_of_inputs: int (mandatory)
+            the number of input iterative trait items
+        """
+        input_manager_node = self.process.nodes["input_manager"]
+        output_manager_node = self.process.nodes["output_manager"]
+        input_manager = input_manager_node.process
+        nb_of_items = input_manager.nb_of_items
+
+        # Delay the activation update until all branches are modified
+        self.process.delay_update_nodes_and_plugs_activation()
+
+        # Remove the branches of the removed items
+        for cnt in range(nb_of_inputs, nb_of_items):
+            self.process.remove_node(input_manager.node_name(cnt))
+
+        # Add or remove the managers unpack traits and corresponding plugs
+        for manager_node in (input_manager_node, output_manager_node):
+            added_traits, removed_traits = manager_node.process.resize(
+                nb_of_inputs)
+            for trait_name in removed_traits:
+                manager_node.remove_plug(trait_name)
+            for trait_name in added_traits:
+                trait = manager_node.process.trait(trait_name)
+                manager_node.add_plug(trait_name, output=bool(trait.output),
+                                      optional=bool(trait.optional))
+
+        # Add processing nodes to the pipeline: only attached to input manager.
+        # The nodes processes are copies of the iterative process.
+        new_items = range(nb_of_items, nb_of_inputs)
+        self.process.add_process_copies(
+            [input_manager.node_name(cnt) for cnt in new_items],
+            self.iterative_process, self.do_not_export, self.make_optional,
+            **self.kwargs)
+
+        # Add the new branches links to the managers
+        output_manager = output_manager_node.process
+        links = []
+        for cnt in new_items:
+            links.extend(input_manager.item_links(cnt))
+            links.extend(output_manager.item_links(cnt))
+        self.process.add_links(links)
+
+        # Set iterative pipeline processing node positions
+        shift = round(nb_of_inputs / 2)
+        for cnt in range(nb_of_inputs):
+            self.process.node_position[input_manager.node_name(cnt)] = (
+                2 * self._fixed_width, (cnt - shift) * self._fixed_height)
+
+        self.process.restore_update_nodes_and_plugs_activation()
 
     @staticmethod
     def update_iterative_process(iterative_node, parent, trait_name, old, new):
@@ -742,6 +832,144 @@ class IterativeNode(Node):
         setattr(iterative_node, trait_name,
                 getattr(iterative_node.process, trait_name)) 
 
+class MapNode(IterativeNode):
+    """ A virtual iterative node that stays a single node of constant size.
+
+    Contrary to the IterativeNode, no iterative pipeline is built: the
+    per-item processes are created on demand from the iterative process
+    (the prototype) at execution time, and the executors expand the node
+    into parallel jobs only at dispatch.
+    The node 'process' attribute is the prototype process.
+
+    Consecutive items can be grouped in chunks: each chunk is executed as a
+    single job that runs the items processes in a loop.
+    """
+    def __init__(self, pipeline, name, process, iterative_plugs, do_not_export,
+                 make_optional, chunk_size=1, **kwargs):
+        """ Initialize the MapNode class.
+
+        Parameters
+        ----------
+        pipeline: Pipeline (mandatory)
+            the pipeline object where the node is added
+        name: str (mandatory)
+            the node name
+        process: instance or string
+            a process/interface instance or the corresponding string
+            description
+        iterative_plugs: list of str (optional)
+            a list of plug names on which we want to iterate
+        do_not_export: list of str (optional)
+            a list of plug names that we do not want to export
+        make_optional: list of str (optional)
+            a list of plug names that we do not want to export
+        chunk_size: int (optional, default 1)
+            the number of consecutive items executed in one job.
+        """
+        if chunk_size < 1:
+            raise ValueError(
+                "Invalid chunk size '{0}', expect a strictly positive "
+                "integer.".format(chunk_size))
+        self.chunk_size = chunk_size
+        self.nb_of_items = 0
+        super(MapNode, self).__init__(
+            pipeline, name, process, iterative_plugs, do_not_export,
+            make_optional, **kwargs)
+        self.process = self.iterative_process
+
+    def update_iterative_pipeline(self, nb_of_inputs):
+        """ Update the number of items: no process is created.
+
+        Parameters
+        ----------
+        nb_of_inputs: int (mandatory)
+            the number of input iterative trait items
+        """
+        self.nb_of_items = nb_of_inputs
+
+    def item_process(self, index):
+        """ Create the process of an item from the prototype.
+
+        Parameters
+        ----------
+        index: int (mandatory)
+            the item index.
+
+        Returns
+        -------
+        process: Process
+            a new process with the regular parameter values and the item
+            iterative parameter values.
+        """
+        process = self.iterative_process.clone()
+        for trait_name in self.input_traits:
+            process.set_parameter(trait_name, getattr(self, trait_name))
+        for trait_name in self.input_iterative_traits:
+            process.set_parameter(trait_name, getattr(self, trait_name)[index])
+
+        # Output values already known (ie. completed by a FOM) are also
+        # passed to the item process
+        for trait_name in self.output_iterative_traits:
+            values = getattr(self, trait_name)
+            if index < len(values) and is_trait_value_defined(values[index]):
+                process.set_parameter(trait_name, values[index])
+
+        return process
+
+    def item_processes(self):
+        """ Create the processes of all the items.
+
+        Returns
+        -------
+        processes: list of Process
+            the items processes.
+        """
+        return [self.item_process(cnt) for cnt in range(self.nb_of_items)]
+
+    def item_chunks(self, processes):
+        """ Group the items processes in chunks of consecutive items.
+
+        Parameters
+        ----------
+        processes: list of Process (mandatory)
+            the items processes.
+
+        Returns
+        -------
+        chunks: list of list of Process
+            the items processes of each chunk.
+        """
+        return [processes[cnt: cnt + self.chunk_size]
+                for cnt in range(0, len(processes), self.chunk_size)]
+
+    def pack_outputs(self, processes):
+        """ Set the node iterative outputs from the items processes outputs.
+
+        Parameters
+        ----------
+        processes: list of Process (mandatory)
+            the items processes.
+        """
+        for trait_name in self.output_iterative_traits:
+            setattr(self, trait_name, [
+                process.get_parameter(trait_name) for process in processes])
+
+    def execute(self):
+        """ Execute sequentially the items processes and pack their outputs.
+
+        Returns
+        -------
+        returned: list
+            the execution return results of each item process.
+        """
+        processes = self.item_processes()
+        returned = []
+        for chunk in self.item_chunks(processes):
+            returned.extend([process() for process in chunk])
+        self.pack_outputs(processes)
+        return returned
+
+
 class Switch(Node):
     """ Switch node to select a specific Process.
 
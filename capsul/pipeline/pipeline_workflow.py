@@ -13,13 +13,15 @@ A single available function:
 workflow = workflow_from_pipeline(pipeline)
 """
 import os
-from socket import getfqdn
 
 import soma_workflow.client as swclient
 
-from capsul.pipeline import Pipeline, Switch
+from capsul.pipeline import Pipeline, Switch, MapNode
 from capsul.process import Process
 from capsul.pipeline.topological_sort import Graph
+from capsul.pipeline.pipeline_iterative import chunk_commandline
+from capsul.utils.file_formats import files_group
+from capsul.utils.runtime_context import get_hostname
 from traits.api import Directory, Undefined, File, Str, Any
 
 
@@ -45,25 +47,6 @@ def workflow_from_pipeline(pipeline, study_config={}):
         # must inerit a string type since it is used as a trait value
         pass
 
-    def _files_group(path, merged_formats):
-        bname = os.path.basename(path)
-        l0 = len(path) - len(bname)
-        p0 = 0
-        paths = [path]
-        while True:
-            p = bname.find('.', p0)
-            if p < 0:
-                break
-            ext = bname[p:]
-            p0 = p + 1
-            format_def = merged_formats.get(ext)
-            if format_def:
-                path0 = path[:l0 + p]
-                paths += [path0 + e[0] for e in format_def]
-                break
-        paths.append(path + '.minf')
-        return paths
-
     def build_job(process, temp_map={}, shared_map={}, transfers=[{}, {}],
                   shared_paths={}):
         """ Create a soma-workflow Job from a Capsul Process
@@ -179,6 +162,32 @@ def workflow_from_pipeline(pipeline, study_config={}):
                 =output_replaced_paths \
                     + [x[0] for x in oproc_transfers.values()])
 
+    def build_chunk_job(name, item_jobs):
+        """ Merge several jobs in a job that executes them sequentially
+
+        Parameters
+        ----------
+        name: str (mandatory)
+            the chunk job name
+        item_jobs: list of Job (mandatory)
+            the jobs we want to merge
+
+        Returns
+        -------
+        job: Job
+            the soma-workflow Job instance that will execute all the jobs
+        """
+        input_files = []
+        output_files = []
+        for job in item_jobs:
+            input_files.extend(job.referenced_input_files)
+            output_files.extend(job.referenced_output_files)
+        return swclient.Job(
+            name=name,
+            command=chunk_commandline([job.command for job in item_jobs]),
+            referenced_input_files=input_files,
+            referenced_output_files=output_files)
+
     def build_group(name, jobs):
         """ Create a group of jobs
 
@@ -209,6 +218,7 @@ def workflow_from_pipeline(pipeline, study_config={}):
 
     def assign_temporary_filenames(pipeline):
         ''' Find and temporarily assign necessary temporary file names'''
+        pipeline.settle_values()
         temp_filenames = pipeline.find_empty_parameters()
         temp_map = {}
         count = 0
@@ -230,6 +240,7 @@ def workflow_from_pipeline(pipeline, study_config={}):
             temp_map[tmp_file] = (swf_tmp, node, plug_name, optional)
             # set a TempFile value to identify the params / value
             setattr(process, plug_name, tmp_file)
+        pipeline.settle_values()
         return temp_map
 
     def restore_empty_filenames(temporary_map):
@@ -323,7 +334,7 @@ def workflow_from_pipeline(pipeline, study_config={}):
                         continue
                     todo_plugs.append((node, param_name, output))
 
-    def _get_transfers(pipeline, transfer_paths, merged_formats):
+    def _get_transfers(pipeline, transfer_paths):
         """ Create and list FileTransfer objects needed in the pipeline.
 
         Parameters
@@ -358,13 +369,46 @@ def workflow_from_pipeline(pipeline, study_config={}):
                         transfer_item = swclient.FileTransfer(
                             is_input=not output,
                             client_path=path,
-                            client_paths=_files_group(path, merged_formats))
+                            client_paths=files_group(path))
                         _propagate_transfer(pipeline.pipeline_node, param,
                                             path, not output, transfers,
                                             transfer_item)
                         break
         return transfers
 
+    def aligned_map_nodes(source_node, dest_node):
+        """ Check if two map nodes form an aligned iterative chain
+
+        Two map nodes are aligned if they have the same number of items and
+        if the destination node is only linked to the source node through
+        iterative parameters: item i of the destination node then only
+        depends on item i of the source node.
+
+        Parameters
+        ----------
+        source_node: MapNode (mandatory)
+            the source map node
+        dest_node: MapNode (mandatory)
+            the destination map node
+
+        Returns
+        -------
+        aligned: bool
+            True if the items of the two nodes can be chained directly
+        """
+        if source_node.nb_of_items != dest_node.nb_of_items:
+            return False
+        is_linked = False
+        for plug_name, plug in dest_node.plugs.iteritems():
+            for link in plug.links_from:
+                if link[2] is not source_node:
+                    continue
+                if (plug_name not in dest_node.input_iterative_traits or
+                        link[1] not in source_node.output_iterative_traits):
+                    return False
+                is_linked = True
+        return is_linked
+
     def workflow_from_graph(graph, temp_map={}, shared_map={},
                             transfers=[{}, {}], shared_paths={}):
         """ Convert a CAPSUL graph to a soma-workflow workflow
@@ -398,11 +442,65 @@ def workflow_from_pipeline(pipeline, study_config={}):
         dependencies = set()
         group_nodes = {}
 
+        # Jobs executing each item of the map nodes: {map_node: [job]}
+        map_item_jobs = {}
+
+        def is_map_graph_node(node):
+            """ Check if a graph node contains a map node.
+            """
+            return (isinstance(node.meta, list) and
+                    isinstance(node.meta[0], MapNode))
+
+        def expand_map_node(node):
+            """ Convert a map node as a group of parallel jobs, one job per
+            chunk of consecutive items.
+
+            The preceding map nodes are expanded first: the items processes
+            are created and their outputs are packed before the dependant
+            items processes are created.
+            """
+            map_node = node.meta[0]
+            if map_node in map_item_jobs:
+                return
+            for pnode in node.links_from:
+                if is_map_graph_node(pnode):
+                    expand_map_node(pnode)
+            item_processes = map_node.item_processes()
+            map_node.pack_outputs(item_processes)
+            chunk_jobs = []
+            item_jobs = []
+            for cnt, chunk in enumerate(map_node.item_chunks(item_processes)):
+                chunk_item_jobs = [
+                    build_job(process, temp_map, shared_map, transfers,
+                              shared_paths)
+                    for process in chunk]
+                if len(chunk_item_jobs) == 1:
+                    job = chunk_item_jobs[0]
+                else:
+                    job = build_chunk_job(
+                        "{0}_chunk_{1}".format(node.name, cnt + 1),
+                        chunk_item_jobs)
+                jobs[chunk[0]] = job
+                chunk_jobs.append(job)
+                item_jobs.extend([job] * len(chunk))
+            group = build_group(node.name, chunk_jobs)
+            groups[map_node] = group
+            root_groups[map_node] = group
+            map_item_jobs[map_node] = item_jobs
+
+        # Expand the map nodes first
+        for node_name, node in graph._nodes.iteritems():
+            if is_map_graph_node(node):
+                expand_map_node(node)
+
         # Go through all graph nodes
         for node_name, node in graph._nodes.iteritems():
             # If the the node meta is a Graph store it
             if isinstance(node.meta, Graph):
                 group_nodes[node_name] = node
+            # Map nodes are already expanded
+            elif isinstance(node.meta[0], MapNode):
+                continue
             # Otherwise convert all the processes in meta as jobs
             else:
                 sub_jobs = {}
@@ -432,47 +530,41 @@ def workflow_from_pipeline(pipeline, study_config={}):
             groups.update(sub_groups)
             dependencies.update(sub_deps)
 
+        def get_job(node):
+            """ Get the job or group corresponding to a graph node.
+            """
+            if isinstance(node.meta, list):
+                if isinstance(node.meta[0], MapNode):
+                    return groups[node.meta[0]]
+                if node.meta[0].process in jobs:
+                    return jobs[node.meta[0].process]
+            return groups[node.meta]
+
         # Add dependencies between a source job and destination jobs
         for node_name, node in graph._nodes.iteritems():
             # Source job
-            if isinstance(node.meta, list) and node.meta[0].process in jobs:
-                sjob = jobs[node.meta[0].process]
-            else:
-                sjob = groups[node.meta]
+            sjob = get_job(node)
             # Destination jobs
             for dnode in node.links_to:
-                if isinstance(dnode.meta, list) and dnode.meta[0].process in jobs:
-                    djob = jobs[dnode.meta[0].process]
-                else:
-                    djob = groups[dnode.meta]
+                # Aligned map nodes: item i of the destination node only
+                # depends on item i of the source node, the items can flow
+                # through the chain independently
+                if (is_map_graph_node(node) and is_map_graph_node(dnode) and
+                        aligned_map_nodes(node.meta[0], dnode.meta[0])):
+                    dependencies.update(zip(map_item_jobs[node.meta[0]],
+                                            map_item_jobs[dnode.meta[0]]))
+                    continue
+                djob = get_job(dnode)
                 dependencies.add((sjob, djob))
 
         return jobs, dependencies, groups, root_groups, root_jobs
 
-    # TODO: handle formats in a separate, centralized place
-    # formats: {name: ext_props}
-    #     ext_props: {ext: [dependent_exts]}
-    #     dependent_exts: (ext, mandatory)
-    formats = {
-        'NIFTI-1': {'.nii': [], '.img': [('.hdr', True)], '.nii.gz': []},
-        'GIS': {'.ima': [('.dim', True)]},
-        'GIFTI': {'.gii': []},
-        'MESH': {'.mesh': []},
-        'ARG': {'.arg': [('.data', False)]},
-    }
-    # transform it to an ext-based dict
-    # merged_formats: {ext: [dependent_exts]}
-    # (formats names are lost here)
-    merged_formats = {}
-    for format, values in formats.iteritems():
-        merged_formats.update(values)
-
     temp_map = assign_temporary_filenames(pipeline)
     temp_subst_list = [(x1, x2[0]) for x1, x2 in temp_map.iteritems()]
     temp_subst_map = dict(temp_subst_list)
     shared_map = {}
     swf_paths = _get_swf_paths(study_config)
-    transfers = _get_transfers(pipeline, swf_paths[0], merged_formats)
+    transfers = _get_transfers(pipeline, swf_paths[0])
 
     # Get a graph
     graph = pipeline.workflow_graph()
@@ -502,7 +594,7 @@ def local_workflow_run(workflow_name, workflow):
     workflow: Workflow (mandatory)
         the soma-workflow workflow
     """
-    localhost = getfqdn().split(".")[0]
+    localhost = get_hostname().split(".")[0]
     controller = swclient.WorkflowController(localhost)
     wf_id = controller.submit_workflow(workflow=workflow, name=workflow_name)
     swclient.Helper.wait_workflow(wf_id, controller)
@@ -8,7 +8,9 @@
 ##########################################################################
 
 # System import
+import os
 import sys
+import subprocess
 import unittest
 
 # Trait import
@@ -17,6 +19,7 @@ from traits.api import String, Float
 # Capsul import
 from capsul.process import Process
 from capsul.pipeline import Pipeline
+from capsul.pipeline.pipeline_iterative import chunk_commandline
 
 
 class DummyProcess(Process):
@@ -67,6 +70,40 @@ class MyPipeline(Pipeline):
         self.scene_scale_factor = 1.0
 
 
+class MyMapPipeline(Pipeline):
+    """ Simple Pipeline to test the virtual map node
+    """
+    def pipeline_definition(self):
+        """ Define the pipeline.
+        """
+        # Create a virtual iterative processe
+        self.add_iterative_process(
+            "iterative", "capsul.pipeline.test.test_iterative_process.DummyProcess",
+            iterative_plugs=[
+                "input_image", "output_image", "dynamic_parameter",
+                "other_output"], virtual=True)
+
+
+class MyMapChainPipeline(Pipeline):
+    """ Simple Pipeline to test a chain of virtual map nodes
+    """
+    def pipeline_definition(self):
+        """ Define the pipeline.
+        """
+        # Create two chained virtual iterative processes
+        for name in ("first", "second"):
+            self.add_iterative_process(
+                name, "capsul.pipeline.test.test_iterative_process.DummyProcess",
+                iterative_plugs=[
+                    "input_image", "output_image", "dynamic_parameter",
+                    "other_output"], virtual=True)
+        self.add_link("first.output_image->second.input_image")
+        for name in ("dynamic_parameter", "other_input"):
+            self.export_parameter("first", name)
+            self.add_link("{0}->second.{0}".format(name))
+        self.export_parameter("first", "other_output", "first_other_output")
+
+
 class TestPipeline(unittest.TestCase):
     """ Class to test a pipeline with an iterative node
     """
@@ -111,6 +148,143 @@ class TestPipeline(unittest.TestCase):
                          [self.pipeline.other_input, self.pipeline.other_input])
 
 
+    def test_iterative_pipeline_resize(self):
+        """ Method to test if the iterative branches are added or removed
+        without modifying the other branches.
+        """
+        iterative_node = self.pipeline.nodes["iterative"]
+        iterative_pipeline = iterative_node.process
+        first_process = iterative_pipeline.nodes[
+            "iterative_dummyprocess_1"].process
+
+        # Add one item
+        self.pipeline.input_image = ["toto", "tutu", "titi"]
+        self.pipeline.dynamic_parameter = [3, 1, 4]
+        self.assertTrue(iterative_node.process is iterative_pipeline)
+        self.assertTrue(iterative_pipeline.nodes[
+            "iterative_dummyprocess_1"].process is first_process)
+        self.assertTrue("iterative_dummyprocess_3" in iterative_pipeline.nodes)
+        self.assertTrue(
+            "input_image_3" in iterative_pipeline.nodes["input_manager"].plugs)
+        self.assertEqual(
+            iterative_pipeline.nodes["iterative_dummyprocess_3"].process.
+            other_input, 5)
+
+        # Remove two items
+        self.pipeline.input_image = ["toto"]
+        self.pipeline.dynamic_parameter = [3]
+        self.assertEqual(
+            sorted(iterative_pipeline.nodes.keys()),
+            ["", "input_manager", "iterative_dummyprocess_1",
+             "output_manager"])
+        self.assertFalse(
+            "input_image_2" in iterative_pipeline.nodes["input_manager"].plugs)
+        self.assertFalse(
+            iterative_pipeline.nodes["input_manager"].process.trait(
+                "input_image_2"))
+        self.pipeline()
+        self.assertEqual(self.pipeline.output_image, ["toto:5.0:3.0"])
+
+
+    def test_map_node(self):
+        """ Method to test if a virtual map node stays a single node and
+        creates the items processes at execution time.
+        """
+        pipeline = MyMapPipeline()
+        map_node = pipeline.nodes["iterative"]
+        nb_of_plugs = len(map_node.plugs)
+        pipeline.input_image = ["toto", "tutu", "titi"]
+        pipeline.dynamic_parameter = [3, 1, 4]
+        pipeline.other_input = 5
+        self.assertEqual(sorted(pipeline.nodes.keys()), ["", "iterative"])
+        self.assertEqual(len(map_node.plugs), nb_of_plugs)
+        self.assertEqual(map_node.nb_of_items, 3)
+
+        # Test the items processes
+        item_process = map_node.item_process(1)
+        self.assertEqual(
+            (item_process.input_image, item_process.dynamic_parameter,
+             item_process.other_input), ("tutu", 1., 5.))
+
+        # Test the execution
+        pipeline()
+        self.assertEqual(
+            pipeline.output_image,
+            ["toto:5.0:3.0", "tutu:5.0:1.0", "titi:5.0:4.0"])
+        self.assertEqual(pipeline.other_output, [5., 5., 5.])
+
+        # Test the workflow expansion
+        try:
+            from capsul.pipeline.pipeline_workflow import (
+                workflow_from_pipeline)
+        except ImportError:
+            return
+        workflow = workflow_from_pipeline(pipeline)
+        self.assertEqual(len(workflow.jobs), 3)
+        self.assertEqual(len(workflow.root_group), 1)
+
+    def test_map_node_chain(self):
+        """ Method to test if the items of chained map nodes only depend on
+        the matching item of the previous map node.
+        """
+        pipeline = MyMapChainPipeline()
+        pipeline.input_image = ["toto", "tutu", "titi"]
+        pipeline.dynamic_parameter = [3, 1, 4]
+        pipeline()
+        self.assertEqual(
+            pipeline.output_image,
+            ["toto:6.0:3.0:6.0:3.0", "tutu:6.0:1.0:6.0:1.0",
+             "titi:6.0:4.0:6.0:4.0"])
+
+        # Test the workflow item-level dependencies
+        try:
+            from capsul.pipeline.pipeline_workflow import (
+                workflow_from_pipeline)
+        except ImportError:
+            return
+        workflow = workflow_from_pipeline(pipeline)
+        self.assertEqual(len(workflow.jobs), 6)
+        self.assertEqual(len(workflow.dependencies), 3)
+        source_jobs, dest_jobs = zip(*workflow.dependencies)
+        self.assertEqual(len(set(source_jobs)), 3)
+        self.assertEqual(len(set(dest_jobs)), 3)
+
+    def test_map_node_chunks(self):
+        """ Method to test if the consecutive items of a map node are
+        executed in chunks.
+        """
+        pipeline = MyMapPipeline()
+        map_node = pipeline.nodes["iterative"]
+        map_node.chunk_size = 2
+        pipeline.input_image = ["toto", "tutu", "titi"]
+        pipeline.dynamic_parameter = [3, 1, 4]
+        pipeline.other_input = 5
+        chunks = map_node.item_chunks(map_node.item_processes())
+        self.assertEqual([len(chunk) for chunk in chunks], [2, 1])
+        pipeline()
+        self.assertEqual(
+            pipeline.output_image,
+            ["toto:5.0:3.0", "tutu:5.0:1.0", "titi:5.0:4.0"])
+
+        # Test the chunk command line
+        commandline = chunk_commandline(
+            [process.get_commandline() for process in chunks[0]])
+        self.assertEqual(commandline[:2], ["python", "-c"])
+        returncode = subprocess.call(
+            [sys.executable] + commandline[1:],
+            env=dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path)))
+        self.assertEqual(returncode, 0)
+
+        # Test the workflow chunk jobs
+        try:
+            from capsul.pipeline.pipeline_workflow import (
+                workflow_from_pipeline)
+        except ImportError:
+            return
+        workflow = workflow_from_pipeline(pipeline)
+        self.assertEqual(len(workflow.jobs), 2)
+
+
 def test():
     """ Function to execute unitest
     """
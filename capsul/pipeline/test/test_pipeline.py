@@ -73,6 +73,97 @@ class TestPipeline(unittest.TestCase):
         self.pipeline.workflow_ordered_nodes()
         self.assertEqual(self.pipeline.workflow_repr, "")
 
+    def test_add_links(self):
+        self.pipeline.add_process(
+            "node3", "capsul.pipeline.test.test_pipeline.DummyProcess")
+        node3 = self.pipeline.nodes["node3"]
+        nb_of_links = len(node3.plugs["input_image"].links_from)
+
+        # An invalid link prevents all the links to be added
+        self.assertRaises(
+            ValueError, self.pipeline.add_links,
+            [("node2", "output_image", "node3", "input_image", False),
+             ("node2", "input_image", "node3", "other_input", False)])
+        self.assertEqual(len(node3.plugs["input_image"].links_from),
+                         nb_of_links)
+
+        # Add the links and propagate the values
+        self.pipeline.other_input = 2.
+        self.pipeline.add_links(
+            [("node2", "output_image", "node3", "input_image", False),
+             ("", "other_input", "node3", "other_input", True)])
+        self.assertEqual(len(node3.plugs["input_image"].links_from),
+                         nb_of_links + 1)
+        self.assertEqual(node3.process.other_input, 2.)
+        self.pipeline.other_input = 3.
+        self.assertEqual(node3.process.other_input, 3.)
+        self.assertTrue(
+            ("", "other_input", self.pipeline.pipeline_node,
+             self.pipeline.pipeline_node.plugs["other_input"], True)
+            in node3.plugs["other_input"].links_from)
+
+        # A failing propagation does not stop the activations updates
+        def failing_set_plug_value(plug_name, value):
+            raise RuntimeError(plug_name)
+        node3.set_plug_value = failing_set_plug_value
+        self.assertRaises(
+            RuntimeError, self.pipeline.add_links,
+            [("node1", "output_image", "node3", "input_image", False)])
+        self.assertEqual(
+            self.pipeline._disable_update_nodes_and_plugs_activation, 0)
+
+    def test_link_table(self):
+        link_table = self.pipeline.link_table
+        endpoints = ("node1", "output_image", "node2", "input_image")
+        self.assertTrue(endpoints in link_table)
+        self.assertFalse(link_table.is_weak(*endpoints))
+        edge_id = link_table.edge_id(*endpoints)
+        self.assertEqual(link_table.get(edge_id)[:2], endpoints[:2])
+
+        # Re-adding a link only changes its weak flag
+        self.pipeline.add_link("node1.output_image->node2.input_image",
+                               weak_link=True)
+        self.assertTrue(link_table.is_weak(*endpoints))
+        self.assertEqual(link_table.edge_id(*endpoints), edge_id)
+        plug = self.pipeline.nodes["node2"].plugs["input_image"]
+        self.assertEqual(
+            len([link for link in plug.links_from if link[0] == "node1"]), 1)
+
+        # Remove the link
+        self.pipeline.remove_link("node1.output_image->node2.input_image")
+        self.assertFalse(endpoints in link_table)
+        self.assertEqual(link_table.is_weak(*endpoints), None)
+        self.assertEqual(
+            len([link for link in plug.links_from if link[0] == "node1"]), 0)
+
+    def test_lazy_propagation(self):
+        node2 = self.pipeline.nodes["node2"].process
+        changes = []
+        node2.on_trait_change(
+            lambda value: changes.append(value), "other_input")
+        self.pipeline.set_lazy_propagation(True)
+
+        # The values are pending until they are settled
+        self.pipeline.other_input = 1.
+        self.pipeline.nodes["node1"].process.other_output = 2.
+        self.pipeline.nodes["node1"].process.other_output = 3.
+        self.assertEqual(changes, [])
+        self.assertTrue(self.pipeline.settle_values())
+        self.assertEqual(changes, [3.])
+        self.assertEqual(self.pipeline.nodes["node1"].process.other_input, 1.)
+
+        # Reading a pipeline parameter settles the values
+        self.pipeline.nodes["node1"].process.other_output = 4.
+        self.assertEqual(self.pipeline.get_parameter("other_input"), 1.)
+        self.assertEqual(changes, [3., 4.])
+
+        # Disabling the lazy mode settles the values
+        self.pipeline.nodes["node1"].process.other_output = 5.
+        self.pipeline.set_lazy_propagation(False)
+        self.assertEqual(changes, [3., 4., 5.])
+        self.pipeline.nodes["node1"].process.other_output = 6.
+        self.assertEqual(changes, [3., 4., 5., 6.])
+
 
 def test():
     """ Function to execute unitest
@@ -8,4 +8,4 @@
 ##########################################################################
 
 from process import Process, NipypeProcess, ProcessResult, FileCopyProcess
-from loader import get_process_instance
+from loader import get_process_instance, get_process_class
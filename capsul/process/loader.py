@@ -8,6 +8,7 @@
 ##########################################################################
 
 # System import
+import sys
 import logging
 
 # Define the logger
@@ -17,13 +18,44 @@ logger = logging.getLogger(__name__)
 from process import Process
 from nipype_process import nipype_factory
 from capsul.utils import load_objects
+from capsul.utils.loader import is_module_modified
 
-# Nipype import
-try:
-    from nipype.interfaces.base import Interface
-# If nipype is not found create a dummy Interface class
-except ImportError:
-    Interface = type("Interface", (object, ), {})
+
+# Global parameters
+# Process classes resolved from their string description: {id: class}
+_process_classes = {}
+
+
+def get_nipype_interface_class(force_import=False):
+    """ Get the nipype base Interface class.
+
+    Nipype is slow to import: it is imported only if it is already loaded
+    or if 'force_import' is True.
+
+    Parameters
+    ----------
+    force_import: bool (optional, default False)
+        if True, import nipype if necessary.
+
+    Returns
+    -------
+    interface_class: class
+        the nipype Interface class, or a dummy class if nipype is not
+        loaded or not available.
+    """
+    if force_import or "nipype.interfaces.base" in sys.modules:
+        try:
+            from nipype.interfaces.base import Interface
+            return Interface
+        except ImportError:
+            pass
+    return _DummyInterface
+
+
+class _DummyInterface(object):
+    """ Class used when nipype is not available: nothing is an instance of
+    this class.
+    """
 
 
 def get_process_instance(process_or_id, **kwargs):
@@ -53,6 +85,10 @@ def get_process_instance(process_or_id, **kwargs):
     result: instance
         an initialized process instance.
     """
+    # The nipype interface class: if nipype is not loaded, no object can be
+    # a nipype interface instance
+    Interface = get_nipype_interface_class()
+
     # If the function 'process_or_id' parameter is already a Process
     # instance.
     if isinstance(process_or_id, Process):
@@ -67,35 +103,15 @@ def get_process_instance(process_or_id, **kwargs):
     # description
     elif isinstance(process_or_id, basestring):
 
-        # Get the class and module names from the class string description
-        id_list = process_or_id.split(".")
-        module_name = ".".join(id_list[:-1])
-        object_name = id_list[-1]
-
-        # Try to load the class
-        try:
-            module_objects = load_objects(
-                module_name, object_name,
-                allowed_instances=[Process, Interface])
-        except ImportError:
-            module_objects = []
-
-        # Expect only one Process
-        if len(module_objects) != 1:
-            raise ImportError(
-                "Found {0} processes declared "
-                "in {1} when looking for {2} class".format(
-                    len(module_objects), module_name, object_name))
-
-        # Get the target Process
-        process_class = module_objects[0]
+        # Get the target Process class
+        process_class = get_process_class(process_or_id)
 
         # Get the process class instance
         result = process_class()
 
         # If we have a Nipype interface, wrap this structure in a Process
         # class
-        if isinstance(result, Interface):
+        if not isinstance(result, Process):
             result = nipype_factory(result)
 
     # If the function 'process_or_id' parameter is a Process
@@ -114,3 +130,69 @@ def get_process_instance(process_or_id, **kwargs):
         result.set_parameter(name, value)
 
     return result
+
+
+def get_process_class(process_id, reload_module=False):
+    """ Return a Process or Nipype interface class given its string
+    description.
+
+    The string description is of the form `<module>.<class>`. Classes are
+    resolved once and then cached: the module is reloaded only if
+    'reload_module' is True or if the module source file has been
+    modified.
+
+    .. note:
+
+        If no class is found an ImportError error is raised.
+
+    Parameters
+    ----------
+    process_id: str (mandatory)
+        the class string description.
+    reload_module: bool (optional, default False)
+        if True, reload the class module.
+
+    Returns
+    -------
+    process_class: class
+        the Process or Interface class.
+    """
+    # Get the class and module names from the class string description
+    id_list = process_id.split(".")
+    module_name = ".".join(id_list[:-1])
+    object_name = id_list[-1]
+
+    # Use the cached class if the module has not been modified nor
+    # reloaded (ie. to get another class of the same module)
+    process_class = _process_classes.get(process_id)
+    if (process_class is not None and not reload_module and
+            not is_module_modified(module_name) and
+            getattr(sys.modules.get(module_name), object_name,
+                    None) is process_class):
+        return process_class
+
+    # Try to load the class: nipype is loaded only if the class module
+    # requires it
+    try:
+        module_objects = load_objects(
+            module_name, object_name, reload_module=reload_module)
+        allowed_instances = (Process, get_nipype_interface_class())
+        module_objects = [
+            item for item in module_objects
+            if issubclass(item, allowed_instances) and
+            item not in allowed_instances]
+    except ImportError:
+        module_objects = []
+
+    # Expect only one Process
+    if len(module_objects) != 1:
+        raise ImportError(
+            "Found {0} processes declared "
+            "in {1} when looking for {2} class".format(
+                len(module_objects), module_name, object_name))
+
+    # Get the target Process
+    process_class = module_objects[0]
+    _process_classes[process_id] = process_class
+
+    return process_class
@@ -8,11 +8,9 @@
 ##########################################################################
 
 # System import
-import sys
 import os
 import types
 import logging
-import traceback
 
 # Define the logger
 logger = logging.getLogger(__name__)
@@ -22,14 +20,20 @@ from traits.trait_base import _Undefined
 from traits.api import Directory, CTrait
 
 # CAPSUL import
-from capsul.utils.trait_utils import trait_ids
-from capsul.utils.trait_utils import build_expression
-from capsul.utils.trait_utils import eval_trait
+from capsul.utils.trait_utils import build_trait
+from capsul.utils.trait_utils import copy_trait
+from capsul.utils import get_tool_version
 
 # Capsul import
 from process import NipypeProcess
 
 
+# Global parameters
+# Process traits converted from the nipype traits:
+# {(interface class, nipype version): (input_prototypes, output_prototypes)}
+_nipype_prototypes = {}
+
+
 def nipype_factory(nipype_instance):
     """ From a nipype class instance generate dynamically a process
     instance that encapsulate the nipype instance.
@@ -62,10 +66,9 @@ def nipype_factory(nipype_instance):
     _list_outputs
     _gen_filename
     _parse_inputs
-    relax_exists_constrain
     sync_nypipe_traits
     sync_process_output_traits
-    clone_nipype_trait
+    get_nipype_prototypes
     """
 
     ####################################################################
@@ -217,31 +220,6 @@ def nipype_factory(nipype_instance):
     # Define functions to synchronized the process and interface traits
     ####################################################################
 
-    def relax_exists_constrain(trait):
-        """ Relax the exist constrain of a trait
-
-        Parameters
-        ----------
-        trait: trait
-            a trait that will be relaxed from the exist constrain
-        """
-        # If we have a single trait, just modify the 'exists' contrain
-        # if specified
-        if hasattr(trait.handler, "exists"):
-            trait.handler.exists = False
-
-        # If we have a selector, call the 'relax_exists_constrain' on each
-        # selector inner components.
-        main_id = trait.handler.__class__.__name__
-        if main_id == "TraitCompound":
-            for sub_trait in trait.handler.handlers:
-                sub_c_trait = CTrait(0)
-                sub_c_trait.handler = sub_trait
-                relax_exists_constrain(sub_c_trait)
-        elif len(trait.inner_traits) > 0:
-            for sub_c_trait in trait.inner_traits:
-                relax_exists_constrain(sub_c_trait)
-
     def sync_nypipe_traits(process_instance, name, old, value):
         """ Event handler function to update the nipype interface traits
 
@@ -277,52 +255,97 @@ def nipype_factory(nipype_instance):
         value: type (manndatory)
             the old trait value
         """
-        # Get all the input traits
-        input_traits = process_instance.traits(output=False)
-
-        # Try to update all the output process instance traits values when
-        # a process instance input trait is modified.
-        if name in input_traits:
-
-            # Try to set all the process instance output traits values from
-            # the nipype autocompleted traits values
-            try:
-                nipype_outputs = (process_instance.
-                                  _nipype_interface._list_outputs())
-
-                # Synchronize traits: check file existance
-                for out_name, out_value in nipype_outputs.iteritems():
-
-                    # Get trait type
-                    trait_type = trait_ids(
-                        process_instance._nipype_interface.output_spec().
-                        trait(out_name))
-
-                    # Set the output process trait value
-                    # If we have a file check that the file exists before
-                    # setting the new value
-                    if (trait_type[0] is not "File" or
-                       os.path.isfile(repr(out_value))):
-
-                        process_instance.set_parameter(
-                            "_" + out_name, out_value)
-
-            # If we can't update the output process instance traits values,
-            # print a logging debug message.
-            except Exception:
-                ex_type, ex, tb = sys.exc_info()
-                logger.debug(
-                    "Something wrong in the nipype output trait "
-                    "synchronization:\n\n\tError: {0} - {1}\n"
-                    "\tTraceback:\n{2}".format(
-                        ex_type, ex, "".join(traceback.format_tb(tb))))
+        process_instance._update_nipype_outputs()
 
     ####################################################################
-    # Clone nipype traits
+    # Add the converted nipype traits
     ####################################################################
 
+    # Get the process traits converted from the nipype traits: the
+    # conversion is done once per interface class
+    input_prototypes, output_prototypes = get_nipype_prototypes(
+        nipype_instance, process_instance)
+
+    # Add the process traits in bulk from copies of the prototypes
+    # > input traits
+    for trait_name, prototype in input_prototypes:
+        process_instance.add_trait(trait_name, copy_trait(prototype))
+    # > output traits
+    for trait_name, prototype in output_prototypes:
+        process_instance.add_trait(trait_name, copy_trait(prototype))
+
+    # Add the callback to update nipype traits when a process input
+    # trait is modified.
+    # Syncronized also the output_directory input
+    input_names = [item[0] for item in input_prototypes] + ["output_directory"]
+    process_instance.on_trait_change(sync_nypipe_traits, name=input_names)
+
+    # Add callback to synchronize output process instance traits with nipype
+    # autocompleted output traits when a process input trait is modified
+    process_instance.on_trait_change(
+        sync_process_output_traits, name=input_names)
+
+    return process_instance
+
+
+def get_nipype_prototypes(nipype_instance, process_instance):
+    """ Get the process traits converted from a nipype interface traits.
+
+    The conversion is done once per nipype interface class and nipype
+    version: the converted traits are cached as prototypes that must be
+    copied (see copy_trait) before being added to a process instance.
+
+    Since nipype inputs and outputs are separated and thus can have
+    the same names, the nipype process outputs are prefixed with '_'.
+    The nipype inputs that collide with a process attribute are prefixed
+    with 'nipype_'.
+
+    Parameters
+    ----------
+    nipype_instance : instance (mandatory)
+        a nipype interface instance.
+    process_instance : instance (mandatory)
+        the process instance that will encapsulate the nipype instance.
+
+    Returns
+    -------
+    input_prototypes: list of 2-uplet
+        the (process trait name, trait prototype) process inputs.
+    output_prototypes: list of 2-uplet
+        the (process trait name, trait prototype) process outputs.
+    """
+    # Check the cache
+    key = (nipype_instance.__class__, get_tool_version("nipype"))
+    if key in _nipype_prototypes:
+        return _nipype_prototypes[key]
+
+    def relax_exists_constrain(trait):
+        """ Relax the exist constrain of a trait
+
+        Parameters
+        ----------
+        trait: trait
+            a trait that will be relaxed from the exist constrain
+        """
+        # If we have a single trait, just modify the 'exists' contrain
+        # if specified
+        if hasattr(trait.handler, "exists"):
+            trait.handler.exists = False
+
+        # If we have a selector, call the 'relax_exists_constrain' on each
+        # selector inner components.
+        main_id = trait.handler.__class__.__name__
+        if main_id == "TraitCompound":
+            for sub_trait in trait.handler.handlers:
+                sub_c_trait = CTrait(0)
+                sub_c_trait.handler = sub_trait
+                relax_exists_constrain(sub_c_trait)
+        elif len(trait.inner_traits) > 0:
+            for sub_c_trait in trait.inner_traits:
+                relax_exists_constrain(sub_c_trait)
+
     # The following function is not shared since it is too specific
-    def clone_nipype_trait(nipype_trait):
+    def clone_nipype_trait(nipype_trait, output):
         """ Create a new trait (cloned and converrted if necessary)
         from a nipype trait.
 
@@ -330,6 +353,8 @@ def nipype_factory(nipype_instance):
         ----------
         nipype_trait: trait
             the nipype trait we want to clone and convert if necessary.
+        output: bool
+            the process trait output status.
 
         Returns
         -------
@@ -338,17 +363,22 @@ def nipype_factory(nipype_instance):
             instance.
         """
         # Clone the nipype trait
-        expression = build_expression(nipype_trait)
-        process_trait = eval_trait(expression)
+        process_trait = build_trait(nipype_trait)
 
-        # Copy some information from the nipype trait
-        process_trait.desc = nipype_trait.desc
-        process_trait.optional = not nipype_trait.mandatory
+        # Need to copy all the nipype trait information
+        process_trait._metadata.update({
+            "desc": nipype_trait.desc,
+            "optional": not nipype_trait.mandatory,
+            "output": output
+        })
+        if output:
+            process_trait._metadata["enabled"] = False
 
         return process_trait
 
-    # Add nipype traits to the process instance
+    # Convert the nipype traits
     # > input traits
+    input_prototypes = []
     for trait_name, trait in nipype_instance.input_spec().items():
 
         # Check if trait name already used in calss attributes:
@@ -361,44 +391,15 @@ def nipype_factory(nipype_instance):
         relax_exists_constrain(trait)
 
         # Clone the nipype trait
-        process_trait = clone_nipype_trait(trait)
-
-        # Add the cloned trait to the process instance
-        process_instance.add_trait(trait_name, process_trait)
-
-        # Need to copy all the nipype trait information
-        process_instance.trait(trait_name).optional = not trait.mandatory
-        process_instance.trait(trait_name).desc = trait.desc
-        process_instance.trait(trait_name).output = False
-
-        # Add the callback to update nipype traits when a process input
-        # trait is modified
-        process_instance.on_trait_change(sync_nypipe_traits, name=trait_name)
+        input_prototypes.append(
+            (trait_name, clone_nipype_trait(trait, output=False)))
 
-    # Syncronized also the output_directory input
-    process_instance.on_trait_change(sync_nypipe_traits, name="output_directory")
-
-    # Add callback to synchronize output process instance traits with nipype
-    # autocompleted output traits
-    process_instance.on_trait_change(sync_process_output_traits)
-
-    # > output traits
+    # > output traits: the process trait name is the nipype trait name
+    # prefixed by '_'
+    output_prototypes = []
     for trait_name, trait in nipype_instance.output_spec().items():
+        output_prototypes.append(
+            ("_" + trait_name, clone_nipype_trait(trait, output=True)))
 
-        # Clone the nipype trait
-        process_trait = clone_nipype_trait(trait)
-
-        # Create the output process trait name: nipype trait name prefixed
-        # by '_'
-        private_name = "_" + trait_name
-
-        # Add the cloned trait to the process instance
-        process_instance.add_trait(private_name, process_trait)
-
-        # Need to copy all the nipype trait information
-        process_instance.trait(private_name).optional = not trait.mandatory
-        process_instance.trait(private_name).desc = trait.desc
-        process_instance.trait(private_name).output = True
-        process_instance.trait(private_name).enabled = False
-
-    return process_instance
+    _nipype_prototypes[key] = (input_prototypes, output_prototypes)
+    return input_prototypes, output_prototypes
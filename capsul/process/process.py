@@ -9,13 +9,13 @@
 
 # System import
 import os
-from socket import getfqdn
 from datetime import datetime as datetime
-from copy import deepcopy
 import json
 import subprocess
 import logging
 import shutil
+import sys
+import traceback
 
 # Define the logger
 logger = logging.getLogger(__name__)
@@ -31,8 +31,13 @@ from soma.utils import LateBindingProperty
 
 # Capsul import
 from capsul.utils import get_tool_version
+from capsul.utils.file_formats import copy_files_group, remove_files_group
+from capsul.utils.runtime_context import (
+    get_hostname, get_environment_capture, save_environment,
+    get_resource_usage, resource_usage)
+from capsul.utils.execution_trace import trace_span
 from capsul.utils.trait_utils import (
-    is_trait_value_defined, is_trait_pathname, get_trait_desc)
+    is_trait_value_defined, is_trait_pathname, get_trait_desc, copy_trait)
 
 
 class ProcessMeta(Controller.__metaclass__):
@@ -160,14 +165,16 @@ class Process(Controller):
         # Get the process class
         process = self.__class__
 
-        # Initialize the execution report
+        # Initialize the execution report: the host name and environment
+        # are captured once and shared by all the execution reports
+        # (see capsul.utils.runtime_context)
         runtime = {
             "start_time": datetime.isoformat(datetime.utcnow()),
             "cwd": os.getcwd(),
             "returncode": None,
-            "environ": deepcopy(os.environ.data),
+            "environ": get_environment_capture(),
             "end_time": None,
-            "hostname": getfqdn(),
+            "hostname": get_hostname(),
         }
 
         # Set process parameters if extra arguments are passed
@@ -187,10 +194,14 @@ class Process(Controller):
                 setattr(self, arg_name, arg_val)
 
         # Execute the process
-        returncode = self._run_process()
+        start_usage = get_resource_usage()
+        with trace_span(self.id, "process_body"):
+            returncode = self._run_process()
 
-        # Set the execution stop time in the execution report
+        # Set the execution stop time and the used resources in the
+        # execution report
         runtime["end_time"] = datetime.isoformat(datetime.utcnow())
+        runtime["resource_usage"] = resource_usage(start_usage)
 
         # Set the dependencies versions in the execution report
         runtime["versions"] = self.versions
@@ -202,10 +213,65 @@ class Process(Controller):
 
         return results
 
+    def clone(self):
+        """ Create a copy of the process instance.
+
+        The copy is a new instance of the process class with the same
+        parameters (including the parameters dynamically added to this
+        instance) and the same parameter values. It is faster than
+        resolving and instanciating the process from its string description.
+
+        .. note:
+
+            Processes that expect some arguments at construction time have
+            to redefine this method.
+
+        Returns
+        -------
+        process: Process
+            the process copy.
+        """
+        process = self.__class__()
+        self._copy_parameters(process)
+        return process
+
     ####################################################################
     # Private methods
     ####################################################################
 
+    def _copy_parameters(self, process, outputs=True):
+        """ Copy the parameters definitions and values of this instance to
+        another process instance.
+
+        Parameters
+        ----------
+        process: Process (mandatory)
+            the process that will receive the parameters.
+        outputs: bool (optional, default True)
+            if False, do not copy the output parameter values.
+        """
+        process_traits = process.user_traits()
+        for trait_name, trait in self.user_traits().iteritems():
+
+            # Add the missing parameters
+            if trait_name not in process_traits:
+                process.add_trait(trait_name, copy_trait(trait))
+
+            # Copy the modified parameter values only
+            if trait.output and not outputs:
+                continue
+            # (array values cannot be compared with '!=')
+            value = getattr(self, trait_name)
+            current_value = getattr(process, trait_name)
+            if value is current_value:
+                continue
+            try:
+                modified = bool(value != current_value)
+            except ValueError:
+                modified = True
+            if modified:
+                setattr(process, trait_name, value)
+
     def _run_process(self):
         """ Method that contains the processings.
 
@@ -273,6 +339,8 @@ class Process(Controller):
 
         If the class attribute `log_file` is not set, a log.json output
         file is generated in the process call current working directory.
+        If only the environment hash is captured in the execution report,
+        the environment is saved once next to the log file.
 
         Parameters
         ----------
@@ -294,6 +362,11 @@ class Process(Controller):
         with open(self.log_file, "w") as f:
             f.write(unicode(json_struct))
 
+        # Save the environment referenced by its hash
+        if isinstance(exec_info.get("environ"), basestring):
+            save_environment(os.path.dirname(os.path.abspath(self.log_file)),
+                             exec_info["environ"])
+
     @classmethod
     def help(cls, returnhelp=False):
         """ Method to print the full help.
@@ -623,13 +696,15 @@ class FileCopyProcess(Process):
                 self.process.set_parameter(name, value)
 
             # Copy the desired items
-            self._update_input_traits()
+            with trace_span(self.id, "file_staging"):
+                self._update_input_traits()
 
             # Inheritance
             result = super(FileCopyProcess, self).__call__(**self.copied_inputs)
 
             # Clean the workspace
-            self._clean_workspace()
+            with trace_span(self.id, "file_cleaning"):
+                self._clean_workspace()
 
             return result
 
@@ -665,11 +740,12 @@ class FileCopyProcess(Process):
             for val in python_object:
                 self._rm_files(val)
 
-        # Otherwise start the deletion if the object is a file
+        # Otherwise start the deletion if the object is a file: remove the
+        # whole file group (ie. '.img' + '.hdr')
         else:
             if (isinstance(python_object, basestring) and
                     os.path.isfile(python_object)):
-                os.remove(python_object)      
+                remove_files_group(python_object)
 
     def _update_input_traits(self):
         """ Update the process input traits: input files are copied.
@@ -712,7 +788,7 @@ class FileCopyProcess(Process):
                 out = tuple(out)
 
         # Otherwise start the copy (with metadata cp -p) if the object is
-        # a file
+        # a file: the companion files of the file format are copied too
         else:
             out = python_object
             if (python_object is not Undefined and
@@ -725,9 +801,7 @@ class FileCopyProcess(Process):
                     destdir = self.destination
                 if not os.path.exists(destdir):
                     os.makedirs(destdir)
-                fname = os.path.basename(python_object)
-                out = os.path.join(destdir, fname)
-                shutil.copy2(python_object, out)
+                out = copy_files_group(python_object, destdir)[0][1]
 
         return out
 
@@ -794,9 +868,13 @@ class NipypeProcess(FileCopyProcess):
             private attribute to store the nipye class name
         _nipype_interface_name : str
             private attribute to store the nipye interface name
+        _nipype_outputs : dict
+            private attribute to store the output trait values set from the
+            nipype outputs
         """
         # Set some class attributes that characterize the nipype interface
         self._nipype_interface = nipype_instance
+        self._nipype_outputs = {}
         self._nipype_module = nipype_instance.__class__.__module__
         self._nipype_class = nipype_instance.__class__.__name__
         self._nipype_interface_name = self._nipype_module.split(".")[2]
@@ -906,13 +984,73 @@ class NipypeProcess(FileCopyProcess):
         results.runtime["returncode"] = returncode.runtime.returncode
 
         # Set the nipype outputs to the execution report
+        nipype_outputs = self._nipype_interface._list_outputs()
         outputs = dict(
-            ("_" + x[0], self._nipype_interface._list_outputs()[x[0]])
-            for x in returncode.outputs.get().iteritems())
+            ("_" + name, nipype_outputs[name])
+            for name in returncode.outputs.get())
         results.outputs = outputs
 
         return results
 
+    def clone(self):
+        """ Create a copy of the process instance.
+
+        A new nipype interface of the same class is wrapped (the converted
+        traits are cached per interface class) and the input parameter
+        values are copied, the outputs are synchronized again.
+
+        Returns
+        -------
+        process: NipypeProcess
+            the process copy.
+        """
+        from .nipype_process import nipype_factory
+        process = nipype_factory(self._nipype_interface.__class__())
+        self._copy_parameters(process, outputs=False)
+        return process
+
+    def _update_nipype_outputs(self):
+        """ Update the process output traits from the nipype outputs.
+
+        This method is called when an input trait is modified: the nipype
+        outputs are listed once. A File output is only set if the file
+        exists. An output previously set by this method that cannot be
+        updated is reset to Undefined in order not to keep a value computed
+        from the previous inputs.
+
+        The outputs may not be resolved (ie. some mandatory inputs are
+        not set): in this case a logging debug message is printed.
+        """
+        try:
+            nipype_outputs = self._nipype_interface._list_outputs()
+            output_spec = self._nipype_interface.output_spec()
+        except Exception:
+            nipype_outputs = {}
+            ex_type, ex, tb = sys.exc_info()
+            logger.debug(
+                "Something wrong in the nipype output trait "
+                "synchronization:\n\n\tError: {0} - {1}\n"
+                "\tTraceback:\n{2}".format(
+                    ex_type, ex, "".join(traceback.format_tb(tb))))
+
+        # Set the output process traits values: if we have a file check
+        # that the file exists before setting the new value
+        synchronized_outputs = {}
+        for name, value in nipype_outputs.iteritems():
+            if (trait_ids(output_spec.trait(name))[0] == "File" and
+                    not (isinstance(value, basestring) and
+                         os.path.isfile(value))):
+                continue
+            self.set_parameter("_" + name, value)
+            synchronized_outputs["_" + name] = value
+
+        # Reset the out of date values
+        for trait_name, value in self._nipype_outputs.iteritems():
+            if (trait_name not in synchronized_outputs and
+                    getattr(self, trait_name) == value):
+                self.set_parameter(trait_name, Undefined)
+        self._nipype_outputs = synchronized_outputs
+
     def set_output_directory(self, out_dir):
         """ Set the process output directory.
 
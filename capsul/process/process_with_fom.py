@@ -6,11 +6,13 @@ except ImportError:
     from enthought.traits.api import Str
 
 from soma.controller import Controller
+from soma.sorted_dictionary import SortedDictionary
 from capsul.pipeline import Pipeline
 from soma.application import Application
 from soma.fom import DirectoryAsDict
 from soma.path import split_path
 from capsul.study_config.study_config import StudyConfig
+from capsul.study_config.config_modules.fom_config import FomCompletionCache
 
 
 class ProcessWithFom(Controller):
@@ -59,6 +61,7 @@ class ProcessWithFom(Controller):
     -------
     create_completion
     create_attributes_with_fom
+    batch_completion
     """
     def __init__(self, process, study_config, name=None):
         super(ProcessWithFom, self).__init__()
@@ -68,6 +71,10 @@ class ProcessWithFom(Controller):
         else:
             self.name = name
         self.study_config = study_config
+        # The FOM completion data are created by the FomConfig module
+        if (isinstance(study_config, StudyConfig) and
+                'FomConfig' in study_config.modules):
+            study_config.require_module('FomConfig')
         self.list_process_iteration = []
         self.attributes = {}
         self.create_attributes_with_fom()
@@ -104,8 +111,7 @@ class ProcessWithFom(Controller):
     def create_attributes_with_fom(self):
         """To get useful attributes by the fom"""
 
-        input_atp = self.study_config.modules_data.fom_atp['input']
-        output_atp = self.study_config.modules_data.fom_atp['output']
+        cache = self.completion_cache()
         input_fom = self.study_config.modules_data.foms['input']
         output_fom = self.study_config.modules_data.foms['output']
 
@@ -121,8 +127,7 @@ class ProcessWithFom(Controller):
                 % repr(names_search_list))
         for parameter in fom_patterns:
             process_attributes.update(
-                input_atp.find_discriminant_attributes(
-                    fom_parameter=parameter))
+                cache.discriminant_attributes('input', parameter))
 
         for att in process_attributes:
             if not att.startswith('fom_'):
@@ -139,8 +144,7 @@ class ProcessWithFom(Controller):
             process_attributes2 = set()
             for parameter in output_fom.patterns[self.process.name]:
                 process_attributes2.update(
-                    output_atp.find_discriminant_attributes(
-                        fom_parameter=parameter))
+                    cache.discriminant_attributes('output', parameter))
 
             for att in process_attributes2:
                 if not att.startswith('fom_'):
@@ -156,6 +160,24 @@ class ProcessWithFom(Controller):
                         self.add_trait(att, Str(self.attributes[att]))
 
 
+    def completion_cache(self):
+        """Get the FOM completion cache of the study configuration.
+
+        The cache is created if the study configuration has none or if the
+        FOMs have been reloaded since its creation.
+
+        Returns
+        -------
+        cache: FomCompletionCache
+            the completion cache.
+        """
+        modules_data = self.study_config.modules_data
+        cache = getattr(modules_data, 'fom_completion_cache', None)
+        if cache is None or cache.atps is not modules_data.fom_atp:
+            cache = FomCompletionCache(modules_data.fom_atp)
+            modules_data.fom_completion_cache = cache
+        return cache
+
     def find_attributes(self, value):
         """By the path, find value of attributes"""
 
@@ -207,6 +229,13 @@ class ProcessWithFom(Controller):
         '''Completes the given process parameters according to the attributes
         set.
 
+        The completion runs top-down: the parameters of a pipeline are
+        completed first, then the ones of its nodes and sub-pipelines. Once a
+        parameter is completed, it is blocked, as well as all the parameters
+        linked to it, so that each parameter is assigned once by the most
+        specific rule. The assignments are then applied in a single batch
+        with the pipeline values propagation deferred.
+
         Parameters
         ----------
         process: Process / Pipeline: (mandatory)
@@ -221,37 +250,115 @@ class ProcessWithFom(Controller):
         '''
         if name is None:
             name = self.name
+        plan, found = self.completion_plan(process, name, verbose)
+
+        # Collect the completed values: {(process, parameter): value}
+        completion = SortedDictionary()
+        for entry, value in self._evaluate_completion(
+                plan, self.attributes, verbose):
+            completion[(entry[0], entry[1])] = value
+        self._apply_completion(process, completion, verbose)
+        if not found:
+            raise KeyError('Process not found in FOMs amongst %s' \
+                % repr((name, process.id, process.name)))
+
+    def batch_completion(self, attributes_rows, name=None, verbose=False):
+        '''Completes the process parameters for several attributes sets
+        without modifying the process.
+
+        The rules matching is shared between the rows: the completion plan is
+        built once and the paths lookups are memoized.
+
+        Parameters
+        ----------
+        attributes_rows: list of dict (mandatory)
+            the attributes sets (ie. one per subject). The missing attributes
+            take their current value.
+        name: string (optional)
+            name under which the process will be searched in the FOM.
+        verbose: bool (optional)
+            issue warnings when a process cannot be found in the FOM list.
+            Default: False
+
+        Returns
+        -------
+        completions: list of dict
+            the completed parameters of each row of the form {parameter:
+            value}. The nodes parameters are prefixed by the nodes names
+            ('node.parameter').
+        '''
+        if name is None:
+            name = self.name
+        plan, found = self.completion_plan(self.process, name, verbose)
+        if not found:
+            raise KeyError('Process not found in FOMs amongst %s' \
+                % repr((name, self.process.id, self.process.name)))
+        completions = []
+        for row in attributes_rows:
+            attributes = self.attributes.copy()
+            attributes.update(row)
+            completions.append(dict(
+                (entry[2], value)
+                for entry, value in self._evaluate_completion(
+                    plan, attributes, verbose)))
+        return completions
+
+    def completion_plan(self, process, name, verbose=False):
+        '''Get the attributes independent part of the completion.
 
+        Parameters
+        ----------
+        process: Process / Pipeline: (mandatory)
+            process on which perform completion
+        name: string (mandatory)
+            name under which the process will be searched in the FOM
+        verbose: bool (optional)
+            issue warnings when a process cannot be found in the FOM list.
+            Default: False
+
+        Returns
+        -------
+        plan: list of tuple
+            the parameters to complete in the top-down order of the form
+            (process, parameter, parameter_name, fom_type, fom_process,
+            discriminant_attributes, linked_parameters).
+        found: bool
+            True if the process has been found in the FOM.
+        '''
+        plan = []
+        found = self._collect_completion_plan(
+            process, name, None, "", plan, verbose)
+        return plan, found
+
+    def _collect_completion_plan(self, process, name, node, prefix, plan,
+                                 verbose):
+        '''Collect the completion plan of a process, then of its nodes if
+        it is a pipeline.
+
+        Parameters
+        ----------
+        process: Process / Pipeline: (mandatory)
+            process on which perform completion
+        name: string (mandatory)
+            name under which the process will be searched in the FOM
+        node: Node (mandatory)
+            the node of the process in its parent pipeline, None for the top
+            level process
+        prefix: str (mandatory)
+            the prefix of the process parameters names
+        plan: list (mandatory)
+            the completion plan (see completion_plan), updated in place
+        verbose: bool (mandatory)
+            issue warnings when a process cannot be found in the FOM list.
+
+        Returns
+        -------
+        found: bool
+            True if the process has been found in the FOM.
+        '''
         #input_fom = self.study_config.modules_data.foms['input']
         output_fom = self.study_config.modules_data.foms['output']
-        input_atp = self.study_config.modules_data.fom_atp['input']
-        output_atp = self.study_config.modules_data.fom_atp['output']
-
-        # if process is a pipeline, create completions for its nodes and
-        # sub-pipelines.
-        #
-        # Note: for now we do so first, so that parameters can be overwritten
-        # afterwards by the higher-level pipeline FOM.
-        # Ideally we should process the other way: complete high-level,
-        # specific parameters first, then complete with lower-level, more
-        # generic ones, while blocking already set ones.
-        # as this blocking mechanism does not exist yet, we do it this way for
-        # now, but it is sub-optimal since many parameters will be set many
-        # times.
-        if isinstance(process, Pipeline):
-            for node_name, node in process.nodes.iteritems():
-                if node_name == '':
-                    continue
-                if hasattr(node, 'process'):
-                    subprocess = node.process
-                    try:
-                        pname = '.'.join([name, node_name])
-                        self.process_completion(subprocess, pname)
-                    except Exception, e:
-                        if verbose:
-                            print 'warning, node %s could not complete FOM' \
-                                % node_name
-                            print e
+        cache = self.completion_cache()
 
         #Create completion
         names_search_list = (name, process.id, process.name)
@@ -260,29 +367,156 @@ class ProcessWithFom(Controller):
             if fom_patterns is not None:
                 break
         else:
-            raise KeyError('Process not found in FOMs amongst %s' \
-                % repr(names_search_list))
+            fom_patterns = None
+            if node is not None and verbose:
+                print 'warning, node %s could not complete FOM' % name
 
-        for parameter in fom_patterns:
+        if isinstance(process, Pipeline):
+            plugs = process.pipeline_node.plugs
+        elif node is not None:
+            plugs = node.plugs
+        else:
+            plugs = {}
+        for parameter in fom_patterns or {}:
             # Select only the attributes that are discriminant for this
             # parameter otherwise other attibutes can prevent the appropriate
             # rule to match
             if parameter in process.user_traits():
                 if process.trait(parameter).output:
-                    atp = output_atp
+                    fom_type = 'output'
                 else:
-                    atp = input_atp
-                parameter_attributes = [ 'fom_process' ] \
-                    + atp.find_discriminant_attributes(
-                        fom_parameter=parameter )
-                d = dict( ( i, self.attributes[ i ] ) \
-                    for i in parameter_attributes if i in self.attributes )
-                #d = dict( ( i, getattr(self, i) or self.attributes[ i ] ) \
-                #    for i in parameter_attributes if i in self.attributes )
-                d['fom_parameter'] = parameter
-                d['fom_format'] = 'fom_prefered'
-                for h in atp.find_paths(d):
-                    setattr(process, parameter, h[0])
+                    fom_type = 'input'
+                parameter_attributes = cache.discriminant_attributes(
+                    fom_type, parameter)
+                linked = set()
+                if parameter in plugs:
+                    self._block_linked_parameters(plugs[parameter], linked)
+                plan.append((process, parameter, prefix + parameter,
+                             fom_type, fname, parameter_attributes, linked))
+
+        # If process is a pipeline, create completions for its nodes and
+        # sub-pipelines: their parameters linked to the already completed
+        # ones are blocked. A node that cannot be completed does not prevent
+        # the completion of the others.
+        if isinstance(process, Pipeline):
+            for node_name, sub_node in process.nodes.iteritems():
+                if node_name == '':
+                    continue
+                if hasattr(sub_node, 'process'):
+                    pname = '.'.join([name, node_name])
+                    try:
+                        self._collect_completion_plan(
+                            sub_node.process, pname, sub_node,
+                            prefix + node_name + '.', plan, verbose)
+                    except Exception, e:
+                        if verbose:
+                            print 'warning, node %s could not complete FOM' \
+                                % node_name
+                            print e
+
+        return fom_patterns is not None
+
+    def _evaluate_completion(self, plan, attributes, verbose=False):
+        '''Find the completed values of a completion plan for an attributes
+        set.
+
+        A completed parameter and the parameters linked to it are blocked:
+        the following rules do not complete them again. The nodes parameters
+        that cannot be evaluated are skipped.
+
+        Parameters
+        ----------
+        plan: list (mandatory)
+            the completion plan (see completion_plan)
+        attributes: dict (mandatory)
+            the attributes values
+        verbose: bool (optional)
+            issue warnings when a node parameter cannot be evaluated.
+            Default: False
+
+        Returns
+        -------
+        completion: list of 2-uplet
+            the completed plan entries and their value.
+        '''
+        cache = self.completion_cache()
+        completion = []
+        blocked = set()
+        for entry in plan:
+            (process, parameter, parameter_name, fom_type, fname,
+             parameter_attributes, linked) = entry
+            if (process, parameter) in blocked:
+                continue
+            d = dict( ( i, attributes[ i ] ) \
+                for i in parameter_attributes if i in attributes )
+            d['fom_process'] = fname
+            d['fom_parameter'] = parameter
+            d['fom_format'] = 'fom_prefered'
+            try:
+                paths = cache.find_paths(fom_type, d)
+            except Exception, e:
+                if '.' not in parameter_name:
+                    raise
+                if verbose:
+                    print 'warning, parameter %s could not complete FOM' \
+                        % parameter_name
+                    print e
+                continue
+            if not paths:
+                continue
+            completion.append((entry, paths[-1][0]))
+            blocked.add((process, parameter))
+            blocked.update(linked)
+        return completion
+
+    @staticmethod
+    def _block_linked_parameters(plug, blocked):
+        '''Block all the parameters linked to a plug, directly or through
+        other links: their values will come from the plug value.
+        '''
+        todo = [plug]
+        done = set()
+        while todo:
+            plug = todo.pop()
+            done.add(plug)
+            for link in list(plug.links_to) + list(plug.links_from):
+                linked_node, linked_plug = link[2], link[3]
+                if not hasattr(linked_node, 'process'):
+                    # switches do not transmit values through links
+                    continue
+                blocked.add((linked_node.process, link[1]))
+                if linked_plug not in done:
+                    todo.append(linked_plug)
+
+    @staticmethod
+    def _apply_completion(process, completion, verbose=False):
+        '''Assign the completed values in a single batch.
+
+        For pipelines, the values propagation through the links and the
+        activations update are deferred until all the values are set. A
+        value rejected by a node does not prevent the other values to be
+        set.
+        '''
+        is_pipeline = isinstance(process, Pipeline)
+        if is_pipeline:
+            process.delay_update_nodes_and_plugs_activation()
+            lazy = process.set_lazy_propagation(True)
+        try:
+            for (completed_process, parameter), value \
+                    in completion.iteritems():
+                try:
+                    setattr(completed_process, parameter, value)
+                except Exception, e:
+                    if completed_process is process:
+                        raise
+                    if verbose:
+                        print 'warning, node %s could not complete FOM' \
+                            % completed_process.name
+                        print e
+        finally:
+            if is_pipeline:
+                process.set_lazy_propagation(lazy)
+                process.restore_update_nodes_and_plugs_activation()
 
 
     def attributes_changed(self, obj, name, old, new):
@@ -9,11 +9,17 @@
 
 # System import
 import os
+import shutil
+import tempfile
 import unittest
 
+# Trait import
+from traits.api import Undefined
+
 # Capsul import
 from capsul.process import get_process_instance
 from capsul.process import NipypeProcess
+from capsul.pipeline import Pipeline
 
 
 class TestNipypeWrap(unittest.TestCase):
@@ -29,6 +35,10 @@ class TestNipypeWrap(unittest.TestCase):
         else:
             # default is nifti
             self.output_extension = '.nii'
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
 
     def test_nipype_automatic_wrap(self):
         """ Method to test if the automatic nipype interfaces wrap work
@@ -39,6 +49,84 @@ class TestNipypeWrap(unittest.TestCase):
         self.assertTrue(isinstance(nipype_process, NipypeProcess))
         self.assertTrue(isinstance(nipype_process._nipype_interface, BET))
 
+    def test_nipype_prototypes(self):
+        """ Method to test that the nipype traits are converted once per
+        interface class and that the wrapped instances are independent.
+        """
+        from capsul.process.nipype_process import _nipype_prototypes
+        _nipype_prototypes.clear()
+        process1 = get_process_instance("nipype.interfaces.fsl.BET")
+        self.assertEqual(len(_nipype_prototypes), 1)
+        process2 = get_process_instance("nipype.interfaces.fsl.BET")
+        self.assertEqual(len(_nipype_prototypes), 1)
+        self.assertEqual(process1.user_traits().keys(),
+                         process2.user_traits().keys())
+        self.assertTrue(process1.trait("_out_file").output)
+        self.assertFalse(process1.trait("in_file").output)
+        process1.trait("in_file").desc = "a modified description"
+        self.assertNotEqual(process2.trait("in_file").desc,
+                            "a modified description")
+        process1.frac = 0.3
+        self.assertEqual(process1._nipype_interface.inputs.frac, 0.3)
+        self.assertNotEqual(process2._nipype_interface.inputs.frac, 0.3)
+
+    def test_nipype_outputs(self):
+        """ Method to test that the nipype outputs are listed once per
+        input modification and that a File output is only set if the file
+        exists.
+        """
+        nipype_process = get_process_instance("nipype.interfaces.fsl.BET")
+        interface = nipype_process._nipype_interface
+        list_outputs = interface._list_outputs
+        calls = []
+
+        def counted_list_outputs():
+            calls.append(1)
+            return list_outputs()
+
+        interface._list_outputs = counted_list_outputs
+        nipype_process.set_output_directory(self.tmpdir)
+        nipype_process.in_file = os.path.join(self.tmpdir, "a.nii")
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(nipype_process._out_file, Undefined)
+
+        # The existing output file is set
+        out_file = os.path.join(
+            self.tmpdir, "a_brain%s" % self.output_extension)
+        open(out_file, "w").close()
+        nipype_process.frac = 0.3
+        self.assertEqual(len(calls), 3)
+        self.assertEqual(nipype_process._out_file, out_file)
+        self.assertEqual(nipype_process.get_outputs()["_out_file"], out_file)
+
+        # The output computed from the previous input is reset
+        nipype_process.in_file = os.path.join(self.tmpdir, "b.nii")
+        self.assertEqual(nipype_process._out_file, Undefined)
+
+    def test_nipype_outputs_propagation(self):
+        """ Method to test that the nipype outputs are propagated through
+        the pipeline links.
+        """
+        class BetPipeline(Pipeline):
+            def pipeline_definition(self):
+                self.add_process("bet", "nipype.interfaces.fsl.BET",
+                                 do_not_export=["in_file", "frac"])
+                self.export_parameter("bet", "in_file")
+                self.export_parameter("bet", "frac")
+                self.export_parameter("bet", "_out_file", "out_file")
+
+        pipeline = BetPipeline()
+        pipeline.nodes["bet"].process.set_output_directory(self.tmpdir)
+        pipeline.in_file = os.path.join(self.tmpdir, "a.nii")
+        self.assertEqual(pipeline.out_file, Undefined)
+        out_file = os.path.join(
+            self.tmpdir, "a_brain%s" % self.output_extension)
+        open(out_file, "w").close()
+        pipeline.frac = 0.3
+        self.assertEqual(pipeline.out_file, out_file)
+        pipeline.in_file = os.path.join(self.tmpdir, "b.nii")
+        self.assertEqual(pipeline.out_file, Undefined)
+
     def test_nipype_monkey_patching(self):
         """ Method to test the monkey patching used to work in user
         specified directories.
@@ -0,0 +1,181 @@
+#! /usr/bin/env python
+##########################################################################
+# Capsul - Copyright (C) CEA, 2015
+# Distributed under the terms of the CeCILL-B license, as published by
+# the CEA-CNRS-INRIA. Refer to the LICENSE file or to
+# http://www.cecill.info/licences/Licence_CeCILL-B_V1-en.html
+# for details.
+##########################################################################
+
+# System import
+import unittest
+
+# Trait import
+from traits.api import Undefined, Int
+
+# Soma import
+from soma.fom import FileOrganizationModels, AttributesToPaths
+from soma.fom import PathToAttributes
+
+# Capsul import
+from capsul.process.process_with_fom import ProcessWithFom
+from capsul.pipeline.test.test_pipeline import MyPipeline
+
+
+# Global parameters
+fom_definition = {
+    "fom_name": "test-fom-1.0",
+    "formats": {"NIFTI": "nii"},
+    "attribute_definitions": {"acquisition": {"default_value": "default"}},
+    "processes": {
+        "MyPipeline": {
+            "input_image": [["input:<subject>/<acquisition>/t1", "NIFTI"]],
+            "output_image": [
+                ["output:<subject>/<acquisition>/final", "NIFTI"]]},
+        "MyPipeline.node1": {
+            "input_image": [
+                ["input:<subject>/<acquisition>/node1_in", "NIFTI"]],
+            "output_image": [
+                ["output:<subject>/<acquisition>/node1_out", "NIFTI"]]},
+        "MyPipeline.node2": {
+            "input_image": [
+                ["output:<subject>/<acquisition>/node2_in", "NIFTI"]],
+            "output_image": [
+                ["output:<subject>/<acquisition>/node2_out", "NIFTI"]]}
+    }
+}
+
+
+class FomStudyConfig(object):
+    """ Minimal study configuration holding the FOM completion data.
+    """
+    class ModulesData(object):
+        pass
+
+    def __init__(self):
+        fom = FileOrganizationModels()
+        fom.import_file(fom_definition)
+        atp = AttributesToPaths(
+            fom, selection={}, directories={"input": "/in", "output": "/out"})
+        self.input_fom = self.output_fom = fom_definition["fom_name"]
+        self.modules_data = self.ModulesData()
+        self.modules_data.foms = {"input": fom, "output": fom}
+        self.modules_data.fom_atp = {"input": atp, "output": atp}
+        self.modules_data.fom_pta = {
+            "input": PathToAttributes(fom, selection={})}
+
+
+class TestProcessWithFom(unittest.TestCase):
+    """ Class to test the FOM completion of a pipeline.
+    """
+    def setUp(self):
+        """ In the setup construct the pipeline and its FOM completion.
+        """
+        self.pipeline = MyPipeline()
+        self.process_with_fom = ProcessWithFom(
+            self.pipeline, FomStudyConfig())
+        self.process_with_fom.attributes["subject"] = "s1"
+
+    def test_completion(self):
+        """ Method to test that the completion runs top-down and that each
+        parameter is set once.
+        """
+        node1 = self.pipeline.nodes["node1"].process
+        node2 = self.pipeline.nodes["node2"].process
+        changes = []
+        node2.on_trait_change(
+            lambda value: changes.append(value), "input_image")
+        self.process_with_fom.create_completion()
+
+        # The pipeline rules are the most specific ones
+        self.assertEqual(self.pipeline.input_image, "/in/s1/default/t1.nii")
+        self.assertEqual(node1.input_image, "/in/s1/default/t1.nii")
+        self.assertEqual(self.pipeline.output_image,
+                         "/out/s1/default/final.nii")
+        self.assertEqual(node2.output_image, "/out/s1/default/final.nii")
+
+        # A node input linked to a completed output is not completed again
+        self.assertEqual(node1.output_image, "/out/s1/default/node1_out.nii")
+        self.assertEqual(changes, ["/out/s1/default/node1_out.nii"])
+
+    def test_completion_errors(self):
+        """ Method to test that a node that cannot be completed does not
+        prevent the completion of the others.
+        """
+        node1 = self.pipeline.nodes["node1"].process
+        node1.add_trait("output_image", Int(output=True))
+        self.process_with_fom.create_completion()
+        self.assertFalse(isinstance(node1.output_image, basestring))
+        self.assertEqual(self.pipeline.input_image, "/in/s1/default/t1.nii")
+        self.assertEqual(self.pipeline.output_image,
+                         "/out/s1/default/final.nii")
+
+        # A process defined in the FOM without patterns is found
+        output_fom = self.process_with_fom.study_config.modules_data.foms[
+            "output"]
+        output_fom.patterns["MyPipeline"] = {}
+        self.process_with_fom.create_completion()
+
+    def test_completion_cache(self):
+        """ Method to test that the rules matches are memoized.
+        """
+        cache = self.process_with_fom.completion_cache()
+        atp = cache.atps["output"]
+        calls = []
+        find_paths = atp.find_paths
+
+        def counted_find_paths(attributes):
+            calls.append(attributes)
+            return find_paths(attributes)
+        atp.find_paths = counted_find_paths
+
+        # The same subject is completed once
+        self.process_with_fom.create_completion()
+        nb_of_calls = len(calls)
+        self.assertTrue(nb_of_calls > 0)
+        self.process_with_fom.create_completion()
+        self.assertEqual(len(calls), nb_of_calls)
+        self.process_with_fom.attributes["subject"] = "s2"
+        self.process_with_fom.create_completion()
+        self.assertEqual(len(calls), 2 * nb_of_calls)
+        self.assertEqual(self.pipeline.input_image, "/in/s2/default/t1.nii")
+
+        # The least recently used matches are evicted
+        cache.max_paths = 1
+        self.process_with_fom.create_completion()
+        self.assertEqual(len(cache._paths), 1)
+
+        # The cache is replaced when the FOMs are reloaded
+        self.process_with_fom.study_config.modules_data.fom_atp = dict(
+            cache.atps)
+        self.assertFalse(self.process_with_fom.completion_cache() is cache)
+
+    def test_batch_completion(self):
+        """ Method to test the completion of several subjects at once.
+        """
+        completions = self.process_with_fom.batch_completion(
+            [{"subject": "s1"}, {"subject": "s2", "acquisition": "a2"}])
+        self.assertEqual(len(completions), 2)
+        self.assertEqual(completions[0]["input_image"],
+                         "/in/s1/default/t1.nii")
+        self.assertEqual(completions[1]["input_image"], "/in/s2/a2/t1.nii")
+        self.assertEqual(completions[1]["node1.output_image"],
+                         "/out/s2/a2/node1_out.nii")
+        self.assertFalse("node1.input_image" in completions[1])
+        self.assertFalse("node2.input_image" in completions[1])
+
+        # The process is not modified
+        self.assertEqual(self.pipeline.nodes["node1"].process.output_image,
+                         Undefined)
+
+
+def test():
+    """ Function to execute unitest
+    """
+    suite = unittest.TestLoader().loadTestsFromTestCase(TestProcessWithFom)
+    runtime = unittest.TextTestRunner(verbosity=2).run(suite)
+    return runtime.wasSuccessful()
+
+
+if __name__ == "__main__":
+    test()
@@ -12,9 +12,10 @@ import unittest
 
 # Capsul import
 from capsul.process import Process
+from capsul.pipeline import Pipeline
 
 # Trait import
-from traits.api import Float
+from traits.api import Float, Array
 
 
 class DummyProcess(Process):
@@ -52,6 +53,43 @@ class TestProcessUserTrait(unittest.TestCase):
                 self.assertFalse(
                     self.p1.trait(trait_name) is self.p2.trait(trait_name))
 
+    def test_clone(self):
+        """ Method to test that a cloned process has the same parameters
+        and values but is independant from the original process.
+        """
+        self.p1.f = 1.
+        self.p1.ff = 2.
+        self.p1.add_trait("fff", Float(output=True))
+        self.p1.fff = 3.
+        p3 = self.p1.clone()
+        self.assertTrue(isinstance(p3, DummyProcess))
+        self.assertEqual(sorted(p3.user_traits().keys()), ["f", "ff", "fff"])
+        self.assertEqual((p3.f, p3.ff, p3.fff), (1., 2., 3.))
+        self.assertTrue(p3.trait("fff").output)
+        self.assertFalse(p3.trait("fff") is self.p1.trait("fff"))
+        p3.ff = 4.
+        self.assertEqual(self.p1.ff, 2.)
+
+        # Array values are copied too
+        self.p1.add_trait("a", Array(output=False))
+        self.p1.a = [1., 2.]
+        p4 = self.p1.clone()
+        self.assertEqual(list(p4.a), [1., 2.])
+
+    def test_process_copies(self):
+        """ Method to test that the copies default values do not modify the
+        given process.
+        """
+        pipeline = Pipeline()
+        self.p1.f = 1.
+        pipeline.add_process_copies(["node1", "node2"], self.p1, ff=5.)
+        self.assertEqual(self.p1.ff, 0.)
+        for name in ["node1", "node2"]:
+            node = pipeline.nodes[name]
+            self.assertEqual((node.process.f, node.process.ff), (1., 5.))
+            self.assertTrue(node.plugs["ff"].has_default_value)
+            self.assertTrue(node.plugs["ff"].optional)
+
 
 def test():
     """ Function to execute unitest
@@ -15,7 +15,8 @@ import weakref
 # Capsul import
 from soma.qt_gui.qt_backend import QtCore, QtGui
 from soma.sorted_dictionary import SortedDictionary
-from capsul.pipeline.pipeline import Switch, PipelineNode, IterativeNode
+from capsul.pipeline.pipeline import (
+    Switch, PipelineNode, IterativeNode, MapNode)
 from capsul.pipeline import pipeline_tools
 from capsul.pipeline import Pipeline
 from capsul.process import get_process_instance, Process
@@ -753,7 +754,8 @@ class PipelineScene(QtGui.QGraphicsScene):
             if hasattr(node, 'process'):
                 process = node.process
             if isinstance(node, PipelineNode) \
-                    or isinstance(node, IterativeNode):
+                    or (isinstance(node, IterativeNode)
+                        and not isinstance(node, MapNode)):
                 sub_pipeline = node.process
             else:
                 sub_pipeline = None
@@ -826,13 +828,12 @@ class PipelineScene(QtGui.QGraphicsScene):
                 remove_glink = True
             else:
                 active = source_plug.activated and dest_plug.activated
-                weak = [x[4] for x in source_plug.links_to \
-                    if x[:2] == (dest_node_name, dest_param)]
-                if len(weak) == 0:
+                weak = pipeline.link_table.is_weak(
+                    source_node_name, source_param, dest_node_name,
+                    dest_param)
+                if weak is None:
                     # link removed
                     remove_glink = True
-                else:
-                    weak = weak[0]
             if remove_glink:
                 to_remove.append(source_dest)
             else:
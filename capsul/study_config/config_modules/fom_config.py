@@ -6,12 +6,162 @@
 # for details.
 ##########################################################################
 
+import os
+import json
+import weakref
+from collections import OrderedDict
 from traits.api import Bool, Str, Undefined
 from soma.fom import AttributesToPaths, PathToAttributes
 from soma.application import Application
 from capsul.study_config.study_config import StudyConfigModule
 
 
+# Loaded FOMs of each FOM manager, of the form
+# {fom_manager: {fom_name: (fom_signature, fom)}}. The study configurations
+# sharing a FOM manager share the loaded FOMs that must therefore never be
+# modified.
+_loaded_foms = weakref.WeakKeyDictionary()
+
+
+def fom_signature(fom_manager, fom_name):
+    '''Get the modification signature of a FOM definition.
+
+    Parameters
+    ----------
+    fom_manager: FileOrganizationModelManager (mandatory)
+        the manager used to find the FOM files
+    fom_name: str (mandatory)
+        the FOM name
+
+    Returns
+    -------
+    signature: tuple
+        the names and modification times of the FOM file (or directory
+        files) and of the files of the FOMs it imports.
+    '''
+    signature = []
+    done = set()
+    stack = [fom_name]
+    while stack:
+        fom_name = stack.pop(0)
+        if fom_name in done:
+            continue
+        done.add(fom_name)
+        fom_path = fom_manager.file_name(fom_name)
+        if not os.path.isdir(fom_path):
+            signature.append((fom_path, os.path.getmtime(fom_path)))
+            with open(fom_path) as open_file:
+                stack.extend(json.load(open_file).get('fom_import', []))
+            continue
+        for root, dirs, files in os.walk(fom_path):
+            for name in files:
+                path = os.path.join(root, name)
+                signature.append((path, os.path.getmtime(path)))
+    return tuple(sorted(signature))
+
+
+def load_fom(fom_manager, fom_name):
+    '''Load a FOM, reusing the one already loaded by the same manager if
+    its files have not been modified.
+
+    Parameters
+    ----------
+    fom_manager: FileOrganizationModelManager (mandatory)
+        the manager used to find and load the FOM files
+    fom_name: str (mandatory)
+        the FOM name
+
+    Returns
+    -------
+    fom: FileOrganizationModels
+        the loaded FOM, shared and must not be modified.
+    '''
+    signature = fom_signature(fom_manager, fom_name)
+    manager_foms = _loaded_foms.setdefault(fom_manager, {})
+    loaded_fom = manager_foms.get(fom_name)
+    if loaded_fom is not None and loaded_fom[0] == signature:
+        return loaded_fom[1]
+    fom = fom_manager.load_foms(fom_name)
+    manager_foms[fom_name] = (signature, fom)
+    return fom
+
+
+class FomCompletionCache(object):
+    '''Cache of the FOM rules matches used by the parameters completion.
+
+    The discriminant attributes only depend on the FOM and on the parameter,
+    they are computed once. The paths found for a set of attributes are
+    memoized, the least recently used ones being evicted when the cache is
+    full. A new cache has to be created when the FOMs are reloaded.
+
+    Parameters
+    ----------
+    atps: dict (mandatory)
+        the AttributesToPaths objects of the form {fom_type: atp}
+    max_paths: int (optional, default 10000)
+        the maximum number of memoized paths lookups
+    '''
+
+    def __init__(self, atps, max_paths=10000):
+        self.atps = atps
+        self.max_paths = max_paths
+        self._discriminant_attributes = {}
+        self._paths = OrderedDict()
+
+    def discriminant_attributes(self, fom_type, parameter):
+        '''Get the discriminant attributes of a parameter.
+
+        Parameters
+        ----------
+        fom_type: str (mandatory)
+            the FOM type ('input', 'output' or 'shared')
+        parameter: str (mandatory)
+            the FOM parameter name
+
+        Returns
+        -------
+        attributes: list of str
+            the discriminant attributes names, must not be modified.
+        '''
+        key = (fom_type, parameter)
+        attributes = self._discriminant_attributes.get(key)
+        if attributes is None:
+            attributes = self.atps[fom_type].find_discriminant_attributes(
+                fom_parameter=parameter)
+            self._discriminant_attributes[key] = attributes
+        return attributes
+
+    def find_paths(self, fom_type, attributes):
+        '''Get the paths matching a set of attributes.
+
+        Parameters
+        ----------
+        fom_type: str (mandatory)
+            the FOM type ('input', 'output' or 'shared')
+        attributes: dict (mandatory)
+            the attributes values
+
+        Returns
+        -------
+        paths: list of 2-uplet
+            the (path, rule_attributes) matches, must not be modified.
+        '''
+        key = (fom_type, tuple(sorted(attributes.iteritems())))
+        paths = self._paths.pop(key, None)
+        if paths is None:
+            paths = list(self.atps[fom_type].find_paths(attributes))
+        self._paths[key] = paths
+        while len(self._paths) > self.max_paths:
+            self._paths.popitem(last=False)
+        return paths
+
+    def clear(self):
+        '''Remove all the cached matches.
+        '''
+        self._discriminant_attributes.clear()
+        self._paths.clear()
+
+
 class FomConfig(StudyConfigModule):
     '''FOM (File Organization Model) configuration module for StudyConfig
 
@@ -41,24 +191,33 @@ class FomConfig(StudyConfigModule):
         self.study_config.input_fom = 'morphologist-auto-1.0'
         self.study_config.output_fom = 'morphologist-auto-1.0'
         self.study_config.shared_fom = 'shared-brainvisa-1.0'
-        
-            
+
+        # The soma application and the inputs of the FOM completion data of
+        # the form {fom_type: (fom, directories, formats)}
+        self._soma_app = None
+        self._completion_inputs = {}
+
     def initialize_module(self):
         '''Load configured FOMs and create FOM completion data in
         self.study_config.modules_data
+
+        The FOMs are reloaded only if their files have been modified, and
+        the completion data are rebuilt only if their FOM, directories or
+        formats have changed.
         '''
         if self.study_config.use_fom is False:
             return
-        
-        soma_app = Application('capsul', plugin_modules=['soma.fom'])
-        soma_app.initialize()
-        self.study_config.modules_data.foms = {}
-        foms = (('input', self.study_config.input_fom),
-            ('output', self.study_config.output_fom),
-            ('shared', self.study_config.shared_fom))
-        for fom_type, fom_filename in foms:
-            fom = soma_app.fom_manager.load_foms(fom_filename)
-            self.study_config.modules_data.foms[fom_type] = fom
+
+        if self._soma_app is None:
+            self._soma_app = Application('capsul', plugin_modules=['soma.fom'])
+            self._soma_app.initialize()
+        foms = {}
+        for fom_type, fom_filename in (
+                ('input', self.study_config.input_fom),
+                ('output', self.study_config.output_fom),
+                ('shared', self.study_config.shared_fom)):
+            foms[fom_type] = load_fom(self._soma_app.fom_manager, fom_filename)
+        self.study_config.modules_data.foms = foms
 
         # Create FOM completion data in self.study_config.modules_data
         formats = tuple(getattr(self.study_config, key) \
@@ -72,23 +231,37 @@ class FomConfig(StudyConfigModule):
         directories['input'] = self.study_config.input_directory
         directories['output'] = self.study_config.output_directory
 
-        self.study_config.modules_data.fom_atp = {}
-        self.study_config.modules_data.fom_pta = {}
-
-        for fom_type, fom in self.study_config.modules_data.foms.iteritems():
-            atp = AttributesToPaths(
+        modules_data = self.study_config.modules_data
+        fom_atp = dict(getattr(modules_data, 'fom_atp', {}))
+        fom_pta = dict(getattr(modules_data, 'fom_pta', {}))
+        modified = False
+        for fom_type, fom in foms.iteritems():
+            inputs = (fom, directories, set(formats))
+            previous_inputs = self._completion_inputs.get(fom_type)
+            if previous_inputs == inputs and fom_type in fom_atp:
+                continue
+            modified = True
+            fom_atp[fom_type] = AttributesToPaths(
                 fom,
                 selection={},
                 directories=directories,
                 prefered_formats=set((formats)))
-            self.study_config.modules_data.fom_atp[fom_type] = atp
-            pta = PathToAttributes(fom, selection={})
-            self.study_config.modules_data.fom_pta[fom_type] = pta
+            if previous_inputs is None or previous_inputs[0] is not fom \
+                    or fom_type not in fom_pta:
+                fom_pta[fom_type] = PathToAttributes(fom, selection={})
+            self._completion_inputs[fom_type] = inputs
+        if modified or not hasattr(modules_data, 'fom_completion_cache'):
+            modules_data.fom_atp = fom_atp
+            modules_data.fom_pta = fom_pta
+            modules_data.fom_completion_cache = FomCompletionCache(fom_atp)
         self.study_config.use_fom = True
-    
+
+    def _configuration_changed(self):
+        self.study_config.request_module_initialization(self)
+
     def initialize_callbacks(self):
         self.study_config.on_trait_change(
-            self.initialize_module,
+            self._configuration_changed,
             ['use_fom', 'input_directory', 'input_fom', 'meshes_format',
              'output_directory', 'output_fom', 'shared_directory', 'shared_fom',
              'spm_directory', 'volumes_format'])
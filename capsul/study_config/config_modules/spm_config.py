@@ -9,17 +9,20 @@
 # System import
 import os
 import logging
+import subprocess
+from distutils.spawn import find_executable
 
 # TRAITS import
 from traits.api import Directory, File, Bool, Enum, Undefined
 
 # CAPSUL import
 from capsul.study_config.study_config import StudyConfigModule
+from capsul.study_config.config_utils import cached_tool_probe
 
 # Define the logger
 logger = logging.getLogger(__name__)
 
-def find_spm(matlab=None, matlab_path=None):
+def find_spm(matlab=None, matlab_path=None, use_cache=True):
     """ Function to return the root directory of SPM.
 
     Parameters
@@ -28,12 +31,22 @@ def find_spm(matlab=None, matlab_path=None):
         if given, is the path to the MATLAB executable.
     matlab_path: str (default None)
         if given, is a MATLAB expression fed to addpath.
+    use_cache: bool (default True)
+        if True, reuse the directory found with the same unmodified MATLAB
+        executable (see cached_tool_probe).
 
     Returns
     -------
     last_line: str
         the SPM root directory
     """
+    if use_cache:
+        matlab_exec = find_executable(matlab or "matlab")
+        return cached_tool_probe(
+            matlab_exec,
+            "find_spm:{0}:{1}".format(matlab_exec, matlab_path),
+            lambda: find_spm(matlab, matlab_path, use_cache=False))
+
     # Script to execute with matlab in order to find SPM root dir
     script = ("spm8;"
               "fprintf(1, '%s', spm('dir'));"
@@ -10,14 +10,80 @@
 # System import
 import os
 import re
+import json
 import subprocess
 import logging
+import tempfile
 
 # Define the logger
 logger = logging.getLogger(__name__)
 
+# The persistent tool discovery cache
+tool_cache_file = "~/.config/capsul/tool_cache.json"
 
-def environment(sh_file=None, env={}):
+
+def cached_tool_probe(tool_path, key, probe, cache_file=None):
+    """ Function that return the result of a tool discovery, probing the
+    tool only if it has been modified since the last discovery.
+
+    The results are stored in a json file of the form {key: [tool_path,
+    tool_mtime, result]}. The failed probes are not cached.
+
+    Parameters
+    ----------
+    tool_path: str (mandatory)
+        the path to the probed script or executable.
+    key: str (mandatory)
+        the probe identifier in the cache.
+    probe: callable (mandatory)
+        the function returning the json compatible discovery result.
+    cache_file: str (optional, default None)
+        the cache file, 'tool_cache_file' by default.
+
+    Returns
+    -------
+    result: object
+        the discovery result.
+    """
+    cache_file = os.path.expanduser(cache_file or tool_cache_file)
+    try:
+        tool_mtime = os.path.getmtime(tool_path)
+    except (OSError, TypeError):
+        return probe()
+
+    # Reuse the result of the last discovery of the same tool
+    cache = {}
+    if os.path.isfile(cache_file):
+        try:
+            with open(cache_file) as open_file:
+                cache = json.load(open_file)
+        except ValueError:
+            logger.warning("Ignore invalid tool cache '{0}'.".format(
+                cache_file))
+    cached = cache.get(key)
+    if cached is not None and cached[:2] == [tool_path, tool_mtime]:
+        logger.debug("Reuse cached discovery '{0}'.".format(key))
+        return cached[2]
+
+    # Probe the tool and update the cache: the file is replaced atomically
+    # since several workers may probe tools at the same time
+    result = probe()
+    cache[key] = [tool_path, tool_mtime, result]
+    try:
+        cache_directory = os.path.dirname(cache_file)
+        if not os.path.isdir(cache_directory):
+            os.makedirs(cache_directory)
+        fd, tmp_file = tempfile.mkstemp(dir=cache_directory)
+        with os.fdopen(fd, "w") as open_file:
+            json.dump(cache, open_file)
+        os.rename(tmp_file, cache_file)
+    except (OSError, IOError):
+        logger.warning("Could not write tool cache '{0}'.".format(
+            cache_file))
+    return result
+
+
+def environment(sh_file=None, env={}, use_cache=True):
     """ Function that return a dictionary containing the environment
     needed by a program (for instance FSL or FreeSurfer).
 
@@ -30,12 +96,28 @@ def environment(sh_file=None, env={}):
         the path to the sh script used to set up the environment.
     env: dict (optional, default empty)
         the default environment used to parse the configuration sh file.
+    use_cache: bool (optional, default True)
+        if True, reuse the environment parsed from the same unmodified
+        sh file (see cached_tool_probe).
 
     Returns
     -------
     environment: dict
         a dict containing the program configuration.
     """
+    if use_cache:
+        return cached_tool_probe(
+            sh_file,
+            "environment:{0}:{1}".format(
+                sh_file, json.dumps(env, sort_keys=True)),
+            lambda: _parse_environment(sh_file, env))
+    return _parse_environment(sh_file, env)
+
+
+def _parse_environment(sh_file, env):
+    """ Source a sh script and return the resulting environment (see
+    environment).
+    """
     # Use sh commands and a string instead of a list since
     # we're using shell=True
     # Pass empty environment to get only the prgram variables
@@ -0,0 +1,217 @@
+#! /usr/bin/env python
+##########################################################################
+# CAPSUL - Copyright (C) CEA, 2015
+# Distributed under the terms of the CeCILL-B license, as published by
+# the CEA-CNRS-INRIA. Refer to the LICENSE file or to
+# http://www.cecill.info/licences/Licence_CeCILL-B_V1-en.html
+# for details.
+##########################################################################
+
+""" Bulk indexing of a dataset organized according to a FOM.
+
+The directory tree is crawled once and all the files are matched against
+the FOM rules in a single PathToAttributes pass. The resulting attributes
+are persisted with the files modification times so that a new scan only
+parses the new or modified files.
+"""
+
+# System import
+import os
+import stat
+import json
+import logging
+from multiprocessing.pool import ThreadPool
+
+# Define the logger
+logger = logging.getLogger(__name__)
+
+
+def _crawl_directory(directory, relpath, previous_files, recursive=True,
+                     visited=None):
+    """ Crawl a directory tree.
+
+    Symbolic links are followed, a directory already visited through another
+    link is skipped to avoid infinite loops.
+
+    Parameters
+    ----------
+    directory: str (mandatory)
+        the directory to crawl.
+    relpath: str (mandatory)
+        the directory path relative to the dataset root, '/' separated.
+    previous_files: dict (mandatory)
+        the already indexed files of the form {relpath: [mtime, matches]}.
+    recursive: bool (optional, default True)
+        if False, the sub-directories are listed with an empty content.
+    visited: set (optional, default None)
+        the (device, inode) of the directories already crawled.
+
+    Returns
+    -------
+    content: dict
+        the new or modified files and all the sub-directories, in the
+        DirectoryAsDict format {name: [stat, content]}.
+    files: dict
+        all the files modification times of the form {relpath: mtime}.
+    """
+    content = {}
+    files = {}
+    if visited is None:
+        visited = set()
+    try:
+        st = os.stat(directory)
+        names = os.listdir(directory)
+    except OSError:
+        logger.warning("Cannot list directory '{0}'.".format(directory))
+        return content, files
+    visited.add((st.st_dev, st.st_ino))
+    for name in names:
+        full_path = os.path.join(directory, name)
+        file_relpath = relpath + "/" + name if relpath else name
+        try:
+            st = os.stat(full_path)
+        except OSError:
+            # Broken link or file removed since the directory was listed
+            continue
+        if stat.S_ISDIR(st.st_mode) and not recursive:
+            content[name] = [tuple(st), {}]
+        elif stat.S_ISDIR(st.st_mode):
+            if (st.st_dev, st.st_ino) in visited:
+                logger.warning("Directory '{0}' already crawled, symbolic "
+                               "link loop skipped.".format(full_path))
+                continue
+            sub_content, sub_files = _crawl_directory(
+                full_path, file_relpath, previous_files, visited=visited)
+            content[name] = [tuple(st), sub_content]
+            files.update(sub_files)
+        else:
+            files[file_relpath] = st.st_mtime
+            previous = previous_files.get(file_relpath)
+            if previous is None or previous[0] != st.st_mtime:
+                content[name] = [tuple(st), None]
+    return content, files
+
+
+class FomDatasetIndex(object):
+    """ Index of the files of a dataset matching a FOM.
+
+    Parameters
+    ----------
+    pta: PathToAttributes (mandatory)
+        the FOM paths parser (ie. study_config.modules_data.fom_pta['input']).
+    directory: str (mandatory)
+        the dataset root directory.
+    index_file: str (optional, default None)
+        the json file where the index is persisted. If it exists, the index
+        is loaded from it.
+
+    Methods
+    -------
+    update
+    attributes_table
+    save
+    """
+    def __init__(self, pta, directory, index_file=None):
+        self.pta = pta
+        self.directory = directory
+        self.index_file = index_file
+        # files: {relpath: [mtime, matches]}
+        #     matches: list of attributes dict
+        self.files = {}
+        if index_file is not None and os.path.isfile(index_file):
+            with open(index_file) as open_file:
+                index = json.load(open_file)
+            if index.get("directory") == directory:
+                self.files = index["files"]
+
+    def update(self, nb_of_workers=1):
+        """ Crawl the dataset and match the new or modified files against
+        the FOM.
+
+        Parameters
+        ----------
+        nb_of_workers: int (optional, default 1)
+            the number of top-level sub-directories crawled in parallel.
+
+        Returns
+        -------
+        nb_of_parsed_files: int
+            the number of new or modified files parsed.
+        """
+        # Crawl the top-level sub-directories, in parallel if requested
+        visited = set()
+        dirdict, files = _crawl_directory(
+            self.directory, "", self.files, recursive=False, visited=visited)
+        subdirectories = [
+            name for name, (st, content) in dirdict.iteritems()
+            if content is not None]
+        crawl_arguments = [
+            (os.path.join(self.directory, name), name, self.files, True,
+             set(visited))
+            for name in subdirectories]
+        if nb_of_workers > 1 and len(crawl_arguments) > 1:
+            pool = ThreadPool(min(nb_of_workers, len(crawl_arguments)))
+            try:
+                results = pool.map(
+                    lambda args: _crawl_directory(*args), crawl_arguments)
+            finally:
+                pool.close()
+        else:
+            results = [_crawl_directory(*args) for args in crawl_arguments]
+        for name, (content, sub_files) in zip(subdirectories, results):
+            dirdict[name][1] = content
+            files.update(sub_files)
+
+        # Keep the unmodified files and match the others in a single pass
+        new_files = {}
+        nb_of_parsed_files = 0
+        for file_relpath, mtime in files.iteritems():
+            previous = self.files.get(file_relpath)
+            if previous is not None and previous[0] == mtime:
+                new_files[file_relpath] = previous
+            else:
+                new_files[file_relpath] = [mtime, []]
+                nb_of_parsed_files += 1
+        for path_list, st, attributes in self.pta.parse_directory(dirdict):
+            file_relpath = "/".join(path_list)
+            new_files.setdefault(
+                file_relpath, [files.get(file_relpath), []])[1].append(
+                    attributes)
+        self.files = new_files
+        logger.debug("Indexed '{0}': {1} files parsed.".format(
+            self.directory, nb_of_parsed_files))
+
+        if self.index_file is not None:
+            self.save()
+        return nb_of_parsed_files
+
+    def attributes_table(self):
+        """ Get the attributes of all the indexed files.
+
+        Returns
+        -------
+        table: list of dict
+            one row per FOM match, with the matched attributes and the file
+            'path'.
+        """
+        table = []
+        for file_relpath in sorted(self.files):
+            for attributes in self.files[file_relpath][1]:
+                row = dict(attributes)
+                row["path"] = os.path.join(
+                    self.directory, *file_relpath.split("/"))
+                table.append(row)
+        return table
+
+    def save(self, index_file=None):
+        """ Persist the index in a json file.
+
+        Parameters
+        ----------
+        index_file: str (optional, default None)
+            the destination file, the index file by default.
+        """
+        index_file = index_file or self.index_file
+        with open(index_file, "w") as open_file:
+            json.dump({"directory": self.directory, "files": self.files},
+                      open_file)
@@ -15,25 +15,30 @@ import os
 import hashlib
 import time
 import shutil
+import stat
+import sys
 import json
-import numpy
 
 # CAPSUL import
 from capsul.process import Process
 from capsul.process import ProcessResult
-
-# NIPYPE import
-try:
-    from nipype.interfaces.base import InterfaceResult
-except ImportError:
-    # if nipype is not here, we will not really need this but it is used in
-    # object type checking in CapsulResultEncoder
-    class InterfaceResult(object):
-        pass
+from capsul.utils.file_formats import copy_files_group, existing_files_group
+from capsul.utils.runtime_context import save_environment
+from capsul.utils.execution_trace import trace_span
 
 # TRAITS import
 from traits.api import Undefined
 
+# SCANDIR import: fast directory listing, available in the standard library
+# since python 3.5 or through the scandir backport package
+try:
+    from os import scandir
+except ImportError:
+    try:
+        from scandir import scandir
+    except ImportError:
+        scandir = None
+
 
 ###########################################################################
 # Proxy process objects
@@ -182,7 +187,8 @@ class MemorizedProcess(object):
     structure. Methods are provided to inspect the cache or clean it.
     """
 
-    def __init__(self, process, cachedir, timestamp=None, verbose=1):
+    def __init__(self, process, cachedir, timestamp=None, verbose=1,
+                 strict_fingerprint=False):
         """ Initialize the MemorizedProcess class.
 
         Parameters
@@ -199,6 +205,9 @@ class MemorizedProcess(object):
             is called.
         verbose: int
             if different from zero, print console messages.
+        strict_fingerprint: bool (optional, default False)
+            if True, the input directories fingerprints consider the files
+            content, otherwise only the files stats.
         """
         # Check the a process is passed
         self.process_class = process.__class__
@@ -227,6 +236,12 @@ class MemorizedProcess(object):
         # Store if some messages have to be displayed
         self.verbose = verbose
 
+        # Directory fingerprint parameters: the files content hashes are
+        # persisted in the memory to avoid recomputing them
+        self.strict_fingerprint = strict_fingerprint
+        self.directory_index_file = os.path.join(
+            self.cachedir, "directory_index.json")
+
     def __call__(self, **kwargs):
         """ Call wrapped process and cache result, or read cache if
         available.
@@ -248,10 +263,14 @@ class MemorizedProcess(object):
 
         # Create the destination folder and a unique id for the current
         # process
-        process_dir, process_hash, input_parameters = self._get_process_id()
+        with trace_span(self.process.id, "input_hashing"):
+            process_dir, process_hash, input_parameters = \
+                self._get_process_id()
+        with trace_span(self.process.id, "cache_lookup"):
+            cached = os.path.isdir(process_dir)
 
         # Execute the process
-        if not os.path.isdir(process_dir):
+        if not cached:
 
             # Create the destination memory folder
             os.makedirs(process_dir)
@@ -266,17 +285,19 @@ class MemorizedProcess(object):
 
                 # Save the result files in the memory with the corresponding
                 # mapping
-                output_parameters = {}
-                for name, trait in self.process.traits(output=True).items():
-                    # Get the trait value
-                    value = self.process.get_parameter(name)
-                    output_parameters[name] = value
-                file_mapping = []
-                self._copy_files_to_memory(output_parameters, process_dir,
-                                           file_mapping)
-                map_fname = os.path.join(process_dir, "file_mapping.json")
-                with open(map_fname, "w") as open_file:
-                    open_file.write(json.dumps(file_mapping))
+                with trace_span(self.process.id, "cache_publication"):
+                    output_parameters = {}
+                    for name, trait in self.process.traits(
+                            output=True).items():
+                        # Get the trait value
+                        value = self.process.get_parameter(name)
+                        output_parameters[name] = value
+                    file_mapping = []
+                    self._copy_files_to_memory(output_parameters, process_dir,
+                                               file_mapping)
+                    map_fname = os.path.join(process_dir, "file_mapping.json")
+                    with open(map_fname, "w") as open_file:
+                        open_file.write(json.dumps(file_mapping))
 
             except:
                 shutil.rmtree(process_dir)
@@ -284,15 +305,17 @@ class MemorizedProcess(object):
 
         # Restore the process results from the cache folder
         else:
-            # Restore the memorized files
-            map_fname = os.path.join(process_dir, "file_mapping.json")
-            with open(map_fname) as json_data:
-                file_mapping = json.load(json_data)
-            for workspace_file, memory_file in file_mapping:
-                shutil.copy2(memory_file, workspace_file)
+            with trace_span(self.process.id, "cache_restore"):
+                # Restore the memorized files
+                map_fname = os.path.join(process_dir, "file_mapping.json")
+                with open(map_fname) as json_data:
+                    file_mapping = json.load(json_data)
+                for workspace_file, memory_file in file_mapping:
+                    shutil.copy2(memory_file, workspace_file)
 
-            # Update the process output traits
-            result = self._load_process_result(process_dir, input_parameters)
+                # Update the process output traits
+                result = self._load_process_result(process_dir,
+                                                   input_parameters)
 
         return result
 
@@ -321,15 +344,14 @@ class MemorizedProcess(object):
                 if val is not Undefined:
                     self._copy_files_to_memory(val, process_dir, file_mapping)
 
-        # Otherwise start the copy if the object is a file
+        # Otherwise start the copy if the object is a file: the companion
+        # files of the file format are copied too
         else:
             if (python_object is not Undefined and
                     isinstance(python_object, basestring) and
                     os.path.isfile(python_object)):
-                fname = os.path.basename(python_object)
-                out = os.path.join(process_dir, fname)
-                shutil.copy2(python_object, out)
-                file_mapping.append((python_object, out))
+                file_mapping.extend(
+                    copy_files_group(python_object, process_dir))
 
     def _call_process(self, process_dir, input_parameters):
         """ Call a process.
@@ -359,12 +381,20 @@ class MemorizedProcess(object):
         result = self.process()
         duration = time.time() - start_time
 
-        # Save the result in json format
-        json_data = json.dumps(result, sort_keys=True, check_circular=True,
-                               indent=4, cls=CapsulResultEncoder)
-        result_fname = os.path.join(process_dir, "result.json")
-        with open(result_fname, "w") as open_file:
-            open_file.write(json_data)
+        with trace_span(self.process.id, "result_saving"):
+            # Save the result in json format
+            json_data = json.dumps(result, sort_keys=True,
+                                   check_circular=True, indent=4,
+                                   cls=CapsulResultEncoder)
+            result_fname = os.path.join(process_dir, "result.json")
+            with open(result_fname, "w") as open_file:
+                open_file.write(json_data)
+
+            # Save once in the memory the environment referenced by its hash
+            runtime = getattr(result, "runtime", None)
+            if (isinstance(runtime, dict) and
+                    isinstance(runtime.get("environ"), basestring)):
+                save_environment(self.cachedir, runtime["environ"])
 
         # Information message
         if self.verbose != 0:
@@ -479,9 +509,22 @@ class MemorizedProcess(object):
                 input_parameters[name] = value
 
         # Add the tool versions to check roughly if the running codes have
-        # changed and add file path fingerprints
+        # changed and add file and directory path fingerprints.
+        # The output directory content is modified by the process execution
+        # itself and is therefore not fingerprinted.
         process_parameters = input_parameters.copy()
+        output_directory = process_parameters.pop("output_directory", None)
+        if self.strict_fingerprint:
+            self._directory_index = load_directory_index(
+                self.directory_index_file)
+        else:
+            self._directory_index = None
         process_parameters = self._add_fingerprints(process_parameters)
+        if self._directory_index is not None:
+            save_directory_index(self.directory_index_file,
+                                 self._directory_index)
+        if output_directory is not None:
+            process_parameters["output_directory"] = output_directory
         process_parameters["versions"] = self.process.versions
 
         # Generate the process hash
@@ -492,7 +535,7 @@ class MemorizedProcess(object):
         return process_hash, input_parameters
 
     def _add_fingerprints(self, python_object):
-        """ Add file path fingerprints.
+        """ Add file and directory path fingerprints.
 
         Parameters
         ----------
@@ -520,13 +563,18 @@ class MemorizedProcess(object):
             if isinstance(python_object, tuple):
                 out = tuple(out)
 
-        # Otherwise start the deletion if the object is a file
+        # Otherwise compute the fingerprint if the object is a file or a
+        # directory
         else:
             out = python_object
             if (python_object is not Undefined and
-                    isinstance(python_object, basestring) and
-                    os.path.isfile(python_object)):
-                out = file_fingerprint(python_object)
+                    isinstance(python_object, basestring)):
+                if os.path.isfile(python_object):
+                    out = file_fingerprint(python_object)
+                elif os.path.isdir(python_object):
+                    out = directory_fingerprint(
+                        python_object, self.strict_fingerprint,
+                        self._directory_index)
 
         return out
 
@@ -665,6 +713,8 @@ def file_fingerprint(afile):
 
     Do not consider the file content, just the fingerprint (ie. the mtime,
     the size and the file location).
+    The companion files of the file format (ie. the '.hdr' of an '.img'
+    file) are also considered.
 
     Parameters
     ----------
@@ -685,9 +735,223 @@ def file_fingerprint(afile):
         stat = os.stat(afile)
         fingerprint["size"] = str(stat.st_size)
         fingerprint["mtime"] = str(stat.st_mtime)
+        companions = existing_files_group(afile)[1:]
+        if companions:
+            fingerprint["companions"] = [
+                file_fingerprint(companion) for companion in companions]
+    return fingerprint
+
+
+def directory_fingerprint(adir, strict=False, index=None):
+    """ Computes the directory fingerprint.
+
+    The directory tree is walked once and a Merkle-style digest is built:
+    each directory digest is computed from its sorted entries, ie. the
+    files stats (mtime and size), or the files content hashes in strict
+    mode, and the sub-directories digests. Symbolic links to directories
+    are not followed, the link target is considered instead.
+
+    Parameters
+    ----------
+    adir: string
+        the directory to process.
+    strict: bool (optional, default False)
+        if True consider the files content, otherwise only the files stats.
+    index: dict (optional, default None)
+        a per-directory index of the files content hashes of the form
+        {dirpath: {fname: [size, mtime, md5]}}, used in strict mode to hash
+        only the new or modified files. This index is updated in place.
+
+    Returns
+    -------
+    fingerprint: dict
+        the directory location and digest.
+    """
+    fingerprint = {
+        "name": adir,
+        "digest": None
+    }
+    if os.path.isdir(adir):
+        visited = set()
+        if index is None:
+            index = {}
+        fingerprint["digest"] = _directory_digest(
+            adir, strict, index, visited)
+
+        # Forget the directories that do not exist anymore in the tree
+        prefix = os.path.join(adir, "")
+        for dirpath in index.keys():
+            if dirpath.startswith(prefix) and dirpath not in visited:
+                del index[dirpath]
+
     return fingerprint
 
 
+def _directory_digest(adir, strict, index, visited):
+    """ Recursive function that computes a directory digest.
+
+    Parameters
+    ----------
+    adir: string
+        the directory to process.
+    strict: bool
+        if True consider the files content, otherwise only the files stats.
+    index: dict
+        the per-directory files content hashes.
+    visited: set
+        store in this structure the processed directories.
+
+    Returns
+    -------
+    digest: str
+        the directory md5 digest.
+    """
+    visited.add(adir)
+    known_files = index.get(adir, {})
+    files = {}
+    entries = []
+    for name, path, kind, value in _scan_directory(adir):
+        if kind == "d":
+            entries.append(
+                [name, kind, _directory_digest(path, strict, index, visited)])
+        elif kind == "f":
+            size, mtime = str(value.st_size), str(value.st_mtime)
+            if strict:
+                known = known_files.get(name)
+                if known is not None and known[:2] == [size, mtime]:
+                    content = known[2]
+                else:
+                    content = _content_hash(path)
+                files[name] = [size, mtime, content]
+                entries.append([name, kind, content])
+            else:
+                entries.append([name, kind, size, mtime])
+        else:
+            entries.append([name, kind, value])
+    if strict:
+        index[adir] = files
+    entries.sort()
+    hasher = hashlib.new("md5")
+    hasher.update(json.dumps(entries))
+    return hasher.hexdigest()
+
+
+def _scan_directory(adir):
+    """ List the entries of a directory.
+
+    Use scandir when available to save system calls.
+
+    Parameters
+    ----------
+    adir: string
+        the directory to list.
+
+    Returns
+    -------
+    entries: list of 4-uplet
+        the (name, path, kind, value) directory entries, where kind is 'd'
+        for directories, 'f' for files (value is then the file stat) and
+        'l' for links to directories, to special files or broken links
+        (value is then the link target) and 's' for special files such as
+        fifos, sockets or devices (value is then None). Both listing methods
+        give the same entries.
+    """
+    entries = []
+    if scandir is not None:
+        for entry in scandir(adir):
+            if entry.is_dir(follow_symlinks=False):
+                entries.append((entry.name, entry.path, "d", None))
+            elif entry.is_file():
+                entries.append((entry.name, entry.path, "f", entry.stat()))
+            elif entry.is_symlink():
+                entries.append((entry.name, entry.path, "l",
+                                os.readlink(entry.path)))
+            else:
+                entries.append((entry.name, entry.path, "s", None))
+    else:
+        for name in os.listdir(adir):
+            path = os.path.join(adir, name)
+            st = os.lstat(path)
+            if stat.S_ISDIR(st.st_mode):
+                entries.append((name, path, "d", None))
+            elif stat.S_ISREG(st.st_mode):
+                entries.append((name, path, "f", st))
+            elif os.path.isfile(path):
+                entries.append((name, path, "f", os.stat(path)))
+            elif stat.S_ISLNK(st.st_mode):
+                entries.append((name, path, "l", os.readlink(path)))
+            else:
+                entries.append((name, path, "s", None))
+    return entries
+
+
+def _content_hash(afile, block_size=1048576):
+    """ Computes the md5 hash of a file content.
+
+    Parameters
+    ----------
+    afile: string
+        the file to process.
+    block_size: int (optional)
+        the size of the blocks read from the file.
+
+    Returns
+    -------
+    digest: str
+        the file content md5 digest.
+    """
+    hasher = hashlib.new("md5")
+    with open(afile, "rb") as open_file:
+        while True:
+            block = open_file.read(block_size)
+            if not block:
+                break
+            hasher.update(block)
+    return hasher.hexdigest()
+
+
+def load_directory_index(index_file):
+    """ Load a persisted directory fingerprint index.
+
+    Parameters
+    ----------
+    index_file: string
+        the json index file.
+
+    Returns
+    -------
+    index: dict
+        the per-directory files content hashes, empty if the index file
+        does not exist or is corrupted.
+    """
+    if os.path.isfile(index_file):
+        try:
+            with open(index_file) as json_data:
+                return json.load(json_data)
+        except ValueError:
+            pass
+    return {}
+
+
+def save_directory_index(index_file, index):
+    """ Persist a directory fingerprint index.
+
+    The index is first written in a temporary file that is then renamed,
+    so concurrent readers never see a partial index.
+
+    Parameters
+    ----------
+    index_file: string
+        the json index file.
+    index: dict
+        the per-directory files content hashes.
+    """
+    tmp_file = "{0}.{1}.tmp".format(index_file, os.getpid())
+    with open(tmp_file, "w") as open_file:
+        json.dump(index, open_file)
+    os.rename(tmp_file, index_file)
+
+
 class CapsulResultEncoder(json.JSONEncoder):
     """ Deal with ProcessResult in json.
     """
@@ -704,12 +968,17 @@ class CapsulResultEncoder(json.JSONEncoder):
         if isinstance(obj, Undefined.__class__):
             return "<undefined_trait_value>"
 
-        # InterfaceResult special case
-        if isinstance(obj, InterfaceResult):
-            return "<skip_nipype_interface_result>"
+        # InterfaceResult special case: nipype and numpy are not imported
+        # here, if they are not loaded the object can't be one of their
+        # types
+        if "nipype.interfaces.base" in sys.modules:
+            from nipype.interfaces.base import InterfaceResult
+            if isinstance(obj, InterfaceResult):
+                return "<skip_nipype_interface_result>"
 
         # Array special case
-        if isinstance(obj, numpy.ndarray):
+        numpy = sys.modules.get("numpy")
+        if numpy is not None and isinstance(obj, numpy.ndarray):
             return obj.tolist()
 
         # Call the base class default method
@@ -753,13 +1022,16 @@ class Memory(object):
     clear
     """
 
-    def __init__(self, cachedir):
+    def __init__(self, cachedir, strict_fingerprint=False):
         """ Initialize the Memory class.
 
         Parameters
         ----------
         base_dir: string
             the directory name of the location for the caching.
+        strict_fingerprint: bool (optional, default False)
+            if True, the input directories fingerprints consider the files
+            content, otherwise only the files stats.
         """
         # Build the capsul memory folder
         if cachedir is not None:
@@ -773,6 +1045,7 @@ class Memory(object):
         # Define class parameters
         self.cachedir = cachedir
         self.timestamp = time.time()
+        self.strict_fingerprint = strict_fingerprint
 
     def cache(self, process, verbose=1):
         """ Create a proxy of the given process in order to only execute
@@ -828,7 +1101,7 @@ class Memory(object):
         # Otherwise a proxy process is created
         else:
             return MemorizedProcess(process, self.cachedir, self.timestamp,
-                                    verbose)
+                                    verbose, self.strict_fingerprint)
 
     def clear(self, skips=None):
         """ Remove all the cache appart from those given to the method
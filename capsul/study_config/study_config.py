@@ -11,6 +11,7 @@ import os
 import logging
 import json
 import sys
+import time
 if sys.version_info[:2] >= (2, 7):
     from collections import OrderedDict
 else:
@@ -20,7 +21,7 @@ else:
 logger = logging.getLogger(__name__)
 
 # Trait import
-from traits.api import Directory, Bool, String, Undefined
+from traits.api import Directory, File, Bool, String, Undefined
 
 # Soma import
 from soma.controller import Controller
@@ -28,10 +29,10 @@ from soma.controller import Controller
 # Capsul import
 from capsul.pipeline import Pipeline
 from capsul.process import Process
+from capsul.utils.execution_trace import (
+    trace_span, get_tracer, start_tracing, stop_tracing)
 from run import run_process
-from capsul.pipeline.pipeline_workflow import (
-    workflow_from_pipeline, local_workflow_run)
-from capsul.pipeline.pipeline_nodes import IterativeNode, Node
+from capsul.pipeline.pipeline_nodes import IterativeNode, MapNode, Node
 
 
 class StudyConfig(Controller):
@@ -41,10 +42,16 @@ class StudyConfig(Controller):
 
     StudyConfig has modules (see BrainVISAConfig, FSLConfig, MatlabConfig,
     SmartCachingConfig, SomaWorkflowConfig, SPMConfig, FOMConfig).
-    Modules are initialized in the constructor, so their list has to be setup
+    Modules are created in the constructor, so their list has to be setup
     before instantiating StudyConfig. A default modules list is used when no
     modules are specified: StudyConfig.default_modules
 
+    The modules are initialized in the constructor. With 'lazy_modules'
+    their initialization (which may probe external tools) is deferred until
+    one of the module traits is read or set, until the module is required,
+    or until a process is run. The modules initialization times are logged
+    and stored in 'modules_initialization_time'.
+
     StudyConfig configuration is loaded from a global file and then from a
     study specific file (based on study_name parameter). The global
     configuration file name is either in os.environ['CAPSUL_CONFIG'] or
@@ -69,10 +76,15 @@ class StudyConfig(Controller):
         parameter to set the study output directory
     `generate_logging` : bool (default False)
         parameter to control the log generation
+    `execution_trace_file` : str
+        if set, the execution spans of each run are saved in this Chrome
+        trace file (see capsul.utils.execution_trace)
 
     Methods
     -------
     run
+    initialize_modules
+    require_module
     reset_process_counter
     set_trait_value
     get_trait
@@ -105,12 +117,16 @@ class StudyConfig(Controller):
         False,
         desc="Parameter to control the log generation")
 
+    execution_trace_file = File(
+        Undefined,
+        desc="Chrome trace file where the execution spans are saved")
+
     automatic_configuration = Bool(
         False,
         desc="If True, tries to automatically setup configuration on startup")
 
     def __init__(self, study_name=None, init_config=None, modules=None,
-                 **override_config):
+                 lazy_modules=False, **override_config):
         """ Initilize the StudyConfig class
 
         Parameters
@@ -123,6 +139,11 @@ class StudyConfig(Controller):
         modules: list of string (default self.default_modules).
             the names of configuration module classes that will be included
             in this study configuration.
+        lazy_modules: bool (default False)
+            if True, the modules are initialized when they are first used
+            instead of in the constructor. A process that is not executed
+            through run must then call initialize_modules (or require_module)
+            to get the modules environment setup.
         override_config: dictionary
             The content of these keyword parameters will be set on the
             configuration after it has been initialized from configuration
@@ -158,6 +179,24 @@ class StudyConfig(Controller):
         # module name
         self.modules_data = Controller()
 
+        # Modules initializations requested while a configuration batch is
+        # in progress are run once at the end of the batch
+        self._delay_modules_initialization = 0
+        self._pending_modules_initialization = []
+
+        # The modules traits {module_name: trait_names}, the initialized
+        # modules and their initialization times
+        self._modules_traits = {}
+        self._initialized_modules = set()
+        self._initializing_modules = set()
+        self.modules_initialization_time = {}
+
+        # Intern identifier
+        self.name = self.__class__.__name__
+
+        # Parameter that is incremented at each process execution
+        self.process_counter = 1
+
         self.modules = {}
         for module in modules:
             self.load_module(module, config)
@@ -165,44 +204,95 @@ class StudyConfig(Controller):
         # Set self attributes according to configuration values
         for k, v in config.iteritems():
             setattr(self, k, v)
-        self.initialize_modules()
+
+        # The traits of the modules that are not initialized yet of the form
+        # {trait_name: module_name}: reading or setting one of them
+        # initializes its module
+        self._lazy_module_traits = {}
+        if not lazy_modules:
+            self.initialize_modules()
+            return
+        self._lazy_module_traits = dict(
+            (trait_name, module_name)
+            for module_name, trait_names in self._modules_traits.iteritems()
+            for trait_name in trait_names)
+        if self._lazy_module_traits:
+            self._lazy_module_trait_names = list(self._lazy_module_traits)
+            self.on_trait_change(self._lazy_module_trait_changed,
+                                 self._lazy_module_trait_names)
+            self.__class__ = _lazy_modules_class(self.__class__)
+
+    def _lazy_module_trait_changed(self, name, new):
+        """ Initialize the module of a lazy trait when it is set.
+        """
+        module_name = self._lazy_module_traits.get(name)
+        if module_name is not None:
+            self.require_module(module_name)
 
     def initialize_modules(self):
         """
-        Modules initialization, calls initialize_module on each config module.
+        Modules initialization, calls initialize_module on each config module
+        that is not initialized yet.
         This is not done during module instanciation to allow interactions
         between modules (e.g. Matlab configuration can influence Nipype
         configuration). Modules dependencies are taken into account in
         initialization.
         """
-        already_initialized = set()
-        # Use a stack to allow to manage module dependencies
-        stack = self.modules.keys()
-        while stack:
-            module_name = stack.pop(0)
-            if module_name in already_initialized:
-                continue
-            module = self.modules.get(module_name)
-            if not module:
-                raise EnvironmentError('Required StudyConfig module %s is '
-                                       'missing' % module_name)
-            # Check if there are dependent modules that must be initilaized
-            # before the current one
-            initialize_first = [m for m in module.dependencies
-                                if m not in already_initialized]
-            if initialize_first:
-                stack = initialize_first + [module_name] + stack
-                continue
-            # Intitialize a module
-            module.initialize_module()
-            module.initialize_callbacks()
-            already_initialized.add(module_name)
+        for module_name in list(self.modules):
+            self.require_module(module_name)
 
-        # Intern identifier
-        self.name = self.__class__.__name__
+    def require_module(self, module_name):
+        """ Initialize a module and the modules it depends on if they are
+        not initialized yet.
 
-        # Parameter that is incremented at each process execution
-        self.process_counter = 1
+        Parameters
+        ----------
+        module_name: str (mandatory)
+            the name of the module to initialize (e.g. "FSLConfig").
+        """
+        # A module reads its own traits during its initialization
+        if (module_name in self._initialized_modules or
+                module_name in self._initializing_modules):
+            return
+        module = self.modules.get(module_name)
+        if not module:
+            raise EnvironmentError('Required StudyConfig module %s is '
+                                   'missing' % module_name)
+
+        # A module whose initialization fails is initialized again when
+        # it is next required
+        self._initializing_modules.add(module_name)
+        try:
+            # Initialize first the modules it depends on
+            for dependency in module.dependencies:
+                if dependency not in self.modules:
+                    raise EnvironmentError('Required StudyConfig module %s '
+                                           'is missing' % dependency)
+                self.require_module(dependency)
+
+            # Intitialize the module
+            start_time = time.time()
+            module.initialize_module()
+            module.initialize_callbacks()
+        finally:
+            self._initializing_modules.discard(module_name)
+        self._initialized_modules.add(module_name)
+        self.modules_initialization_time[module_name] = \
+            time.time() - start_time
+        logger.info("StudyConfig module {0} initialized in {1:.3f} s.".format(
+            module_name, self.modules_initialization_time[module_name]))
+
+        # The module traits are now regular traits, the attributes access
+        # hook is removed when all the modules are initialized
+        lazy_module_traits = self._lazy_module_traits
+        if lazy_module_traits:
+            for trait_name in self._modules_traits.get(module_name, []):
+                lazy_module_traits.pop(trait_name, None)
+            if not lazy_module_traits:
+                self.on_trait_change(self._lazy_module_trait_changed,
+                                     self._lazy_module_trait_names,
+                                     remove=True)
+                self.__class__ = self.__class__.eager_class
 
     ####################################################################
     # Methods
@@ -224,10 +314,47 @@ class StudyConfig(Controller):
             python_module = __import__(python_module,
                                        fromlist=[config_module_name])
             config_module_class = getattr(python_module, config_module_name)
+            user_traits = set(self.user_traits())
             module = config_module_class(self, config)
             self.modules[config_module_name] = module
+            self._modules_traits[config_module_name] = [
+                trait_name for trait_name in self.user_traits()
+                if trait_name not in user_traits]
             return module
 
+    def delay_modules_initialization(self):
+        """ Start a configuration batch: the modules initializations
+        requested through request_module_initialization are delayed until
+        the matching call to restore_modules_initialization.
+        """
+        self._delay_modules_initialization += 1
+
+    def restore_modules_initialization(self):
+        """ End a configuration batch and initialize once each module whose
+        initialization was requested during the batch.
+        """
+        self._delay_modules_initialization -= 1
+        if self._delay_modules_initialization == 0:
+            pending_modules = self._pending_modules_initialization
+            self._pending_modules_initialization = []
+            for module in pending_modules:
+                module.initialize_module()
+
+    def request_module_initialization(self, module):
+        """ Initialize a module, or schedule its initialization at the end
+        of the current configuration batch.
+
+        Parameters
+        ----------
+        module: StudyConfigModule (mandatory)
+            the module to initialize.
+        """
+        if self._delay_modules_initialization:
+            if module not in self._pending_modules_initialization:
+                self._pending_modules_initialization.append(module)
+        else:
+            module.initialize_module()
+
     def run(self, process_or_pipeline, executer_qc_nodes=True, verbose=1,
             **kwargs):
         """ Method to execute a process or a pipline in a study configuration
@@ -249,12 +376,36 @@ class StudyConfig(Controller):
         verbose: int
             if different from zero, print console messages.
         """
+        # Record the execution spans if requested
+        trace_file = self.execution_trace_file
+        if trace_file is Undefined or get_tracer() is not None:
+            return self._run_workflow(process_or_pipeline, executer_qc_nodes,
+                                      verbose, **kwargs)
+        start_tracing()
+        try:
+            return self._run_workflow(process_or_pipeline, executer_qc_nodes,
+                                      verbose, **kwargs)
+        finally:
+            stop_tracing(trace_file)
+
+    def _run_workflow(self, process_or_pipeline, executer_qc_nodes, verbose,
+                      **kwargs):
+        """ Method to execute a process or a pipline (see run).
+        """
+        # The process may need any module: initialize the deferred ones
+        self.initialize_modules()
+
         # Use soma worflow to execute the pipeline or porcess in parallel
         # on the local machine
         if self.get_trait_value("use_soma_workflow"):
 
+            # Import soma workflow only when it is used
+            from capsul.pipeline.pipeline_workflow import (
+                workflow_from_pipeline, local_workflow_run)
+
             # Create soma workflow pipeline
-            workflow = workflow_from_pipeline(process_or_pipeline)
+            with trace_span(process_or_pipeline.id, "scheduling"):
+                workflow = workflow_from_pipeline(process_or_pipeline)
             controller, wf_id = local_workflow_run(process_or_pipeline.id,
                                                    workflow)
             workflow_status = controller.workflow_status(wf_id)
@@ -298,7 +449,9 @@ class StudyConfig(Controller):
             # Generate ordered execution list
             execution_list = []
             if isinstance(process_or_pipeline, Pipeline):
-                execution_list = process_or_pipeline.workflow_ordered_nodes()
+                with trace_span(process_or_pipeline.id, "scheduling"):
+                    execution_list = \
+                        process_or_pipeline.workflow_ordered_nodes()
                 # Filter process nodes if necessary
                 if not executer_qc_nodes:
                     execution_list = [node for node in execution_list
@@ -314,9 +467,21 @@ class StudyConfig(Controller):
             # Execute each process node element
             for process_node in execution_list:
 
+                # Resolve the values of the lazy propagation mode
+                if isinstance(process_or_pipeline, Pipeline):
+                    process_or_pipeline.settle_values()
+
+                # Special case: a map node
+                # Create and execute each item process
+                if isinstance(process_node, MapNode):
+                    item_processes = process_node.item_processes()
+                    for item_process in item_processes:
+                        self._run(item_process, verbose, **kwargs)
+                    process_node.pack_outputs(item_processes)
+
                 # Special case: an iterative node
                 # Execute each element of the iterative pipeline
-                if isinstance(process_node, IterativeNode):
+                elif isinstance(process_node, IterativeNode):
 
                     # Get the iterative pipeline
                     iterative_pipeline = process_node.process
@@ -366,12 +531,14 @@ class StudyConfig(Controller):
             cachedir = None
         else:
             cachedir = self.output_directory
-        returncode, log_file = run_process(
-            destination_folder,
-            process_instance,
-            cachedir,
-            self.generate_logging,
-            **kwargs)
+        with trace_span(process_instance.id, "node",
+                        process_counter=self.process_counter):
+            returncode, log_file = run_process(
+                destination_folder,
+                process_instance,
+                cachedir,
+                self.generate_logging,
+                **kwargs)
 
         # Increment the number of executed process count
         self.process_counter += 1
@@ -528,16 +695,21 @@ class StudyConfig(Controller):
             the structure that contain the default study configuration:
             see the class attributes to build this structure.
         """
-        # Go through the configuration structure
-        for trait_name, trait_value in new_config.iteritems():
-
-            # Try to update the 'trait_name' configuration element
-            try:
-                self.set_trait_value(trait_name, trait_value)
-            except:
-                logger.debug(
-                    "Could not set value for config variable {0}: "
-                    "{1}".format(trait_name, repr(trait_value)))
+        # Go through the configuration structure, the modules being
+        # initialized once all the elements are set
+        self.delay_modules_initialization()
+        try:
+            for trait_name, trait_value in new_config.iteritems():
+
+                # Try to update the 'trait_name' configuration element
+                try:
+                    self.set_trait_value(trait_name, trait_value)
+                except:
+                    logger.debug(
+                        "Could not set value for config variable {0}: "
+                        "{1}".format(trait_name, repr(trait_value)))
+        finally:
+            self.restore_modules_initialization()
 
     def set_trait_value(self, trait_name, trait_value):
         """ Method to set the value of a parameter.
@@ -598,6 +770,34 @@ class StudyConfig(Controller):
             return None
 
 
+# The StudyConfig subclasses with lazy modules of the form
+# {study_config_class: lazy_modules_class}
+_lazy_modules_classes = {}
+
+
+def _lazy_modules_class(study_config_class):
+    """ Get the class of a StudyConfig whose modules are not all initialized
+    yet: reading a module trait initializes the module. The StudyConfig is
+    switched back to its 'eager_class' once all the modules are initialized
+    so that the attributes access cost is only paid meanwhile.
+    """
+    lazy_class = _lazy_modules_classes.get(study_config_class)
+    if lazy_class is None:
+        def __getattribute__(self, name):
+            lazy_module_traits = study_config_class.__getattribute__(
+                self, "__dict__").get("_lazy_module_traits")
+            if lazy_module_traits and name in lazy_module_traits:
+                self.require_module(lazy_module_traits[name])
+            return study_config_class.__getattribute__(self, name)
+
+        lazy_class = type(study_config_class.__name__, (study_config_class, ),
+                          {"__getattribute__": __getattribute__,
+                           "__module__": study_config_class.__module__,
+                           "eager_class": study_config_class})
+        _lazy_modules_classes[study_config_class] = lazy_class
+    return lazy_class
+
+
 class StudyConfigModule(object):
     @property
     def name(self):
@@ -0,0 +1,74 @@
+#! /usr/bin/env python
+##########################################################################
+# CAPSUL - Copyright (C) CEA, 2015
+# Distributed under the terms of the CeCILL-B license, as published by
+# the CEA-CNRS-INRIA. Refer to the LICENSE file or to
+# http://www.cecill.info/licences/Licence_CeCILL-B_V1-en.html
+# for details.
+##########################################################################
+
+# System import
+import os
+import shutil
+import tempfile
+import unittest
+
+# Capsul import
+from capsul.study_config import config_utils
+
+
+class TestToolCache(unittest.TestCase):
+    """ Class to test the persistent tool discovery cache.
+    """
+    def setUp(self):
+        """ In the setup create a configuration script and redirect the
+        tool cache.
+        """
+        self.tmpdir = tempfile.mkdtemp()
+        self.sh_file = os.path.join(self.tmpdir, "setup.sh")
+        with open(self.sh_file, "w") as open_file:
+            open_file.write("export TOOL_HOME=/opt/tool\n")
+        self.tool_cache_file = config_utils.tool_cache_file
+        config_utils.tool_cache_file = os.path.join(
+            self.tmpdir, "capsul", "tool_cache.json")
+
+    def tearDown(self):
+        config_utils.tool_cache_file = self.tool_cache_file
+        shutil.rmtree(self.tmpdir)
+
+    def test_environment_cache(self):
+        """ Method to test that a script is parsed again only when it is
+        modified.
+        """
+        environment = config_utils.environment(self.sh_file)
+        self.assertEqual(environment["TOOL_HOME"], "/opt/tool")
+        self.assertTrue(os.path.isfile(config_utils.tool_cache_file))
+
+        # The cached environment is reused
+        probes = []
+        key = "environment:{0}:{{}}".format(self.sh_file)
+        self.assertEqual(
+            config_utils.cached_tool_probe(
+                self.sh_file, key, lambda: probes.append(1)),
+            environment)
+        self.assertEqual(probes, [])
+
+        # A modified script is parsed again
+        with open(self.sh_file, "w") as open_file:
+            open_file.write("export TOOL_HOME=/opt/tool2\n")
+        mtime = os.path.getmtime(self.sh_file)
+        os.utime(self.sh_file, (mtime + 10, mtime + 10))
+        environment = config_utils.environment(self.sh_file)
+        self.assertEqual(environment["TOOL_HOME"], "/opt/tool2")
+
+
+def test():
+    """ Function to execute unitest
+    """
+    suite = unittest.TestLoader().loadTestsFromTestCase(TestToolCache)
+    runtime = unittest.TextTestRunner(verbosity=2).run(suite)
+    return runtime.wasSuccessful()
+
+
+if __name__ == "__main__":
+    test()
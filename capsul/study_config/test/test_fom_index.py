@@ -0,0 +1,121 @@
+#! /usr/bin/env python
+##########################################################################
+# Capsul - Copyright (C) CEA, 2015
+# Distributed under the terms of the CeCILL-B license, as published by
+# the CEA-CNRS-INRIA. Refer to the LICENSE file or to
+# http://www.cecill.info/licences/Licence_CeCILL-B_V1-en.html
+# for details.
+##########################################################################
+
+# System import
+import os
+import shutil
+import tempfile
+import unittest
+
+# Soma import
+from soma.fom import FileOrganizationModels, PathToAttributes
+
+# Capsul import
+from capsul.study_config.fom_index import FomDatasetIndex
+from capsul.process.test.test_process_with_fom import fom_definition
+
+
+class TestFomDatasetIndex(unittest.TestCase):
+    """ Class to test the bulk indexing of a FOM dataset.
+    """
+    def setUp(self):
+        """ In the setup create a dataset and its FOM parser.
+        """
+        fom = FileOrganizationModels()
+        fom.import_file(fom_definition)
+        self.pta = PathToAttributes(fom, selection={})
+        self.tmpdir = tempfile.mkdtemp()
+        self.directory = os.path.join(self.tmpdir, "dataset")
+        self.index_file = os.path.join(self.tmpdir, "index.json")
+        for path in ["s1/default/t1.nii", "s2/a2/t1.nii", "s2/a2/notes.txt"]:
+            self.create_file(path)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def create_file(self, path):
+        """ Create an empty dataset file.
+        """
+        full_path = os.path.join(self.directory, *path.split("/"))
+        if not os.path.isdir(os.path.dirname(full_path)):
+            os.makedirs(os.path.dirname(full_path))
+        open(full_path, "w").close()
+
+    def test_index(self):
+        """ Method to test the attributes table of a dataset.
+        """
+        index = FomDatasetIndex(self.pta, self.directory)
+        self.assertEqual(index.update(nb_of_workers=2), 3)
+        table = index.attributes_table()
+        self.assertEqual(
+            [(row["subject"], row["acquisition"], row["path"])
+             for row in table],
+            [("s1", "default",
+              os.path.join(self.directory, "s1", "default", "t1.nii")),
+             ("s2", "a2", os.path.join(self.directory, "s2", "a2", "t1.nii"))])
+
+    def test_incremental_update(self):
+        """ Method to test that a rescan only parses the new files.
+        """
+        index = FomDatasetIndex(self.pta, self.directory, self.index_file)
+        index.update()
+        self.assertTrue(os.path.isfile(self.index_file))
+
+        # The persisted index is reloaded and only new files are parsed
+        index = FomDatasetIndex(self.pta, self.directory, self.index_file)
+        self.assertEqual(len(index.attributes_table()), 2)
+        self.create_file("s3/default/t1.nii")
+        self.assertEqual(index.update(), 1)
+        self.assertEqual(
+            [row["subject"] for row in index.attributes_table()],
+            ["s1", "s2", "s3"])
+
+        # Removed files are dropped
+        os.remove(os.path.join(self.directory, "s1", "default", "t1.nii"))
+        self.assertEqual(index.update(), 0)
+        self.assertEqual(
+            [row["subject"] for row in index.attributes_table()],
+            ["s2", "s3"])
+
+
+    def test_symbolic_links(self):
+        """ Method to test that symbolic links are followed without looping.
+        """
+        external_directory = os.path.join(self.tmpdir, "external")
+        os.makedirs(os.path.join(external_directory, "default"))
+        open(os.path.join(external_directory, "default", "t1.nii"),
+             "w").close()
+        os.symlink(external_directory, os.path.join(self.directory, "s3"))
+        os.symlink(os.path.join(self.directory, "s2", "a2", "t1.nii"),
+                   os.path.join(self.directory, "s1", "default", "t2.nii"))
+        os.symlink(self.directory,
+                   os.path.join(self.directory, "s2", "a2", "loop"))
+        os.symlink(os.path.join(self.tmpdir, "missing"),
+                   os.path.join(self.directory, "s1", "default", "t3.nii"))
+
+        index = FomDatasetIndex(self.pta, self.directory)
+        index.update(nb_of_workers=2)
+        self.assertEqual(
+            [(row["subject"], row["acquisition"])
+             for row in index.attributes_table()],
+            [("s1", "default"), ("s2", "a2"), ("s3", "default")])
+        self.assertFalse(any(
+            path.startswith("s2/a2/loop/") for path in index.files))
+
+
+def test():
+    """ Function to execute unitest
+    """
+    suite = unittest.TestLoader().loadTestsFromTestCase(TestFomDatasetIndex)
+    runtime = unittest.TextTestRunner(verbosity=2).run(suite)
+    return runtime.wasSuccessful()
+
+
+if __name__ == "__main__":
+    test()
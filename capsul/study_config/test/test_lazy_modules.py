@@ -0,0 +1,111 @@
+#! /usr/bin/env python
+##########################################################################
+# CAPSUL - Copyright (C) CEA, 2015
+# Distributed under the terms of the CeCILL-B license, as published by
+# the CEA-CNRS-INRIA. Refer to the LICENSE file or to
+# http://www.cecill.info/licences/Licence_CeCILL-B_V1-en.html
+# for details.
+##########################################################################
+
+# System import
+import unittest
+
+# Capsul import
+from capsul.study_config.study_config import StudyConfig, StudyConfigModule
+
+
+class FailingModule(StudyConfigModule):
+    """ Module whose first initialization fails.
+    """
+    def __init__(self, study_config, configuration):
+        super(FailingModule, self).__init__(study_config, configuration)
+        self.initializations = 0
+
+    def initialize_module(self):
+        self.initializations += 1
+        if self.initializations == 1:
+            raise EnvironmentError("first initialization fails")
+
+
+class TestLazyModules(unittest.TestCase):
+    """ Class to test the deferred initialization of the StudyConfig
+    modules.
+    """
+    def test_lazy_initialization(self):
+        """ Method to test that a module is initialized when its traits
+        are first read.
+        """
+        study_config = StudyConfig(
+            init_config={},
+            modules=["SmartCachingConfig", "MatlabConfig", "SPMConfig"],
+            lazy_modules=True)
+        self.assertEqual(study_config.modules_initialization_time, {})
+        self.assertFalse(type(study_config) is StudyConfig)
+
+        # Reading the study traits does not initialize the modules
+        study_config.output_directory
+        self.assertEqual(study_config.modules_initialization_time, {})
+
+        # Reading a module trait initializes it and its dependencies
+        self.assertFalse(study_config.use_spm)
+        self.assertEqual(
+            sorted(study_config.modules_initialization_time),
+            ["MatlabConfig", "SPMConfig"])
+        study_config.initialize_modules()
+        self.assertEqual(
+            sorted(study_config.modules_initialization_time),
+            ["MatlabConfig", "SPMConfig", "SmartCachingConfig"])
+
+        # The attributes access hook is removed
+        self.assertTrue(type(study_config) is StudyConfig)
+
+    def test_lazy_initialization_on_set(self):
+        """ Method to test that a module is initialized when one of its
+        traits is set.
+        """
+        study_config = StudyConfig(
+            init_config={}, modules=["SmartCachingConfig", "MatlabConfig"],
+            lazy_modules=True)
+        study_config.use_matlab = False
+        self.assertEqual(
+            list(study_config.modules_initialization_time), ["MatlabConfig"])
+
+    def test_failed_initialization(self):
+        """ Method to test that a module whose initialization failed is
+        initialized again when it is next required.
+        """
+        study_config = StudyConfig(
+            init_config={}, modules=["SmartCachingConfig"], lazy_modules=True)
+        module = FailingModule(study_config, {})
+        study_config.modules["FailingModule"] = module
+        self.assertRaises(EnvironmentError, study_config.require_module,
+                          "FailingModule")
+        self.assertFalse("FailingModule" in
+                         study_config.modules_initialization_time)
+        study_config.require_module("FailingModule")
+        self.assertEqual(module.initializations, 2)
+        study_config.require_module("FailingModule")
+        self.assertEqual(module.initializations, 2)
+
+    def test_eager_initialization(self):
+        """ Method to test the initialization of the modules in the
+        constructor.
+        """
+        study_config = StudyConfig(
+            init_config={}, modules=["SmartCachingConfig"])
+        self.assertEqual(
+            list(study_config.modules_initialization_time),
+            ["SmartCachingConfig"])
+        self.assertTrue(type(study_config) is StudyConfig)
+
+
+def test():
+    """ Function to execute unitest
+    """
+    suite = unittest.TestLoader().loadTestsFromTestCase(TestLazyModules)
+    runtime = unittest.TextTestRunner(verbosity=2).run(suite)
+    return runtime.wasSuccessful()
+
+
+if __name__ == "__main__":
+    test()
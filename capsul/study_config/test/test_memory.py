@@ -17,7 +17,8 @@ import shutil
 from capsul.process import Process
 from capsul.process import FileCopyProcess
 from capsul.process import get_process_instance
-from capsul.study_config.memory import Memory
+from capsul.study_config import memory
+from capsul.study_config.memory import Memory, directory_fingerprint
 
 # Trait import
 from traits.api import Float, File, List, String
@@ -92,6 +93,52 @@ class TestMemory(unittest.TestCase):
             ("{'i': '_workspace/test_memory.py', 'l': "
              "['_workspace/test_memory.py'], 'f': 2.5}"))
 
+    def test_directory_fingerprint(self):
+        """ Test the directory fingerprint.
+        """
+        # Create a directory tree
+        tmpdir = tempfile.mkdtemp()
+        os.makedirs(os.path.join(tmpdir, "mri", "orig"))
+        fname = os.path.join(tmpdir, "mri", "orig", "001.mgz")
+        with open(fname, "w") as open_file:
+            open_file.write("data")
+
+        # Test the digest is updated when the tree content changes
+        for strict in (False, True):
+            index = {}
+            ref = directory_fingerprint(tmpdir, strict, index)
+            self.assertEqual(
+                directory_fingerprint(tmpdir, strict, index), ref)
+            with open(fname, "w") as open_file:
+                open_file.write("new data {0}".format(strict))
+            self.assertNotEqual(
+                directory_fingerprint(tmpdir, strict, index), ref)
+        self.assertEqual(
+            sorted(index.keys()),
+            [tmpdir, os.path.join(tmpdir, "mri"),
+             os.path.join(tmpdir, "mri", "orig")])
+
+        # Test the special files and links are listed the same way with
+        # and without scandir
+        os.mkfifo(os.path.join(tmpdir, "fifo"))
+        os.symlink("mri", os.path.join(tmpdir, "mri_link"))
+        os.symlink(fname, os.path.join(tmpdir, "file_link"))
+        os.symlink("missing", os.path.join(tmpdir, "broken_link"))
+        entries = sorted(
+            (name, kind) for name, path, kind, value in
+            memory._scan_directory(tmpdir))
+        self.assertEqual(entries, [
+            ("broken_link", "l"), ("fifo", "s"), ("file_link", "f"),
+            ("mri", "d"), ("mri_link", "l")])
+        ref = directory_fingerprint(tmpdir)
+        scandir = memory.scandir
+        memory.scandir = None
+        try:
+            self.assertEqual(directory_fingerprint(tmpdir), ref)
+        finally:
+            memory.scandir = scandir
+        shutil.rmtree(tmpdir)
+
 if 0:
     # Configure the environment
     study_config = StudyConfig(modules=["FSLConfig"],
@@ -160,6 +207,7 @@ def test():
     suite.addTest(TestMemory("test_proxy_process", dirpath))
     suite.addTest(TestMemory("test_proxy_process", None))
     suite.addTest(TestMemory("test_proxy_process_copy", None))
+    suite.addTest(TestMemory("test_directory_fingerprint", None))
     runtime = unittest.TextTestRunner(verbosity=2).run(suite)
     shutil.rmtree(dirpath)
     return runtime.wasSuccessful()
@@ -1,8 +1,14 @@
 #!/usr/bin/env python
 
+import os
+import json
+import shutil
+import tempfile
 import unittest
-from capsul.study_config.study_config import StudyConfig
+from soma.fom import FileOrganizationModels
+from capsul.study_config.study_config import StudyConfig, StudyConfigModule
 from capsul.study_config.config_modules.fom_config import FomConfig
+from capsul.study_config.config_modules.fom_config import load_fom
 from soma.application import Application
 
 class TestStudyConfigFOM(unittest.TestCase):
@@ -35,6 +41,78 @@ class TestStudyConfigFOM(unittest.TestCase):
         self.assertTrue(len(study_config.modules_data.fom_atp) == 3)
         self.assertTrue(len(study_config.modules_data.fom_pta) == 3)
 
+    def test_load_fom_cache(self):
+        class FomManager(object):
+            def __init__(self, fom_files):
+                self.fom_files = fom_files
+                self.loads = 0
+
+            def file_name(self, fom_name):
+                return self.fom_files[fom_name]
+
+            def load_foms(self, fom_name):
+                self.loads += 1
+                fom = FileOrganizationModels()
+                fom.import_file(self.fom_files[fom_name], foms_manager=self)
+                return fom
+
+        tmpdir = tempfile.mkdtemp()
+        try:
+            fom_files = {
+                'test-fom-cache-1.0': os.path.join(tmpdir, 'test-fom.json'),
+                'test-fom-base-1.0': os.path.join(tmpdir, 'base-fom.json')}
+            json.dump({'fom_name': 'test-fom-cache-1.0',
+                       'fom_import': ['test-fom-base-1.0'],
+                       'processes': {}},
+                      open(fom_files['test-fom-cache-1.0'], 'w'))
+            json.dump({'fom_name': 'test-fom-base-1.0',
+                       'formats': {'NIFTI': 'nii'}},
+                      open(fom_files['test-fom-base-1.0'], 'w'))
+            fom_manager = FomManager(fom_files)
+            fom = load_fom(fom_manager, 'test-fom-cache-1.0')
+            self.assertTrue(
+                load_fom(fom_manager, 'test-fom-cache-1.0') is fom)
+            self.assertEqual(fom_manager.loads, 1)
+            # A modified FOM file is reloaded
+            for fom_file in (fom_files['test-fom-cache-1.0'],
+                             fom_files['test-fom-base-1.0']):
+                mtime = os.path.getmtime(fom_file)
+                os.utime(fom_file, (mtime + 10, mtime + 10))
+                new_fom = load_fom(fom_manager, 'test-fom-cache-1.0')
+                self.assertFalse(new_fom is fom)
+                fom = new_fom
+            self.assertEqual(fom_manager.loads, 3)
+            # The FOMs are not shared between managers
+            other_manager = FomManager(fom_files)
+            self.assertFalse(
+                load_fom(other_manager, 'test-fom-cache-1.0') is fom)
+            self.assertEqual(other_manager.loads, 1)
+        finally:
+            shutil.rmtree(tmpdir)
+
+    def test_delayed_initialization(self):
+        class CountingModule(StudyConfigModule):
+            def __init__(self, study_config, configuration):
+                super(CountingModule, self).__init__(
+                    study_config, configuration)
+                self.initializations = 0
+
+            def initialize_module(self):
+                self.initializations += 1
+
+        study_config = StudyConfig(init_config={}, modules=[])
+        module = CountingModule(study_config, {})
+        study_config.on_trait_change(
+            lambda: study_config.request_module_initialization(module),
+            ['input_directory', 'output_directory'])
+        study_config.input_directory = '/tmp/in'
+        self.assertEqual(module.initializations, 1)
+        # A configuration batch initializes the module once
+        study_config.set_study_configuration(
+            {'input_directory': '/tmp/in2', 'output_directory': '/tmp/out'})
+        self.assertEqual(module.initializations, 2)
+        self.assertEqual(study_config.output_directory, '/tmp/out')
+
 
 def test():
     """ Function to execute unitest
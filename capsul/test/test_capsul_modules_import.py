@@ -3,6 +3,71 @@
 import unittest
 import sys
 import os
+import json
+import subprocess
+
+
+# Script that imports a module and reports the cumulative time spent in each
+# import statement (like python -X importtime) and the loaded modules
+_import_time_script = """
+import sys, time, json
+try:
+    import __builtin__ as builtins
+except ImportError:
+    import builtins
+times = {{}}
+base_import = builtins.__import__
+def timed_import(name, *args, **kwargs):
+    if name in sys.modules:
+        return base_import(name, *args, **kwargs)
+    start = time.time()
+    try:
+        return base_import(name, *args, **kwargs)
+    finally:
+        times[name] = times.get(name, 0.) + time.time() - start
+builtins.__import__ = timed_import
+start = time.time()
+__import__("{0}")
+total = time.time() - start
+builtins.__import__ = base_import
+modules = sorted(name for name, module in sys.modules.items()
+                 if module is not None)
+sys.stdout.write(json.dumps({{"total": total, "times": times,
+                             "modules": modules}}))
+"""
+
+# Heavy optional dependencies that must be imported at first use only
+_lazy_modules = ["soma_workflow", "nipype", "PyQt4", "PySide", "soma.fom",
+                 "soma.application", "soma.qt_gui"]
+
+
+def measure_import_time(module_name):
+    """ Import a module in a fresh interpreter and measure the cumulative
+    time spent in each import.
+
+    Parameters
+    ----------
+    module_name: str (mandatory)
+        the module to import.
+
+    Returns
+    -------
+    report: dict
+        the 'total' import time, the cumulative import 'times' of each
+        imported module and the list of loaded 'modules'.
+    """
+    import capsul
+    env = os.environ.copy()
+    env["PYTHONPATH"] = os.pathsep.join(
+        [os.path.dirname(os.path.dirname(capsul.__file__))] +
+        env.get("PYTHONPATH", "").split(os.pathsep))
+    process = subprocess.Popen(
+        [sys.executable, "-c", _import_time_script.format(module_name)],
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=env)
+    stdout, stderr = process.communicate()
+    if process.returncode != 0:
+        raise ImportError(stderr)
+    return json.loads(stdout)
 
 
 class TestCapsulModulesImport(unittest.TestCase):
@@ -28,6 +93,27 @@ class TestCapsulModulesImport(unittest.TestCase):
     def test_capsul_utils_import(self):
         import capsul.utils
 
+    def test_capsul_import_time(self):
+        """ Check that the heavy optional dependencies are not imported by
+        the core modules and report the slowest imports.
+        """
+        for module_name in ["capsul.process", "capsul.pipeline",
+                            "capsul.study_config",
+                            "capsul.study_config.memory"]:
+            report = measure_import_time(module_name)
+            slowest = sorted(report["times"].items(), key=lambda x: x[1],
+                             reverse=True)[:5]
+            sys.stderr.write("\n{0}: {1:.3f}s ({2})".format(
+                module_name, report["total"], ", ".join(
+                    "{0} {1:.3f}s".format(name, duration)
+                    for name, duration in slowest)))
+            for lazy_module in _lazy_modules:
+                loaded = [name for name in report["modules"]
+                          if name == lazy_module or
+                          name.startswith(lazy_module + ".")]
+                self.assertEqual(
+                    loaded, [], "'{0}' imports '{1}'".format(
+                        module_name, lazy_module))
 
 
 def test():
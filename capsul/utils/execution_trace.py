@@ -0,0 +1,228 @@
+#! /usr/bin/env python
+##########################################################################
+# CAPSUL - Copyright (C) CEA, 2015
+# Distributed under the terms of the CeCILL-B license, as published by
+# the CEA-CNRS-INRIA. Refer to the LICENSE file or to
+# http://www.cecill.info/licences/Licence_CeCILL-B_V1-en.html
+# for details.
+##########################################################################
+
+""" Process-wide execution tracer.
+
+When tracing is started, the execution steps of each node (scheduling,
+input hashing, cache lookup, file staging, process body, result saving and
+cache publication) are recorded as spans with their process and thread
+ids. The trace is saved in the Chrome trace event format that can be
+opened with chrome://tracing or https://ui.perfetto.dev.
+When tracing is not started, trace_span costs a single global lookup.
+"""
+
+# System import
+import os
+import json
+import time
+import logging
+import threading
+
+# Define the logger
+logger = logging.getLogger(__name__)
+
+
+# Global parameters
+_tracer = None
+
+
+class ExecutionTracer(object):
+    """ Record execution spans in the Chrome trace event format.
+
+    Methods
+    -------
+    span
+    add_span
+    save
+    """
+    def __init__(self):
+        """ Initialize the ExecutionTracer class.
+        """
+        # events: list of Chrome 'complete' (ph='X') and 'metadata'
+        # (ph='M') events
+        self.events = []
+        self._lock = threading.Lock()
+        self._threads = set()
+        self._origin = time.time()
+
+    def span(self, name, category="capsul", **args):
+        """ Create a span recorded when it exits.
+
+        Parameters
+        ----------
+        name: str (mandatory)
+            the span name (ie. the node or process name).
+        category: str (optional, default 'capsul')
+            the execution step.
+        args: dict (optional)
+            json compatible values displayed with the span.
+
+        Returns
+        -------
+        span: _Span
+            a context manager.
+        """
+        return _Span(self, name, category, args)
+
+    def add_span(self, name, category, start_time, end_time, args=None):
+        """ Record a span of the current thread.
+
+        Parameters
+        ----------
+        name: str (mandatory)
+            the span name.
+        category: str (mandatory)
+            the execution step.
+        start_time, end_time: float (mandatory)
+            the span limits in seconds since the epoch.
+        args: dict (optional, default None)
+            json compatible values displayed with the span.
+        """
+        thread = threading.current_thread()
+        event = {
+            "name": name,
+            "cat": category,
+            "ph": "X",
+            "ts": (start_time - self._origin) * 1e6,
+            "dur": (end_time - start_time) * 1e6,
+            "pid": os.getpid(),
+            "tid": thread.ident,
+        }
+        if args:
+            event["args"] = args
+        with self._lock:
+            # Name the worker threads once
+            if (event["pid"], thread.ident) not in self._threads:
+                self._threads.add((event["pid"], thread.ident))
+                self.events.append({
+                    "name": "thread_name",
+                    "ph": "M",
+                    "pid": event["pid"],
+                    "tid": thread.ident,
+                    "args": {"name": thread.name},
+                })
+            self.events.append(event)
+
+    def save(self, trace_file):
+        """ Save the trace in the Chrome trace event json format.
+
+        Parameters
+        ----------
+        trace_file: str (mandatory)
+            the destination file.
+        """
+        with self._lock:
+            events = list(self.events)
+        with open(trace_file, "w") as open_file:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"},
+                      open_file)
+        logger.debug("Execution trace saved in '{0}'.".format(trace_file))
+
+
+class _Span(object):
+    """ Context manager recording a span of an ExecutionTracer.
+    """
+    def __init__(self, tracer, name, category, args):
+        self.tracer = tracer
+        self.name = name
+        self.category = category
+        self.args = args
+        self.start_time = None
+
+    def __enter__(self):
+        self.start_time = time.time()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is not None:
+            self.args["error"] = exc_type.__name__
+        self.tracer.add_span(self.name, self.category, self.start_time,
+                             time.time(), self.args)
+        return False
+
+
+class _NoSpan(object):
+    """ Context manager doing nothing when tracing is not started.
+    """
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+_no_span = _NoSpan()
+
+
+def start_tracing():
+    """ Start recording the execution spans.
+
+    Returns
+    -------
+    tracer: ExecutionTracer
+        the active tracer, a new one if tracing was not started.
+    """
+    global _tracer
+    if _tracer is None:
+        _tracer = ExecutionTracer()
+    return _tracer
+
+
+def stop_tracing(trace_file=None):
+    """ Stop recording the execution spans.
+
+    Parameters
+    ----------
+    trace_file: str (optional, default None)
+        if given, save the recorded trace in this file.
+
+    Returns
+    -------
+    tracer: ExecutionTracer
+        the stopped tracer, None if tracing was not started.
+    """
+    global _tracer
+    tracer = _tracer
+    _tracer = None
+    if tracer is not None and trace_file is not None:
+        tracer.save(trace_file)
+    return tracer
+
+
+def get_tracer():
+    """ Get the active tracer.
+
+    Returns
+    -------
+    tracer: ExecutionTracer
+        the active tracer, None if tracing is not started.
+    """
+    return _tracer
+
+
+def trace_span(name, category="capsul", **args):
+    """ Create a span of the active tracer.
+
+    Parameters
+    ----------
+    name: str (mandatory)
+        the span name (ie. the node or process name).
+    category: str (optional, default 'capsul')
+        the execution step.
+    args: dict (optional)
+        json compatible values displayed with the span.
+
+    Returns
+    -------
+    span: context manager
+        records the span when it exits, does nothing if tracing is not
+        started.
+    """
+    if _tracer is None:
+        return _no_span
+    return _Span(_tracer, name, category, args)
@@ -0,0 +1,163 @@
+#! /usr/bin/env python
+##########################################################################
+# CAPSUL - Copyright (C) CEA, 2015
+# Distributed under the terms of the CeCILL-B license, as published by
+# the CEA-CNRS-INRIA. Refer to the LICENSE file or to
+# http://www.cecill.info/licences/Licence_CeCILL-B_V1-en.html
+# for details.
+##########################################################################
+
+""" Centralized registry of the file formats made of several files.
+
+Some formats store one data item in several files (ie. '.img' + '.hdr' for
+Analyze images). Copy, cache, fingerprint and transfer operations have to
+handle such a file group as a whole, otherwise only half an image is moved.
+"""
+
+# System import
+import os
+import shutil
+import logging
+
+# Define the logger
+logger = logging.getLogger(__name__)
+
+
+# Global parameters
+# formats: {name: ext_props}
+#     ext_props: {ext: [dependent_exts]}
+#     dependent_exts: (ext, mandatory)
+formats = {
+    "NIFTI-1": {".nii": [], ".img": [(".hdr", True)], ".nii.gz": []},
+    "GIS": {".ima": [(".dim", True)]},
+    "GIFTI": {".gii": []},
+    "MESH": {".mesh": []},
+    "ARG": {".arg": [(".data", False)]},
+}
+# Metadata extension appended to every file of the group
+metadata_extension = ".minf"
+# Suffix index computed once from the formats definition:
+# {ext: [dependent_exts]} (formats names are lost here)
+merged_formats = {}
+
+
+def _update_suffix_index():
+    """ Rebuild the extension-based index from the formats definition.
+    """
+    merged_formats.clear()
+    for format_name, values in formats.iteritems():
+        merged_formats.update(values)
+
+
+def register_format(format_name, ext_props):
+    """ Declare a new file format or update an existing one.
+
+    Parameters
+    ----------
+    format_name: str (mandatory)
+        the format name.
+    ext_props: dict (mandatory)
+        the format extensions of the form {ext: [(dependent_ext, mandatory)]}.
+    """
+    formats.setdefault(format_name, {}).update(ext_props)
+    _update_suffix_index()
+
+
+def files_group(path):
+    """ Get all the files that belong to the same data item as a path.
+
+    The main path is returned first, then the companion files of the
+    matching format, and finally the '.minf' metadata file. The returned
+    files may not exist on disk.
+
+    Parameters
+    ----------
+    path: str (mandatory)
+        the main file path.
+
+    Returns
+    -------
+    paths: list of str
+        the group file paths.
+    """
+    bname = os.path.basename(path)
+    l0 = len(path) - len(bname)
+    p0 = 0
+    paths = [path]
+    while True:
+        p = bname.find(".", p0)
+        if p < 0:
+            break
+        ext = bname[p:]
+        p0 = p + 1
+        format_def = merged_formats.get(ext)
+        if format_def:
+            path0 = path[:l0 + p]
+            paths += [path0 + e[0] for e in format_def]
+            break
+    paths.append(path + metadata_extension)
+    return paths
+
+
+def existing_files_group(path):
+    """ Get the files of a data item group that exist on disk.
+
+    Parameters
+    ----------
+    path: str (mandatory)
+        the main file path.
+
+    Returns
+    -------
+    paths: list of str
+        the existing group file paths, the main path first.
+    """
+    return [item for item in files_group(path) if os.path.isfile(item)]
+
+
+def copy_files_group(path, destdir):
+    """ Copy (with metadata cp -p) all the existing files of a data item
+    group in a destination folder.
+
+    Parameters
+    ----------
+    path: str (mandatory)
+        the main file path.
+    destdir: str (mandatory)
+        the destination folder.
+
+    Returns
+    -------
+    mapping: list of 2-uplet
+        the (source, destination) copied files, the main path first.
+    """
+    mapping = []
+    for item in existing_files_group(path):
+        out = os.path.join(destdir, os.path.basename(item))
+        shutil.copy2(item, out)
+        mapping.append((item, out))
+    logger.debug("Copied files group {0}.".format(mapping))
+    return mapping
+
+
+def remove_files_group(path):
+    """ Remove all the existing files of a data item group.
+
+    Parameters
+    ----------
+    path: str (mandatory)
+        the main file path.
+
+    Returns
+    -------
+    removed: list of str
+        the removed file paths.
+    """
+    removed = existing_files_group(path)
+    for item in removed:
+        os.remove(item)
+    return removed
+
+
+# Build the suffix index
+_update_suffix_index()
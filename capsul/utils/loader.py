@@ -8,6 +8,7 @@
 ##########################################################################
 
 # System import
+import os
 import string
 import sys
 import logging
@@ -16,8 +17,13 @@ import importlib
 # Define the logger
 logger = logging.getLogger(__name__)
 
+# Global parameters
+# Source file modification times of the loaded modules: {module_name: mtime}
+_module_mtimes = {}
 
-def load_objects(module_name, object_name=None, allowed_instances=None):
+
+def load_objects(module_name, object_name=None, allowed_instances=None,
+                 reload_module=False):
     """ Load a python object from a a module.
 
     If 'object_name' is None, the function will import the full module
@@ -26,6 +32,9 @@ def load_objects(module_name, object_name=None, allowed_instances=None):
     types by setting the 'allowed_instances' parameter.
     By default only class are returned.
 
+    A module already imported is reloaded only if explicitly requested or
+    if its source file has been modified since it was loaded.
+
     Parameters
     ----------
     module_name: str (mandatory)
@@ -34,6 +43,8 @@ def load_objects(module_name, object_name=None, allowed_instances=None):
         the specific tool name we want to load from the module.
     allowed_instances : list (optional, default None)
         the list of allowed instances that will be returned by the function.
+    reload_module: bool (optional, default False)
+        if True, reload the module even if it has not been modified.
 
     Returns
     -------
@@ -49,11 +60,18 @@ def load_objects(module_name, object_name=None, allowed_instances=None):
     if not module_name in sys.modules:
         importlib.import_module(module_name)
         module = sys.modules[module_name]
+        _module_mtimes[module_name] = get_module_mtime(module)
     # If the module has been edited and we want to try out the new version
     # without leaving the application
-    else:
+    elif reload_module or is_module_modified(module_name):
         module = sys.modules[module_name]
+        logger.debug("Reloading module '{0}'.".format(module_name))
         reload(module)
+        _module_mtimes[module_name] = get_module_mtime(module)
+    # Otherwise use the loaded module
+    else:
+        module = sys.modules[module_name]
+        _module_mtimes.setdefault(module_name, get_module_mtime(module))
 
     # Get the target (possibly allowed) tool(s)
     tools = []
@@ -88,6 +106,52 @@ def load_objects(module_name, object_name=None, allowed_instances=None):
     return tools
 
 
+def get_module_mtime(module):
+    """ Get the modification time of a module source file.
+
+    Parameters
+    ----------
+    module: module (mandatory)
+        a python module.
+
+    Returns
+    -------
+    mtime: float
+        the module source file modification time, None if the module has
+        no source file (ie. built-in modules).
+    """
+    fname = getattr(module, "__file__", None)
+    if fname is None:
+        return None
+    if fname.endswith((".pyc", ".pyo")):
+        fname = fname[:-1]
+    try:
+        return os.stat(fname).st_mtime
+    except OSError:
+        return None
+
+
+def is_module_modified(module_name):
+    """ Check if the source file of a loaded module has been modified
+    since the module has been loaded through 'load_objects'.
+
+    Parameters
+    ----------
+    module_name: str (mandatory)
+        the module name, ie. module1.module2
+
+    Returns
+    -------
+    is_modified: bool
+        True if the module source file has been modified, False if the
+        module is not loaded or not known.
+    """
+    module = sys.modules.get(module_name)
+    if module is None or module_name not in _module_mtimes:
+        return False
+    return get_module_mtime(module) != _module_mtimes[module_name]
+
+
 def cleanup(attribute):
     """ Cleanup a string.
 
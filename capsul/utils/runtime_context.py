@@ -0,0 +1,296 @@
+#! /usr/bin/env python
+##########################################################################
+# CAPSUL - Copyright (C) CEA, 2015
+# Distributed under the terms of the CeCILL-B license, as published by
+# the CEA-CNRS-INRIA. Refer to the LICENSE file or to
+# http://www.cecill.info/licences/Licence_CeCILL-B_V1-en.html
+# for details.
+##########################################################################
+
+""" Process-wide cache of the runtime information stored in the process
+execution reports.
+
+The host name is resolved once (getfqdn may block on DNS) and the
+environment snapshots are shared by reference between all the execution
+reports. The environment capture level is one of:
+
+* 'none': the environment is not captured.
+* 'hash': only the environment md5 hash is stored in the execution
+  reports, the environment itself is written once next to the results
+  (see save_environment).
+* 'full': the whole environment is stored in the execution reports.
+
+The resources used by each execution (wall and CPU times, peak memory and
+I/O bytes) are also stored in the execution reports (see resource_usage).
+"""
+
+# System import
+import os
+import sys
+import json
+import time
+import hashlib
+import logging
+from socket import getfqdn
+try:
+    import resource
+except ImportError:
+    # Not available on Windows: the CPU times are read with os.times and
+    # the memory counters are not recorded
+    resource = None
+
+# Define the logger
+logger = logging.getLogger(__name__)
+
+
+# Global parameters
+capture_levels = ("none", "hash", "full")
+_runtime_context = {
+    "capture_level": "hash",
+    "hostname": None
+}
+# Environment snapshots: {environ_hash: environ}
+_environments = {}
+
+
+def set_capture_level(level):
+    """ Set the environment capture level of the execution reports.
+
+    Parameters
+    ----------
+    level: str (mandatory)
+        one of 'none', 'hash' or 'full'.
+    """
+    if level not in capture_levels:
+        raise ValueError(
+            "'{0}' is not a valid environment capture level, expect one of "
+            "{1}.".format(level, capture_levels))
+    _runtime_context["capture_level"] = level
+
+
+def get_capture_level():
+    """ Get the environment capture level of the execution reports.
+
+    Returns
+    -------
+    level: str
+        one of 'none', 'hash' or 'full'.
+    """
+    return _runtime_context["capture_level"]
+
+
+def get_hostname():
+    """ Get the fully qualified host name, resolved only once.
+
+    Returns
+    -------
+    hostname: str
+        the host name.
+    """
+    if _runtime_context["hostname"] is None:
+        _runtime_context["hostname"] = getfqdn()
+    return _runtime_context["hostname"]
+
+
+def get_environment_hash():
+    """ Get the md5 hash of the current environment.
+
+    Returns
+    -------
+    environ_hash: str
+        the environment hash.
+    """
+    hasher = hashlib.new("md5")
+    hasher.update(json.dumps(sorted(os.environ.items())))
+    return hasher.hexdigest()
+
+
+def get_environment(environ_hash=None):
+    """ Get a snapshot of the current environment.
+
+    The same snapshot object is returned as long as the environment is not
+    modified: it is shared by reference and must not be modified.
+
+    Parameters
+    ----------
+    environ_hash: str (optional, default None)
+        the current environment hash if already computed.
+
+    Returns
+    -------
+    environ: dict
+        the environment snapshot.
+    """
+    if environ_hash is None:
+        environ_hash = get_environment_hash()
+    environ = _environments.get(environ_hash)
+    if environ is None:
+        environ = dict(os.environ)
+        _environments[environ_hash] = environ
+    return environ
+
+
+def get_environment_capture():
+    """ Get the environment representation stored in the execution reports
+    according to the current capture level.
+
+    Returns
+    -------
+    capture: None, str or dict
+        None if the capture level is 'none', the environment hash if the
+        level is 'hash' and the shared environment snapshot otherwise.
+    """
+    level = _runtime_context["capture_level"]
+    if level == "none":
+        return None
+    environ_hash = get_environment_hash()
+    if level == "hash":
+        # Keep the snapshot so that it can be saved later
+        get_environment(environ_hash)
+        return environ_hash
+    return get_environment(environ_hash)
+
+
+def save_environment(directory, environ_hash):
+    """ Write an environment snapshot referenced by its hash in a directory.
+
+    The environment is written once in an 'environ-<hash>.json' file.
+
+    Parameters
+    ----------
+    directory: str (mandatory)
+        the destination directory.
+    environ_hash: str (mandatory)
+        the environment hash, as stored in the execution reports.
+
+    Returns
+    -------
+    environ_file: str
+        the environment file, None if the environment is not known.
+    """
+    environ = _environments.get(environ_hash)
+    if environ is None:
+        return None
+    environ_file = os.path.join(
+        directory, "environ-{0}.json".format(environ_hash))
+    if not os.path.isfile(environ_file):
+        with open(environ_file, "w") as open_file:
+            json.dump(environ, open_file, sort_keys=True, indent=4)
+        logger.debug("Environment saved in '{0}'.".format(environ_file))
+    return environ_file
+
+
+def get_resource_usage():
+    """ Get a snapshot of the resources used by the current process and its
+    terminated children.
+
+    Returns
+    -------
+    snapshot: dict
+        the resources counters, to be given to resource_usage.
+    """
+    io = _read_proc_counters("/proc/self/io", ("read_bytes", "write_bytes"))
+    if resource is None:
+        times = os.times()
+        return {
+            "wall_time": time.time(),
+            "user_time": times[0] + times[2],
+            "system_time": times[1] + times[3],
+            "blocks": None,
+            "io": io,
+            "self_max_rss": None,
+            "children_max_rss": None
+        }
+    self_usage = resource.getrusage(resource.RUSAGE_SELF)
+    children_usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return {
+        "wall_time": time.time(),
+        "user_time": self_usage.ru_utime + children_usage.ru_utime,
+        "system_time": self_usage.ru_stime + children_usage.ru_stime,
+        "blocks": (self_usage.ru_inblock + children_usage.ru_inblock,
+                   self_usage.ru_oublock + children_usage.ru_oublock),
+        "io": io,
+        "self_max_rss": self_usage.ru_maxrss,
+        "children_max_rss": children_usage.ru_maxrss
+    }
+
+
+def resource_usage(start_snapshot):
+    """ Get the resources used since a snapshot.
+
+    The CPU times and the I/O bytes of the subprocess commands are included
+    once the commands are terminated (getrusage RUSAGE_CHILDREN and
+    /proc/self/io counters). The peak resident set sizes are high-water
+    marks: the python process peak since its start (VmHWM in
+    /proc/self/status), and the largest terminated subprocess peak.
+
+    Parameters
+    ----------
+    start_snapshot: dict (mandatory)
+        the snapshot returned by get_resource_usage at the execution start.
+
+    Returns
+    -------
+    usage: dict
+        the 'wall_time', 'user_time' and 'system_time' in seconds, the
+        'max_rss' and 'children_max_rss' in kilobytes, and the 'read_bytes'
+        and 'write_bytes'. The counters that are not available on the
+        platform are None.
+    """
+    end_snapshot = get_resource_usage()
+    usage = dict(
+        (key, end_snapshot[key] - start_snapshot[key])
+        for key in ("wall_time", "user_time", "system_time"))
+
+    # The I/O bytes from /proc, or from the number of 512 bytes blocks
+    if start_snapshot["io"] and end_snapshot["io"]:
+        for key in ("read_bytes", "write_bytes"):
+            usage[key] = end_snapshot["io"][key] - start_snapshot["io"][key]
+    elif start_snapshot["blocks"] is None:
+        usage["read_bytes"] = usage["write_bytes"] = None
+    else:
+        usage["read_bytes"] = 512 * (
+            end_snapshot["blocks"][0] - start_snapshot["blocks"][0])
+        usage["write_bytes"] = 512 * (
+            end_snapshot["blocks"][1] - start_snapshot["blocks"][1])
+
+    # The peak memory in kilobytes (ru_maxrss is in bytes on Mac OS)
+    status = _read_proc_counters("/proc/self/status", ("VmHWM", ))
+    rss_factor = 1024 if sys.platform == "darwin" else 1
+    if status:
+        usage["max_rss"] = status["VmHWM"]
+    elif end_snapshot["self_max_rss"] is None:
+        usage["max_rss"] = None
+    else:
+        usage["max_rss"] = end_snapshot["self_max_rss"] // rss_factor
+    if end_snapshot["children_max_rss"] is None:
+        usage["children_max_rss"] = None
+    else:
+        usage["children_max_rss"] = (
+            end_snapshot["children_max_rss"] // rss_factor)
+
+    return usage
+
+
+def _read_proc_counters(proc_file, names):
+    """ Read integer counters from a '/proc' file of the form
+    'name: value [unit]'.
+
+    Returns
+    -------
+    counters: dict
+        the requested counters, None if the file cannot be read.
+    """
+    try:
+        with open(proc_file) as open_file:
+            lines = open_file.readlines()
+    except IOError:
+        return None
+    counters = {}
+    for line in lines:
+        name, _, value = line.partition(":")
+        if name in names:
+            counters[name] = int(value.split()[0])
+    if len(counters) != len(names):
+        return None
+    return counters
@@ -0,0 +1,88 @@
+#! /usr/bin/env python
+##########################################################################
+# CAPSUL - Copyright (C) CEA, 2015
+# Distributed under the terms of the CeCILL-B license, as published by
+# the CEA-CNRS-INRIA. Refer to the LICENSE file or to
+# http://www.cecill.info/licences/Licence_CeCILL-B_V1-en.html
+# for details.
+##########################################################################
+
+# System import
+import os
+import json
+import shutil
+import tempfile
+import unittest
+
+# Capsul import
+from capsul.study_config.study_config import StudyConfig
+from capsul.study_config.test.test_memory import DummyProcess
+from capsul.utils.execution_trace import (
+    trace_span, get_tracer, start_tracing, stop_tracing)
+
+
+class TestExecutionTrace(unittest.TestCase):
+    """ Class to test the Chrome execution traces.
+    """
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        stop_tracing()
+        shutil.rmtree(self.tmpdir)
+
+    def test_trace_span(self):
+        """ Method to test the spans recording.
+        """
+        with trace_span("ignored", "node"):
+            pass
+        self.assertTrue(get_tracer() is None)
+        tracer = start_tracing()
+        with trace_span("node1", "node", index=1):
+            pass
+        try:
+            with trace_span("node2", "node"):
+                raise ValueError()
+        except ValueError:
+            pass
+        self.assertTrue(stop_tracing() is tracer)
+        spans = [event for event in tracer.events if event["ph"] == "X"]
+        self.assertEqual([span["name"] for span in spans],
+                         ["node1", "node2"])
+        self.assertEqual(spans[0]["args"], {"index": 1})
+        self.assertEqual(spans[1]["args"], {"error": "ValueError"})
+        self.assertEqual(
+            [event["name"] for event in tracer.events if event["ph"] == "M"],
+            ["thread_name"])
+
+    def test_study_config_trace(self):
+        """ Method to test the trace of a run with smart caching.
+        """
+        trace_file = os.path.join(self.tmpdir, "trace.json")
+        study_config = StudyConfig(
+            init_config={
+                "output_directory": self.tmpdir,
+                "use_smart_caching": True,
+                "execution_trace_file": trace_file},
+            modules=["SmartCachingConfig"])
+        process = DummyProcess()
+        study_config.run(process, verbose=0, f=2., ff=3.)
+        self.assertTrue(get_tracer() is None)
+        with open(trace_file) as open_file:
+            events = json.load(open_file)["traceEvents"]
+        self.assertEqual(
+            sorted(event["cat"] for event in events if event["ph"] == "X"),
+            ["cache_lookup", "cache_publication", "input_hashing", "node",
+             "process_body", "result_saving"])
+
+
+def test():
+    """ Function to execute unitest
+    """
+    suite = unittest.TestLoader().loadTestsFromTestCase(TestExecutionTrace)
+    runtime = unittest.TextTestRunner(verbosity=2).run(suite)
+    return runtime.wasSuccessful()
+
+
+if __name__ == "__main__":
+    test()
@@ -0,0 +1,82 @@
+#! /usr/bin/env python
+##########################################################################
+# CAPSUL - Copyright (C) CEA, 2015
+# Distributed under the terms of the CeCILL-B license, as published by
+# the CEA-CNRS-INRIA. Refer to the LICENSE file or to
+# http://www.cecill.info/licences/Licence_CeCILL-B_V1-en.html
+# for details.
+##########################################################################
+
+# System import
+import unittest
+import os
+import tempfile
+import shutil
+
+# Capsul import
+from capsul.utils.file_formats import (
+    files_group, existing_files_group, copy_files_group, remove_files_group)
+from capsul.study_config.memory import file_fingerprint
+
+
+class TestFileFormats(unittest.TestCase):
+    """ Class to test the multi-file formats registry.
+    """
+    def setUp(self):
+        """ Create an Analyze image made of two files.
+        """
+        self.tmpdir = tempfile.mkdtemp()
+        self.image = os.path.join(self.tmpdir, "t1.img")
+        for fname in (self.image, os.path.join(self.tmpdir, "t1.hdr")):
+            with open(fname, "w") as open_file:
+                open_file.write("data")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_files_group(self):
+        """ Method to test the file group of a path.
+        """
+        self.assertEqual(
+            files_group("/tmp/t1.img"),
+            ["/tmp/t1.img", "/tmp/t1.hdr", "/tmp/t1.img.minf"])
+        self.assertEqual(
+            files_group("/tmp/t1.nii.gz"),
+            ["/tmp/t1.nii.gz", "/tmp/t1.nii.gz.minf"])
+        self.assertEqual(
+            existing_files_group(self.image),
+            [self.image, os.path.join(self.tmpdir, "t1.hdr")])
+
+    def test_copy_remove_files_group(self):
+        """ Method to test the files group copy and removal.
+        """
+        destdir = os.path.join(self.tmpdir, "dest")
+        os.mkdir(destdir)
+        mapping = copy_files_group(self.image, destdir)
+        self.assertEqual(len(mapping), 2)
+        self.assertEqual(mapping[0], (self.image,
+                                      os.path.join(destdir, "t1.img")))
+        self.assertTrue(os.path.isfile(os.path.join(destdir, "t1.hdr")))
+        removed = remove_files_group(os.path.join(destdir, "t1.img"))
+        self.assertEqual(len(removed), 2)
+        self.assertEqual(os.listdir(destdir), [])
+
+    def test_fingerprint(self):
+        """ Method to test that the companion files are fingerprinted.
+        """
+        fingerprint = file_fingerprint(self.image)
+        self.assertEqual(len(fingerprint["companions"]), 1)
+        self.assertEqual(fingerprint["companions"][0]["name"],
+                         os.path.join(self.tmpdir, "t1.hdr"))
+
+
+def test():
+    """ Function to execute unitest
+    """
+    suite = unittest.TestLoader().loadTestsFromTestCase(TestFileFormats)
+    runtime = unittest.TextTestRunner(verbosity=2).run(suite)
+    return runtime.wasSuccessful()
+
+
+if __name__ == "__main__":
+    test()
@@ -9,6 +9,11 @@
 
 # System import
 import unittest
+import os
+import tempfile
+import shutil
+import subprocess
+import sys
 
 # Trait import
 from traits.api import Float, CTrait, File, Directory
@@ -19,8 +24,9 @@ import capsul
 from capsul.utils import get_tool_version, get_nipype_interfaces_versions
 from capsul.utils.trait_utils import (
     get_trait_desc, is_trait_value_defined, is_trait_pathname,
-    clone_trait, build_expression, trait_ids, eval_trait)
+    clone_trait, build_expression, trait_ids, eval_trait, build_trait)
 from capsul.utils.loader import load_objects
+from capsul.utils import runtime_context
 
 
 class TestUtils(unittest.TestCase):
@@ -41,6 +47,66 @@ class TestUtils(unittest.TestCase):
         self.assertTrue(interface_version is None or
                         isinstance(interface_version, dict))
 
+    def test_runtime_context(self):
+        """ Method to test the runtime context capture levels.
+        """
+        level = runtime_context.get_capture_level()
+        try:
+            runtime_context.set_capture_level("none")
+            self.assertEqual(runtime_context.get_environment_capture(), None)
+            runtime_context.set_capture_level("full")
+            environ = runtime_context.get_environment_capture()
+            self.assertEqual(environ, dict(os.environ))
+            self.assertTrue(
+                runtime_context.get_environment_capture() is environ)
+            runtime_context.set_capture_level("hash")
+            environ_hash = runtime_context.get_environment_capture()
+            self.assertEqual(environ_hash,
+                             runtime_context.get_environment_hash())
+            tmpdir = tempfile.mkdtemp()
+            environ_file = runtime_context.save_environment(
+                tmpdir, environ_hash)
+            self.assertTrue(os.path.isfile(environ_file))
+            shutil.rmtree(tmpdir)
+            self.assertRaises(ValueError, runtime_context.set_capture_level,
+                              "partial")
+        finally:
+            runtime_context.set_capture_level(level)
+
+    def test_resource_usage(self):
+        """ Method to test the resources used by a subprocess command.
+        """
+        snapshot = runtime_context.get_resource_usage()
+        tmpdir = tempfile.mkdtemp()
+        try:
+            subprocess.check_call([
+                sys.executable, "-c",
+                "open('{0}', 'wb').write(1000000 * 'a')".format(
+                    os.path.join(tmpdir, "a"))])
+        finally:
+            shutil.rmtree(tmpdir)
+        usage = runtime_context.resource_usage(snapshot)
+        self.assertEqual(
+            sorted(usage),
+            ["children_max_rss", "max_rss", "read_bytes", "system_time",
+             "user_time", "wall_time", "write_bytes"])
+        self.assertTrue(usage["wall_time"] > 0)
+        self.assertTrue(usage["user_time"] + usage["system_time"] > 0)
+        self.assertTrue(usage["children_max_rss"] > 0)
+
+        # Without the resource module (ie. on Windows)
+        resource_module = runtime_context.resource
+        runtime_context.resource = None
+        try:
+            snapshot = runtime_context.get_resource_usage()
+            sum(xrange(100000))
+            usage = runtime_context.resource_usage(snapshot)
+        finally:
+            runtime_context.resource = resource_module
+        self.assertTrue(usage["wall_time"] > 0)
+        self.assertTrue(usage["user_time"] + usage["system_time"] >= 0)
+        self.assertEqual(usage["children_max_rss"], None)
+
     def test_trait_string_description(self):
         """ Method to test if we can build a string description for a trait.
         """
@@ -131,6 +197,47 @@ class TestUtils(unittest.TestCase):
         trait = handler.as_ctrait()
         self.assertEqual(trait_description, trait_ids(trait))
 
+    def test_build_trait(self):
+        """ Method to test trait clone without expression evaluation.
+        """
+        from traits.api import (HasTraits, Either, Enum, List, Tuple, Dict,
+                                Str, Int, Range, Any, Bool)
+
+        class Spec(HasTraits):
+            a = Either(Enum(("-Inf", )), Float())
+            b = List(Tuple(Str(), Enum(("T", )), List(Str())))
+            c = Dict(Str(), Any())
+            d = Range(low=0, high=5)
+            e = File(Undefined)
+            f = Bool()
+
+        # Test the built traits have the same description as the traits
+        # built by evaluating an expression
+        spec = Spec()
+        for name in ["a", "b", "c", "d", "e", "f"]:
+            trait = spec.trait(name)
+            expression = build_expression(trait)
+            new_trait = build_trait(trait)
+            self.assertEqual(build_expression(new_trait()), expression)
+            self.assertEqual(trait_ids(new_trait()),
+                             trait_ids(eval_trait(expression)()))
+
+            # Test the cached prototype is copied
+            other_trait = build_trait(trait)
+            self.assertFalse(other_trait is new_trait)
+            other_trait.desc = "a modified description"
+            self.assertEqual(build_trait(trait).desc, None)
+
+        # Test to clone some traits from their descriptions
+        for trait_description in [["Float", "Int"], ["List_Float"],
+                                  ["List_File"]]:
+            handler = clone_trait(trait_description)
+            self.assertFalse(handler is clone_trait(trait_description))
+            self.assertEqual(trait_description,
+                             trait_ids(handler.as_ctrait()))
+        handler = clone_trait(["Enum"], ("a", "b"))
+        self.assertEqual(handler.as_ctrait().handler.values, ("a", "b"))
+
     def test_load_module_objects(self):
         """ Method to test module objects import from string description.
         """
@@ -143,6 +250,55 @@ class TestUtils(unittest.TestCase):
             "capsul.pipeline.pipeline_nodes", object_name="Node")[0]
         self.assertEqual(node_class, Node)
 
+    def test_process_class_registry(self):
+        """ Method to test that process classes are resolved once and
+        that modules are not reloaded.
+        """
+        from capsul.process import get_process_class, get_process_instance
+        from capsul.pipeline.pipeline_nodes import Node
+        process_id = "capsul.process.test.test_traits.DummyProcess"
+        process_class = get_process_class(process_id)
+        self.assertTrue(get_process_class(process_id) is process_class)
+        self.assertTrue(
+            isinstance(get_process_instance(process_id), process_class))
+        load_objects("capsul.pipeline.pipeline_nodes", object_name="Node")
+        self.assertTrue(issubclass(
+            load_objects("capsul.pipeline.pipeline_nodes",
+                         object_name="ProcessNode")[0], Node))
+
+    def test_process_class_reload(self):
+        """ Method to test that the cached classes of an edited module are
+        all reloaded.
+        """
+        from capsul.process import get_process_class
+        tmpdir = tempfile.mkdtemp()
+        module_file = os.path.join(tmpdir, "capsul_test_procs.py")
+        source = ("from capsul.process import Process\n"
+                  "class A(Process):\n    version = {0}\n"
+                  "class B(Process):\n    version = {0}\n")
+        sys.path.insert(0, tmpdir)
+        try:
+            with open(module_file, "w") as open_file:
+                open_file.write(source.format(1))
+            self.assertEqual(
+                get_process_class("capsul_test_procs.A").version, 1)
+            self.assertEqual(
+                get_process_class("capsul_test_procs.B").version, 1)
+
+            # Edit the module
+            with open(module_file, "w") as open_file:
+                open_file.write(source.format(2))
+            mtime = os.path.getmtime(module_file) + 10
+            os.utime(module_file, (mtime, mtime))
+            self.assertEqual(
+                get_process_class("capsul_test_procs.A").version, 2)
+            self.assertEqual(
+                get_process_class("capsul_test_procs.B").version, 2)
+        finally:
+            sys.path.remove(tmpdir)
+            sys.modules.pop("capsul_test_procs", None)
+            shutil.rmtree(tmpdir)
+
 
 def test():
     """ Function to execute unitest
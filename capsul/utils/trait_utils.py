@@ -13,6 +13,7 @@ import types
 from textwrap import wrap
 import re
 import logging
+import weakref
 
 # Define the logger
 logger = logging.getLogger(__name__)
@@ -39,6 +40,11 @@ _trait_cvt_table = {
     "OutputMultiPath": "List",
     "OutputList": "List"
 }
+# Trait prototypes built from trait string descriptions:
+# {(description, values): trait}
+_description_prototypes = {}
+# Trait prototypes built from trait handlers: {handler: trait}
+_handler_prototypes = weakref.WeakKeyDictionary()
 
 
 def get_trait_desc(trait_name, trait, def_val=None):
@@ -149,38 +155,241 @@ def is_trait_pathname(trait):
             isinstance(trait.trait_type, traits.Directory))
 
 
-def clone_trait(trait_description):
+def clone_trait(trait_description, trait_values=None):
     """ Clone a trait from its string description.
 
     In the case of Enum trait, we need to initilaize the object with all its
     'trait_values'.
 
+    The trait is built directly from the description (no expression is
+    evaluated) and the built traits are cached: cloning the same
+    description again only costs a copy of the cached prototype.
+
     Parameters
     ----------
     trait_description: list of str (mandatory)
         the trait string description from which we want to create a new trait
         instance of the same type.
+    trait_values: tuple (optional, default None)
+        the Enum trait values.
+
+    Returns
+    -------
+    trait: trait instance
+        a new trait instance.
+    """
+    # Get the cached prototype if available
+    if trait_values is not None:
+        trait_values = tuple(trait_values)
+    key = (tuple(trait_description), trait_values)
+    prototype = _description_prototypes.get(key)
+
+    # Otherwise build the prototype
+    if prototype is None:
+
+        # Go through all its possible types (Either trait structure)
+        trait_items = [
+            build_trait_from_spec(trait_spec.split("_"), trait_values)
+            for trait_spec in trait_description]
+
+        # Use the Either trait if multiple items
+        if len(trait_items) > 1:
+            prototype = traits.Either(*trait_items)
+        else:
+            prototype = trait_items[0]
+        _description_prototypes[key] = prototype
+
+    return copy_trait(prototype)
+
+
+def build_trait_from_spec(trait_spec, trait_values=None):
+    """ Instanciate a trait from its string description structure.
+
+    This is the structured equivalent of the evaluation of the
+    'build_expression_from_spec' expression.
+
+    Parameters
+    ----------
+    trait_spec: list of string (mandatory)
+        a trait string description structure.
+    trait_values: tuple (optional, default None)
+        the Enum trait values.
+
+    Returns
+    -------
+    trait: trait instance
+        the corresponding trait instance.
+    """
+    # Only deal for now with those traits
+    allowed_traits = ["List", "Tuple", "Int", "Float", "Str", "String", "File",
+                      "Directory", "Any", "Bool"]
+
+    # Enum special case: need the enum values
+    if trait_spec == ["Enum"] and trait_values is not None:
+        return traits.Enum(trait_values)
+
+    # Check item types
+    for trait_item in trait_spec:
+        if trait_item not in allowed_traits:
+            raise ValueError("'{0}' trait not yet supported.".format(
+                trait_item))
+
+    # Build the trait item and its inner traits
+    trait_item = trait_spec[0]
+    trait_class = getattr(traits, trait_item)
+
+    # Tuple special case: the tuple items are the remaining items, until a
+    # List or Tuple item that consumes the rest of the description
+    if trait_item == "Tuple":
+        tuple_items = []
+        for cnt, tuple_item in enumerate(trait_spec[1:]):
+            if tuple_item in ["List", "Tuple"]:
+                tuple_items.append(build_trait_from_spec(trait_spec[cnt + 1:]))
+                break
+            tuple_items.append(getattr(traits, tuple_item)())
+        return trait_class(*tuple_items)
+
+    # Standard case: the next item is the inner trait
+    elif len(trait_spec) > 1:
+        return trait_class(build_trait_from_spec(trait_spec[1:]))
+
+    # Atomic trait
+    else:
+        return trait_class()
+
+
+def build_trait(trait):
+    """ Instanciate a new trait of the same type as an input trait.
+
+    This is the structured equivalent of
+    'eval_trait(build_expression(trait))': no expression is evaluated and
+    the built traits are cached per trait handler.
+
+    Parameters
+    ----------
+    trait: trait instance (mandatory)
+        a trait instance.
+
+    Returns
+    -------
+    trait: trait instance
+        a new trait instance.
+    """
+    # Get the cached prototype if available
+    handler = getattr(trait, "handler", None) or trait
+    try:
+        prototype = _handler_prototypes.get(handler)
+    except TypeError:
+        prototype = None
+
+    # Otherwise build the prototype
+    if prototype is None:
+        prototype = _build_trait(trait)
+        try:
+            _handler_prototypes[handler] = prototype
+        except TypeError:
+            pass
+
+    return copy_trait(prototype)
+
+
+def _build_trait(trait):
+    """ Recursive function that instanciates a new trait of the same type as
+    an input trait, following the 'build_expression' rules.
+
+    Parameters
+    ----------
+    trait: trait instance (mandatory)
+        a trait instance.
+
+    Returns
+    -------
+    trait: trait instance
+        a new trait instance.
     """
-    # Build the new trait expression
-    trait_expression = []
-
-    # Go through all its possible types (Either trait structure)
-    for trait_spec in trait_description:
-
-        # Split the current trait specification
-        trait_spec = trait_spec.split("_")
-        trait_expression.append(build_expression_from_spec(trait_spec))
-
-    # Build the final expression: use the Either trait if multiple expressions
-    if len(trait_expression) > 1:
-        expression = "eval_trait = traits.Either("
-        for item in trait_expression:
-            expression += "{0}, ".format(item)
-        expression += ")"
+    # Get the trait desciption
+    trait_description = trait_ids(trait)
+
+    # Error case
+    if len(trait_description) == 0:
+        raise ValueError("Can't deal with empty structure.")
+
+    # Either case
+    elif len(trait_description) > 1:
+        return traits.Either(*[_build_trait(inner_trait())
+                               for inner_trait in trait.handler.handlers])
+
+    # Standard case: atomic trait description
+    trait_item = trait_description[0].split("_")[0]
+    trait_class = getattr(traits, trait_item, None)
+    if trait_class is None:
+        raise ValueError("'{0}' trait not yet supported.".format(trait_item))
+
+    # Special case: Tuple
+    # Need to set the value types
+    if trait_item == "Tuple":
+        return trait_class(*[_build_trait(inner_trait())
+                             for inner_trait in trait.get_validate()[1]])
+
+    # Special case: List
+    # Need to set the value type
+    elif trait_item == "List":
+        return trait_class(_build_trait(trait.inner_traits[0]))
+
+    # Special case: Dict
+    # Need to set the key and value types
+    elif trait_item == "Dict":
+        return trait_class(_build_trait(trait.inner_traits[0]),
+                           _build_trait(trait.inner_traits[1]))
+
+    # Special case: Enum
+    # Need to add enum values at the construction
+    elif trait_item == "Enum":
+        return trait_class(trait.get_validate()[1])
+
+    # Special case: Range
+    # Need to add the lower and upper bounds
+    elif trait_item == "Range":
+        if isinstance(trait, traits.CTrait):
+            return trait_class(low=trait.handler._low,
+                               high=trait.handler._high)
+        else:
+            return trait_class(low=trait._low, high=trait._high)
+
+    # Special case: File
+    # Initialize the default file trait value to undefined
+    elif trait_item == "File":
+        return trait_class(traits.Undefined)
+
+    # Default
     else:
-        expression = "eval_trait = {0}".format(trait_expression[0])
+        return trait_class()
+
+
+def copy_trait(prototype):
+    """ Copy a cached trait prototype or an instance trait.
 
-    return eval_trait(expression)
+    Parameters
+    ----------
+    prototype: trait instance or CTrait (mandatory)
+        a cached trait instance or a trait returned by HasTraits.trait.
+
+    Returns
+    -------
+    trait: trait instance or CTrait
+        an independant copy of the prototype, its metadata can be modified.
+    """
+    # CTrait special case: copy the handler and the metadata
+    if isinstance(prototype, traits.CTrait):
+        trait = traits.CTrait(0)
+        trait.clone(prototype)
+        if prototype.__dict__ is not None:
+            trait.__dict__ = prototype.__dict__.copy()
+        return trait
+
+    trait = prototype.clone()
+    trait._metadata.pop("parent", None)
+    return trait
 
 
 def build_expression_from_spec(trait_spec):
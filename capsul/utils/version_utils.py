@@ -13,12 +13,17 @@ import logging
 # Define the logger
 logger = logging.getLogger(__name__)
 
+# Global parameters
+# Tool versions are computed once per process: {tool: version}
+_tool_versions = {}
+
 
 def get_tool_version(tool):
     """ Get the version of a python tool.
 
     Check if the python tool module has a '__version__' attribute and return
     this value. If this attribute is not found, return None.
+    The result is cached for the whole python session.
 
     Parameters
     ----------
@@ -30,6 +35,10 @@ def get_tool_version(tool):
     version: str
         the tool version, None if no information found in the module.
     """
+    # Use the cached version if available
+    if tool in _tool_versions:
+        return _tool_versions[tool]
+
     # Initialize the version to None ie. not found
     version = None
 
@@ -42,6 +51,7 @@ def get_tool_version(tool):
 
     # Debug message
     logger.debug("Module '{0}' version is {1}".format(tool, version))
+    _tool_versions[tool] = version
 
     return version
 